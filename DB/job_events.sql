@@ -28,7 +28,8 @@ CREATE TABLE `job_events`  (
   `payload` json NULL,
   `created_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
   PRIMARY KEY (`id`) USING BTREE,
-  INDEX `idx_je_job`(`job_id`) USING BTREE,
+  INDEX `idx_je_job_id`(`job_id`, `id`) USING BTREE,
+  INDEX `idx_je_created`(`created_at`) USING BTREE,
   INDEX `idx_je_event`(`event_type`) USING BTREE,
   CONSTRAINT `fk_je_job` FOREIGN KEY (`job_id`) REFERENCES `jobs` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
@@ -27,15 +27,18 @@ CREATE TABLE `job_recipients`  (
   `to_email` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `language` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
   `variables` json NULL,
-  `status` enum('pending','success','failed','skipped') CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'pending',
+  `status` enum('pending','sending','success','failed','skipped') CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'pending',
   `error` text CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL,
   `attempts` int NOT NULL DEFAULT 0,
+  `sent_from` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `lease_expires_at` datetime(6) NULL DEFAULT NULL,
   `provider_message_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
   `created_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
   `updated_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (`id`) USING BTREE,
-  INDEX `idx_jr_job`(`job_id`) USING BTREE,
+  INDEX `idx_jr_job_status`(`job_id`, `status`) USING BTREE,
   INDEX `idx_jr_status`(`status`) USING BTREE,
+  INDEX `idx_jr_status_lease`(`status`, `lease_expires_at`) USING BTREE,
   CONSTRAINT `fk_jr_job` FOREIGN KEY (`job_id`) REFERENCES `jobs` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
 
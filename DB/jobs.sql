@@ -27,6 +27,7 @@ CREATE TABLE `jobs`  (
   `store_id` varchar(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `type` enum('template','custom') CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `sender_email` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `sender_pool` json NULL,
   `template_id` bigint UNSIGNED NULL DEFAULT NULL,
   `subject` varchar(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
   `content` mediumtext CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL,
@@ -37,13 +38,21 @@ CREATE TABLE `jobs`  (
   `success_count` int NOT NULL DEFAULT 0,
   `failure_count` int NOT NULL DEFAULT 0,
   `status` enum('queued','running','paused','stopped','completed','error') CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'queued',
+  `locked_by` varchar(128) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `lease_expires_at` datetime(6) NULL DEFAULT NULL,
+  `heartbeat_at` datetime(6) NULL DEFAULT NULL,
   `webhook_url` varchar(1024) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `source_file` varchar(1024) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `schedule_at` datetime(6) NULL DEFAULT NULL,
+  `priority` tinyint NOT NULL DEFAULT 0,
   `created_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
   `started_at` datetime(6) NULL DEFAULT NULL,
   `completed_at` datetime(6) NULL DEFAULT NULL,
   PRIMARY KEY (`id`) USING BTREE,
-  INDEX `idx_jobs_tenant`(`master_user_id`, `store_id`) USING BTREE,
-  INDEX `idx_jobs_status`(`status`) USING BTREE,
+  INDEX `idx_jobs_tenant_created`(`master_user_id`, `store_id`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_jobs_tenant_status_created`(`master_user_id`, `store_id`, `status`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_jobs_status_schedule`(`status`, `schedule_at`) USING BTREE,
+  INDEX `idx_jobs_status_lease`(`status`, `lease_expires_at`) USING BTREE,
   INDEX `fk_jobs_template`(`template_id`) USING BTREE,
   CONSTRAINT `fk_jobs_template` FOREIGN KEY (`template_id`) REFERENCES `templates` (`id`) ON DELETE SET NULL ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
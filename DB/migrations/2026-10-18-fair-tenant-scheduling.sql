@@ -0,0 +1,21 @@
+-- Migration: fair multi-tenant job scheduling (src/fair_scheduler.py)
+-- jobs.priority orders a tenant's own queued jobs (higher first); fairness across
+-- tenants comes from deficit round robin in JobRunner, not from priority.
+-- (status, schedule_at) serves the due-job scan; it supersedes idx_jobs_status.
+
+ALTER TABLE `jobs`
+  ADD COLUMN `priority` tinyint NOT NULL DEFAULT 0 AFTER `schedule_at`,
+  ADD INDEX `idx_jobs_status_schedule`(`status`, `schedule_at`);
+
+ALTER TABLE `jobs`
+  DROP INDEX `idx_jobs_status`;
+
+-- Recipients sent per tenant per UTC day, for TENANT_DAILY_QUOTA / TENANT_LIMITS
+-- (only maintained while a daily quota is configured for the tenant)
+CREATE TABLE IF NOT EXISTS `tenant_daily_usage`  (
+  `usage_date` date NOT NULL,
+  `master_user_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `store_id` varchar(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `sent_count` int NOT NULL DEFAULT 0,
+  PRIMARY KEY (`usage_date`, `master_user_id`, `store_id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
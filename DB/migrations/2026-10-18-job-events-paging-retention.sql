@@ -0,0 +1,23 @@
+-- Migration: job_events paging index, retention index and archive table
+-- (job_id, id) serves both the FK and "WHERE job_id=? AND id>? ORDER BY id"
+-- keyset paging without a filesort; it supersedes idx_je_job.
+-- created_at supports the batched retention sweep (src/job_events.py).
+
+ALTER TABLE `job_events`
+  ADD INDEX `idx_je_job_id`(`job_id`, `id`),
+  ADD INDEX `idx_je_created`(`created_at`);
+
+ALTER TABLE `job_events`
+  DROP INDEX `idx_je_job`;
+
+-- Archive target used when JOB_EVENTS_ARCHIVE=true (no FK so jobs can be deleted)
+CREATE TABLE IF NOT EXISTS `job_events_archive`  (
+  `id` bigint UNSIGNED NOT NULL,
+  `job_id` char(36) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `event_type` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `payload` json NULL,
+  `created_at` datetime(6) NOT NULL,
+  `archived_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_jea_job_id`(`job_id`, `id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
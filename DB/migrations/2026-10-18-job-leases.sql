@@ -0,0 +1,10 @@
+-- Migration: leases/heartbeats on running jobs (src/job_runner.py)
+-- The JobRunner that claims a job records itself in locked_by and renews lease_expires_at
+-- every JOB_HEARTBEAT_SEC. If the worker dies, the lease lapses and the reaper puts the job
+-- back to 'queued'; the next run continues from the remaining pending recipients.
+
+ALTER TABLE `jobs`
+  ADD COLUMN `locked_by` varchar(128) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL AFTER `status`,
+  ADD COLUMN `lease_expires_at` datetime(6) NULL DEFAULT NULL AFTER `locked_by`,
+  ADD COLUMN `heartbeat_at` datetime(6) NULL DEFAULT NULL AFTER `lease_expires_at`,
+  ADD INDEX `idx_jobs_status_lease`(`status`, `lease_expires_at`);
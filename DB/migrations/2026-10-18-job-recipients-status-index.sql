@@ -0,0 +1,9 @@
+-- Migration: (job_id, status) index for per-job recipient status counts
+-- Serves "WHERE job_id=? GROUP BY status" (GET /api/jobs/<id>/status?breakdown=true)
+-- and "WHERE job_id=? AND status='pending'" as index-only lookups; it supersedes idx_jr_job.
+
+ALTER TABLE `job_recipients`
+  ADD INDEX `idx_jr_job_status`(`job_id`, `status`);
+
+ALTER TABLE `job_recipients`
+  DROP INDEX `idx_jr_job`;
@@ -0,0 +1,11 @@
+-- Migration: sender pool rotation for a single job (src/sender_pool.py)
+-- jobs.sender_pool: JSON array of the tenant's authorized senders the job rotates across
+-- (NULL = send from jobs.sender_email only).
+-- job_recipients.sent_from: account that claimed/sent the recipient, so crash recovery
+-- searches the right mailbox for the deterministic Message-ID.
+
+ALTER TABLE `jobs`
+  ADD COLUMN `sender_pool` json NULL AFTER `sender_email`;
+
+ALTER TABLE `job_recipients`
+  ADD COLUMN `sent_from` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL AFTER `attempts`;
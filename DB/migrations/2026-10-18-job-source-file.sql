@@ -0,0 +1,6 @@
+-- Migration: spreadsheet campaigns imported as DB jobs (src/excel_job_importer.py)
+-- jobs.source_file: absolute path of the workbook the recipients were imported from;
+-- recipient statuses are written back to it when the job completes.
+
+ALTER TABLE `jobs`
+  ADD COLUMN `source_file` varchar(1024) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL AFTER `webhook_url`;
@@ -0,0 +1,11 @@
+-- Migration: composite indexes for tenant job listing (GET /api/jobs)
+-- Keyset pagination orders by (created_at DESC, id DESC) within a tenant; with these
+-- indexes each page is a bounded range scan regardless of table size or page depth.
+-- idx_jobs_tenant is a prefix of idx_jobs_tenant_created and is dropped.
+
+ALTER TABLE `jobs`
+  ADD INDEX `idx_jobs_tenant_created`(`master_user_id`, `store_id`, `created_at`, `id`),
+  ADD INDEX `idx_jobs_tenant_status_created`(`master_user_id`, `store_id`, `status`, `created_at`, `id`);
+
+ALTER TABLE `jobs`
+  DROP INDEX `idx_jobs_tenant`;
@@ -0,0 +1,10 @@
+-- Migration: two-phase recipient sending (pending -> sending -> success/failed)
+-- A worker claims a recipient by moving it to 'sending' with a lease and
+-- incrementing attempts before calling Gmail. Rows left in 'sending' after
+-- the lease expires are reconciled by the recovery sweep (see
+-- src/delivery_recovery.py) using the deterministic Message-ID header.
+
+ALTER TABLE `job_recipients`
+  MODIFY `status` enum('pending','sending','success','failed','skipped') CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'pending',
+  ADD COLUMN `lease_expires_at` datetime(6) NULL DEFAULT NULL AFTER `attempts`,
+  ADD INDEX `idx_jr_status_lease`(`status`, `lease_expires_at`);
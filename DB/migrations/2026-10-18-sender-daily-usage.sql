@@ -0,0 +1,17 @@
+-- Migration: per-sender send ledger (src/sender_ledger.py)
+-- One row per sender per UTC day. sent_count backs SENDER_DAILY_CAP / SENDER_DAILY_CAPS.
+-- next_slot_at is the earliest time any job may send from this account again, so
+-- concurrent jobs (in any process) sharing a sender pace as one.
+-- reserved_count counts reserved slots whose send has not finished yet; the cap is checked
+-- against sent_count + reserved_count, so jobs sharing a sender cannot overshoot it while
+-- sends are in flight. A worker that dies mid-send leaves its reservation counted until the
+-- day rolls over (the cap errs on the low side).
+
+CREATE TABLE IF NOT EXISTS `sender_daily_usage`  (
+  `usage_date` date NOT NULL,
+  `sender_email` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `sent_count` int NOT NULL DEFAULT 0,
+  `reserved_count` int NOT NULL DEFAULT 0,
+  `next_slot_at` datetime(6) NULL DEFAULT NULL,
+  PRIMARY KEY (`usage_date`, `sender_email`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
@@ -0,0 +1,9 @@
+-- Migration: store the precompiled template form alongside each DB template
+-- compiled_json holds the original html, its plain-text form, placeholders and the
+-- <img id> manifest, produced once on create/update so sending needs no HTML parsing.
+-- Image ids are rewritten to cid: references at send time, only for ids that resolve
+-- to one of the tenant's image assets.
+-- Rows left NULL are compiled lazily at send time.
+
+ALTER TABLE `templates`
+  ADD COLUMN `compiled_json` json NULL AFTER `text_content`;
@@ -30,6 +30,7 @@ CREATE TABLE `templates`  (
   `subject` varchar(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `html_content` mediumtext CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `text_content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL,
+  `compiled_json` json NULL,
   `version` int NOT NULL DEFAULT 1,
   `is_active` tinyint(1) NOT NULL DEFAULT 1,
   `created_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
@@ -8,6 +8,7 @@ classic/template sending, scheduling control, and utilities.
 
 from __future__ import annotations
 
+import logging
 import threading
 from datetime import datetime
 from typing import Optional
@@ -15,28 +16,71 @@ from typing import Optional
 from flask import Flask, request, jsonify, redirect
 from flask_cors import CORS
 
-from src.email_assistant import EmailAssistant
-from src.gmail_auth import GmailAuthManager
 from src.token_store import TokenStore
 from src.config import get_config
 from src.api_v2 import bp as api_v2_bp
-from src.job_runner import JobRunner
 
 
 app = Flask(__name__)
 CORS(app)
 app.register_blueprint(api_v2_bp)
 
-# Global instances
-email_assistant = EmailAssistant()
-gmail_auth_manager = GmailAuthManager()
+# Global instances. EmailAssistant/GmailAuthManager (pandas, openpyxl, google-auth,
+# googleapiclient) are built on first use so importing this module stays cheap and
+# /api/health answers even when credentials.json is missing.
 token_store = TokenStore()
 cfg = get_config()
+logger = logging.getLogger(__name__)
+
+_email_assistant = None
+_gmail_auth_manager = None
+_instances_lock = threading.Lock()
 
 # Background task handle
 current_task_thread: Optional[threading.Thread] = None
-job_runner = JobRunner()
-job_runner.start()
+job_runner = None
+
+
+def get_email_assistant():
+    """Shared EmailAssistant, created on first use."""
+    global _email_assistant
+    if _email_assistant is None:
+        with _instances_lock:
+            if _email_assistant is None:
+                from src.email_assistant import EmailAssistant
+                _email_assistant = EmailAssistant()
+    return _email_assistant
+
+
+def get_gmail_auth_manager():
+    """Shared GmailAuthManager for the OAuth web flow, created on first use."""
+    global _gmail_auth_manager
+    if _gmail_auth_manager is None:
+        with _instances_lock:
+            if _gmail_auth_manager is None:
+                from src.services import get_gmail_auth_manager as shared_gmail_auth_manager
+                _gmail_auth_manager = shared_gmail_auth_manager()
+    return _gmail_auth_manager
+
+
+def _start_job_runner():
+    global job_runner
+    try:
+        from src.job_runner import JobRunner
+        runner = JobRunner()
+        runner.start()
+        job_runner = runner
+    except Exception as e:
+        logger.error(f"JobRunner failed to start: {e}")
+
+
+def start_job_runner():
+    """Start the job runner in the background; its imports and setup do not delay serving requests."""
+    threading.Thread(target=_start_job_runner, name="job-runner-start", daemon=True).start()
+
+
+if cfg["JOB_RUNNER_ENABLED"]:
+    start_job_runner()
 
 
 # ===== API Key Auth =====
@@ -69,7 +113,7 @@ def authenticate_sender():
         sender_email = data.get("sender_email")
         if not sender_email:
             return jsonify({"success": False, "error": "Missing sender_email"}), 400
-        success = email_assistant.authenticate_sender(sender_email)
+        success = get_email_assistant().authenticate_sender(sender_email)
         return jsonify({"success": success})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -83,7 +127,7 @@ def validate_excel():
         excel_file_path = data.get("excel_file_path")
         if not excel_file_path:
             return jsonify({"success": False, "error": "Missing excel_file_path"}), 400
-        success = email_assistant.validate_excel_file(excel_file_path)
+        success = get_email_assistant().validate_excel_file(excel_file_path)
         return jsonify({"success": success})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -97,7 +141,7 @@ def preview_emails():
         excel_file_path = data.get("excel_file_path")
         if not excel_file_path:
             return jsonify({"success": False, "error": "Missing excel_file_path"}), 400
-        result = email_assistant.preview_email_list(excel_file_path)
+        result = get_email_assistant().preview_email_list(excel_file_path)
         return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -140,7 +184,7 @@ def send_emails():
             return jsonify({"success": False, "error": "A task is already running"}), 409
 
         def run_email_task():
-            email_assistant.send_emails(
+            get_email_assistant().send_emails(
                 sender_email=sender_email,
                 excel_file_path=excel_file_path,
                 subject=subject,
@@ -162,7 +206,7 @@ def send_emails():
 @app.route("/api/status", methods=["GET"])
 def get_status():
     try:
-        status = email_assistant.get_scheduler_status()
+        status = get_email_assistant().get_scheduler_status()
         return jsonify({"success": True, "status": status})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -172,7 +216,7 @@ def get_status():
 @require_api_key
 def pause_sending():
     try:
-        email_assistant.pause_sending()
+        get_email_assistant().pause_sending()
         return jsonify({"success": True, "message": "Paused"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -182,7 +226,7 @@ def pause_sending():
 @require_api_key
 def resume_sending():
     try:
-        email_assistant.resume_sending()
+        get_email_assistant().resume_sending()
         return jsonify({"success": True, "message": "Resumed"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -192,7 +236,7 @@ def resume_sending():
 @require_api_key
 def stop_sending():
     try:
-        email_assistant.stop_sending()
+        get_email_assistant().stop_sending()
         return jsonify({"success": True, "message": "Stopped"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -205,7 +249,7 @@ def get_statistics():
         excel_file_path = data.get("excel_file_path")
         if not excel_file_path:
             return jsonify({"success": False, "error": "Missing excel_file_path"}), 400
-        result = email_assistant.get_statistics(excel_file_path)
+        result = get_email_assistant().get_statistics(excel_file_path)
         return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -218,7 +262,7 @@ def validate_templates():
         excel_file_path = data.get("excel_file_path")
         if not excel_file_path:
             return jsonify({"success": False, "error": "Missing excel_file_path"}), 400
-        result = email_assistant.validate_templates(excel_file_path)
+        result = get_email_assistant().validate_templates(excel_file_path)
         return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -232,7 +276,22 @@ def preview_template_emails():
         max_previews = int(data.get("max_previews", 3))
         if not excel_file_path:
             return jsonify({"success": False, "error": "Missing excel_file_path"}), 400
-        result = email_assistant.preview_template_emails(excel_file_path, max_previews)
+        result = get_email_assistant().preview_template_emails(excel_file_path, max_previews)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/dry_run_template_emails", methods=["POST"])
+def dry_run_template_emails():
+    """Render every pending template email without sending and return aggregate stats."""
+    try:
+        data = request.get_json() or {}
+        excel_file_path = data.get("excel_file_path")
+        workers = data.get("workers")
+        if not excel_file_path:
+            return jsonify({"success": False, "error": "Missing excel_file_path"}), 400
+        result = get_email_assistant().dry_run_template_emails(excel_file_path, int(workers) if workers else None)
         return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -265,7 +324,7 @@ def send_template_emails():
             start_time = datetime.now()
 
         def run_task():
-            email_assistant.send_template_emails(
+            get_email_assistant().send_template_emails(
                 sender_email=sender_email,
                 excel_file_path=excel_file_path,
                 attachments=attachments,
@@ -323,7 +382,7 @@ def oauth_google_authorize():
         raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
         state = base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
         redirect_uri = cfg["OAUTH_REDIRECT_URL"]
-        auth_url, _ = gmail_auth_manager.build_authorize_url(redirect_uri, state=state)
+        auth_url, _ = get_gmail_auth_manager().build_authorize_url(redirect_uri, state=state)
         return redirect(auth_url)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -356,7 +415,7 @@ def oauth_google_callback():
         return_url = payload.get("return_url")
 
         redirect_uri = cfg["OAUTH_REDIRECT_URL"]
-        email, creds_json = gmail_auth_manager.exchange_code_for_token(code, redirect_uri)
+        email, creds_json = get_gmail_auth_manager().exchange_code_for_token(code, redirect_uri)
 
         # save token to DB and file store (best effort)
         try:
@@ -1,7 +1,9 @@
 import os
 import base64
+import hashlib
 import json
-from flask import Blueprint, request, jsonify, send_file
+import time
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
 
 from src.config import get_config
@@ -18,6 +20,9 @@ from src.dao_mysql import (
     create_job,
     add_job_recipients,
     get_job,
+    get_job_counters,
+    list_jobs,
+    count_job_recipients_by_status,
     list_job_recipients,
     resolve_attachment_paths,
     list_job_events,
@@ -28,7 +33,11 @@ from src.dao_mysql import (
     list_senders,
     delete_sender,
 )
+from src.template_compiler import validate_params, validate_recipient_params
 from src.template_files import TemplateFileManager
+from src.template_store import get_template_store
+from src.webhook_dispatcher import get_webhook_dispatcher
+from src.event_bus import get_event_bus, TERMINAL_EVENTS
 from datetime import datetime, timezone
 import mimetypes
 
@@ -59,6 +68,25 @@ def db_health():
 
 
 # ===== Jobs (JSON-based sending) =====
+def _resolve_sender_pool(mu: str, store: str, sender: str, value):
+    """sender_pool option -> (list of senders incl. the job's sender, error). "all"/true = every active sender."""
+    if not value:
+        return None, None
+    active = [r["email"] for r in list_senders(mu, store) if r.get("status", "active") == "active"]
+    if value is True or value == "all":
+        requested = active
+    elif isinstance(value, list):
+        requested = [str(v).strip() for v in value if str(v).strip()]
+        known = {e.lower() for e in active}
+        unknown = [e for e in requested if e.lower() not in known]
+        if unknown:
+            return None, f"sender_pool contains unauthorized senders: {', '.join(unknown)}"
+    else:
+        return None, "invalid sender_pool"
+    pool = [sender] + [e for e in requested if e.lower() != str(sender).lower()]
+    return (pool if len(pool) > 1 else None), None
+
+
 @bp.route("/jobs/send_template_emails", methods=["POST"])
 def jobs_send_template():
     ok, resp = _require_api_key()
@@ -82,6 +110,14 @@ def jobs_send_template():
     min_interval = int(data.get("min_interval", 20))
     max_interval = int(data.get("max_interval", 90))
     webhook_url = data.get("webhook_url")
+    try:
+        # orders this tenant's own queued jobs (higher first); see src/fair_scheduler.py
+        priority = max(-100, min(int(data.get("priority", 0)), 100))
+    except Exception:
+        return jsonify({"success": False, "error": "invalid priority"}), 400
+    sender_pool, pool_error = _resolve_sender_pool(mu, store, sender, data.get("sender_pool"))
+    if pool_error:
+        return jsonify({"success": False, "error": pool_error}), 400
     attachments = data.get("attachments", [])
     start_time_str = data.get("start_time")
 
@@ -99,7 +135,18 @@ def jobs_send_template():
         # immediate
         schedule_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
 
-    job_id = create_job(mu, store, "template", sender, template_id, None, None, None, min_interval, max_interval, webhook_url, schedule_at)
+    # placeholders are stored with each template version, so this is a set difference per recipient
+    if template_id is not None and get_template_store().get_db_template(mu, store, template_id) is None:
+        return jsonify({"success": False, "error": "template not found"}), 404
+    template_validation = validate_recipient_params(recipients, _job_template_params(mu, store, template_id))
+    if data.get("strict_params") and not template_validation["valid"]:
+        return jsonify({
+            "success": False,
+            "error": "recipient variables do not cover the template parameters",
+            "template_validation": template_validation,
+        }), 400
+
+    job_id = create_job(mu, store, "template", sender, template_id, None, None, None, min_interval, max_interval, webhook_url, schedule_at, priority, sender_pool)
 
     # resolve attachments and embed into recipient variables under __attachments__ to keep for runner
     resolved_attachments = resolve_attachment_paths(mu, store, attachments)
@@ -111,36 +158,21 @@ def jobs_send_template():
         r["variables"] = vars
     added = add_job_recipients(job_id, recipients)
 
-    # Start background sending using scheduler via classic app instance
-    from src.email_scheduler import EmailScheduler
-    from src.gmail_auth import GmailAuthManager
-    from src.excel_processor import ExcelProcessor
+    # Enqueue only; the JobRunner picks it up with its shared managers (src/services.py)
+    return jsonify({
+        "success": True, "job_id": job_id, "recipients": added, "queued": True, "schedule_at": schedule_at,
+        "template_validation": template_validation,
+    })
 
-    gmail_auth_manager = GmailAuthManager()
-    excel_processor = ExcelProcessor()
-    scheduler = EmailScheduler(gmail_auth_manager, excel_processor, min_interval=min_interval, max_interval=max_interval)
 
-    # Resolve attachment paths relative to files/
-    resolved_attachments = resolve_attachment_paths(mu, store, attachments)
+def _job_template_params(mu: str, store: str, template_id=None):
+    """language -> placeholders of the template the job would use (None when there is no template)."""
+    template_store = get_template_store()
 
-    def run_job():
-        try:
-            scheduler.send_job_emails_from_db(
-                sender_email=sender,
-                master_user_id=mu,
-                store_id=store,
-                job_id=job_id,
-                job_type="template",
-                template_id=template_id,
-                attachments=resolved_attachments,
-                min_interval=min_interval,
-                max_interval=max_interval,
-            )
-        except Exception:
-            pass
-
-    # Enqueue only; runner will pick it up
-    return jsonify({"success": True, "job_id": job_id, "recipients": added, "queued": True, "schedule_at": schedule_at})
+    def params_for(language: str):
+        tpl = template_store.get_job_template(mu, store, language, template_id)
+        return tpl["params"] if tpl else None
+    return params_for
 
 
 @bp.route("/jobs/send_emails", methods=["POST"])
@@ -163,6 +195,14 @@ def jobs_send_custom():
     min_interval = int(data.get("min_interval", 20))
     max_interval = int(data.get("max_interval", 90))
     webhook_url = data.get("webhook_url")
+    try:
+        # orders this tenant's own queued jobs (higher first); see src/fair_scheduler.py
+        priority = max(-100, min(int(data.get("priority", 0)), 100))
+    except Exception:
+        return jsonify({"success": False, "error": "invalid priority"}), 400
+    sender_pool, pool_error = _resolve_sender_pool(mu, store, sender, data.get("sender_pool"))
+    if pool_error:
+        return jsonify({"success": False, "error": pool_error}), 400
     attachments = data.get("attachments", [])
     start_time_str = data.get("start_time")
     # compute schedule_at
@@ -178,7 +218,7 @@ def jobs_send_custom():
     else:
         schedule_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
 
-    job_id = create_job(mu, store, "custom", sender, None, subject, content, html_content, min_interval, max_interval, webhook_url, schedule_at)
+    job_id = create_job(mu, store, "custom", sender, None, subject, content, html_content, min_interval, max_interval, webhook_url, schedule_at, priority, sender_pool)
     resolved_attachments = resolve_attachment_paths(mu, store, attachments)
     for r in recipients:
         vars = r.get("variables") or {}
@@ -188,35 +228,177 @@ def jobs_send_custom():
         r["variables"] = vars
     added = add_job_recipients(job_id, recipients)
 
-    from src.email_scheduler import EmailScheduler
-    from src.gmail_auth import GmailAuthManager
-    from src.excel_processor import ExcelProcessor
-
-    gmail_auth_manager = GmailAuthManager()
-    excel_processor = ExcelProcessor()
-    scheduler = EmailScheduler(gmail_auth_manager, excel_processor, min_interval=min_interval, max_interval=max_interval)
+    # Enqueue only; the JobRunner picks it up
+    return jsonify({"success": True, "job_id": job_id, "recipients": added, "queued": True, "schedule_at": schedule_at})
 
-    resolved_attachments = resolve_attachment_paths(mu, store, attachments)
 
-    def run_job():
+@bp.route("/jobs/import_workbook", methods=["POST"])
+def jobs_import_workbook():
+    """Turn a tenant spreadsheet (uploaded via /assets as an attachment) into a DB job; statuses sync back on completion."""
+    ok, resp = _require_api_key()
+    if not ok:
+        return resp
+    data = request.get_json() or {}
+    for k in ("master_user_id", "store_id", "sender_email", "file"):
+        if k not in data:
+            return jsonify({"success": False, "error": f"missing {k}"}), 400
+    mu = str(data["master_user_id"])
+    store = str(data["store_id"])
+    sender = data["sender_email"]
+    _, attach_dir = ensure_tenant_dirs(get_config().get("FILES_ROOT"), mu, store)
+    filename = secure_filename(str(data["file"]))
+    full = os.path.join(attach_dir, filename) if filename else ""
+    if not full or not os.path.isfile(full):
+        return jsonify({"success": False, "error": "file not found"}), 404
+    if not filename.lower().endswith((".xlsx", ".xlsm", ".xls", ".csv", ".parquet")):
+        return jsonify({"success": False, "error": "file must be .xlsx/.xlsm/.xls/.csv/.parquet"}), 400
+    subject = data.get("subject")
+    if subject and not (data.get("content") or data.get("html_content")):
+        return jsonify({"success": False, "error": "content or html_content required with subject"}), 400
+    template_id = data.get("template_id")
+    if template_id is not None:
+        try:
+            template_id = int(template_id)
+        except Exception:
+            return jsonify({"success": False, "error": "invalid template_id"}), 400
+    try:
+        min_interval = int(data.get("min_interval", 20))
+        max_interval = int(data.get("max_interval", 90))
+        priority = max(-100, min(int(data.get("priority", 0)), 100))
+    except Exception:
+        return jsonify({"success": False, "error": "invalid min_interval/max_interval/priority"}), 400
+    sender_pool, pool_error = _resolve_sender_pool(mu, store, sender, data.get("sender_pool"))
+    if pool_error:
+        return jsonify({"success": False, "error": pool_error}), 400
+    schedule_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+    if data.get("start_time"):
         try:
-            scheduler.send_job_emails_from_db(
-                sender_email=sender,
-                master_user_id=mu,
-                store_id=store,
-                job_id=job_id,
-                job_type="custom",
-                subject=subject,
-                content=content,
-                html_content=html_content,
-                attachments=resolved_attachments,
-                min_interval=min_interval,
-                max_interval=max_interval,
-            )
+            dt = datetime.fromisoformat(data["start_time"])
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+            schedule_at = dt.strftime("%Y-%m-%d %H:%M:%S.%f")
         except Exception:
-            pass
+            return jsonify({"success": False, "error": "invalid start_time"}), 400
+    if template_id is not None and get_template_store().get_db_template(mu, store, template_id) is None:
+        return jsonify({"success": False, "error": "template not found"}), 404
+    from src.excel_job_importer import import_workbook_job, missing_columns
 
-    return jsonify({"success": True, "job_id": job_id, "recipients": added, "queued": True, "schedule_at": schedule_at})
+    # checked before the job exists, so a wrong sheet never leaves an empty/error job behind
+    try:
+        missing = missing_columns(full)
+    except Exception as e:
+        return jsonify({"success": False, "error": f"unreadable file: {e}"}), 400
+    if missing:
+        return jsonify({"success": False, "error": "missing required columns", "missing_columns": missing}), 400
+    try:
+        result = import_workbook_job(
+            full, mu, store, sender,
+            template_id=template_id,
+            subject=subject,
+            content=data.get("content"),
+            html_content=data.get("html_content"),
+            min_interval=min_interval,
+            max_interval=max_interval,
+            webhook_url=data.get("webhook_url"),
+            schedule_at=schedule_at,
+            priority=priority,
+            sender_pool=sender_pool,
+            attachments=resolve_attachment_paths(mu, store, data.get("attachments") or []),
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({"success": True, **result, "queued": result["status"] == "queued", "schedule_at": schedule_at})
+
+
+@bp.route("/jobs/<string:job_id>/sync_source", methods=["POST"])
+def jobs_sync_source(job_id: str):
+    """Write recipient results back to the job's source workbook now (also done automatically on completion)."""
+    ok, resp = _require_api_key()
+    if not ok:
+        return resp
+    from src.excel_job_importer import sync_job_to_workbook
+
+    result = sync_job_to_workbook(job_id)
+    if not result.get("success"):
+        code = 404 if result.get("error") == "job not found" else 400
+        return jsonify(result), code
+    return jsonify(result)
+
+
+@bp.route("/jobs/<string:job_id>/dry_run", methods=["POST"])
+def jobs_dry_run(job_id: str):
+    """Render every recipient of the job without sending; returns aggregate stats only."""
+    ok, resp = _require_api_key()
+    if not ok:
+        return resp
+    from src.dry_run import dry_run_job
+
+    data = request.get_json(silent=True) or {}
+    status = data.get("status", "pending")
+    if status == "all":
+        status = None
+    elif status not in ("pending", "sending", "success", "failed", "skipped"):
+        return jsonify({"success": False, "error": "invalid status"}), 400
+    workers = data.get("workers")
+    try:
+        report = dry_run_job(job_id, status=status, workers=int(workers) if workers else None)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    if report is None:
+        return jsonify({"success": False, "error": "job not found"}), 404
+    return jsonify({"success": True, **report})
+
+
+JOB_STATUSES = ("queued", "running", "paused", "stopped", "completed", "error")
+
+
+def _encode_job_cursor(row) -> str:
+    created_at = row["created_at"]
+    if isinstance(created_at, datetime):
+        created_at = created_at.strftime("%Y-%m-%d %H:%M:%S.%f")
+    raw = json.dumps([str(created_at), row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_job_cursor(cursor: str):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    created_at, job_id = json.loads(raw.decode("utf-8"))
+    return str(created_at), str(job_id)
+
+
+@bp.route("/jobs", methods=["GET"])
+def jobs_list():
+    """Tenant job listing, newest first, keyset-paginated on (created_at, id) via an opaque cursor."""
+    try:
+        master_user_id = request.args.get("master_user_id", "")
+        store_id = request.args.get("store_id", "")
+        if not master_user_id or not store_id:
+            return jsonify({"success": False, "error": "missing master_user_id/store_id"}), 400
+        status = request.args.get("status") or None
+        if status and status not in JOB_STATUSES:
+            return jsonify({"success": False, "error": "invalid status"}), 400
+        since = request.args.get("since") or None
+        if since:
+            try:
+                dt = datetime.fromisoformat(since.replace("Z", "+00:00"))
+                if dt.tzinfo is not None:
+                    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+                since = dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+            except Exception:
+                return jsonify({"success": False, "error": "invalid since"}), 400
+        before = None
+        if request.args.get("cursor"):
+            try:
+                before = _decode_job_cursor(request.args["cursor"])
+            except Exception:
+                return jsonify({"success": False, "error": "invalid cursor"}), 400
+        limit = max(1, min(int(request.args.get("limit", "50")), 200))
+        # one extra row tells whether another page exists
+        rows = list_jobs(master_user_id, store_id, status=status, since=since, before=before, limit=limit + 1)
+        next_cursor = _encode_job_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return jsonify({"success": True, "items": rows[:limit], "next_cursor": next_cursor})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
 
 
 @bp.route("/jobs/<string:job_id>", methods=["GET"])
@@ -224,18 +406,204 @@ def jobs_get(job_id: str):
     row = get_job(job_id)
     if not row:
         return jsonify({"success": False, "error": "not found"}), 404
-    return jsonify({"success": True, "job": row, "recipients": len(list_job_recipients(job_id))})
+    return jsonify({"success": True, "job": row, "recipients": row.get("total") or 0})
+
+
+def _wants_breakdown(value) -> bool:
+    return (value or "false").strip().lower() in ("1", "true", "yes")
+
+
+def job_status_body(counters: dict, by_status=None) -> str:
+    """JSON body of /jobs/<id>/status (shared with the ASGI app, which computes the same ETag)."""
+    status = {
+        "job_id": counters["id"],
+        "status": counters["status"],
+        "total": counters["total"],
+        "success": counters["success_count"],
+        "failed": counters["failure_count"],
+        "created_at": counters["created_at"],
+        "started_at": counters["started_at"],
+        "completed_at": counters["completed_at"],
+    }
+    if by_status is not None:
+        status["recipients_by_status"] = by_status
+    return json.dumps({"success": True, "status": status}, default=str, sort_keys=True)
+
+
+@bp.route("/jobs/<string:job_id>/status", methods=["GET"])
+def jobs_status(job_id: str):
+    """Lightweight status from jobs counters; ?breakdown=true adds per-status recipient counts."""
+    try:
+        counters = get_job_counters(job_id)
+        if not counters:
+            return jsonify({"success": False, "error": "not found"}), 404
+        by_status = None
+        if _wants_breakdown(request.args.get("breakdown")):
+            by_status = count_job_recipients_by_status(job_id)
+        body = job_status_body(counters, by_status)
+        resp = Response(body, mimetype="application/json")
+        resp.set_etag(hashlib.sha1(body.encode("utf-8")).hexdigest())
+        resp.headers["Cache-Control"] = "no-cache"
+        # If-None-Match matching the current ETag -> 304 without a body
+        return resp.make_conditional(request)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
 
 
 @bp.route("/jobs/<string:job_id>/events", methods=["GET"])
 def jobs_events(job_id: str):
     try:
-        items = list_job_events(job_id)
-        return jsonify({"success": True, "events": items})
+        after_id = request.args.get("after_id")
+        after_id = int(after_id) if after_id not in (None, "") else None
+        limit = max(1, min(int(request.args.get("limit", "500")), 5000))
+        items = list_job_events(job_id, after_id=after_id, limit=limit)
+        next_after_id = items[-1]["id"] if len(items) == limit else None
+        return jsonify({"success": True, "events": items, "next_after_id": next_after_id})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# ===== Live job progress (Server-Sent Events) =====
+TERMINAL_JOB_STATUSES = ("completed", "stopped", "error")
+SSE_HEARTBEAT_SEC = 15
+# DB fallback polling when the job runs in another process (no local bus channel)
+SSE_DB_POLL_SEC = 5
+
+
+def _sse(event: str, data, event_id=None) -> str:
+    out = f"id: {event_id}\n" if event_id is not None else ""
+    return out + f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _counters_progress(counters) -> dict:
+    return {
+        "status": counters.get("status"),
+        "total": counters.get("total"),
+        "success": counters.get("success_count"),
+        "failed": counters.get("failure_count"),
+    }
+
+
+class _JobStream:
+    """
+    SSE framing and end detection for one job stream. The generator below (WSGI) and
+    src.asgi_app (event loop) drive it with their own waiting and DB reads.
+    """
+
+    def __init__(self, job_id: str, after_seq: int, counters: dict, max_sec: int, bus=None):
+        self.bus = bus or get_event_bus()
+        self.job_id = job_id
+        self.after_seq = after_seq
+        self.snapshot = _counters_progress(counters)
+        now = time.monotonic()
+        self.deadline = now + max_sec
+        self.last_beat = self.last_poll = now
+        self.done = False
+
+    def running(self) -> bool:
+        return not self.done and time.monotonic() < self.deadline
+
+    def open(self) -> list:
+        chunks = ["retry: 3000\n\n", _sse("progress", self.snapshot)]
+        if self.snapshot["status"] in TERMINAL_JOB_STATUSES or self.bus.is_finished(self.job_id, self.after_seq):
+            chunks += self._finish()
+        return chunks
+
+    def deliver(self, events, gap: bool, fresh) -> list:
+        """Frames bus events; `fresh` is the job's counters, read by the caller when there is a gap."""
+        now = time.monotonic()
+        chunks = []
+        if gap:
+            # position no longer buffered here: resend a snapshot, then continue live
+            if fresh:
+                self.snapshot = _counters_progress(fresh)
+                chunks.append(_sse("progress", self.snapshot))
+            if not events:
+                self.after_seq = self.bus.last_seq(self.job_id)
+        for seq, event_type, data in events:
+            self.after_seq = seq
+            chunks.append(_sse(event_type, data, seq))
+            self.last_beat = now
+            if event_type in TERMINAL_EVENTS:
+                self.done = True
+                chunks.append(_sse("end", data.get("progress") or data))
+                return chunks
+        if self.bus.is_finished(self.job_id, self.after_seq):
+            # caught up with a finished channel (e.g. resumed at the terminal event's id)
+            chunks += self._finish()
+        return chunks
+
+    def poll_due(self) -> bool:
+        poll_every = SSE_DB_POLL_SEC if not self.bus.has_job(self.job_id) else SSE_DB_POLL_SEC * 6
+        return not self.done and time.monotonic() - self.last_poll >= poll_every
+
+    def polled(self, fresh) -> list:
+        now = time.monotonic()
+        self.last_poll = now
+        chunks = []
+        if fresh:
+            progress = _counters_progress(fresh)
+            if progress != self.snapshot:
+                self.snapshot = progress
+                chunks.append(_sse("progress", self.snapshot))
+                self.last_beat = now
+            if progress["status"] in TERMINAL_JOB_STATUSES:
+                chunks += self._finish()
+        return chunks
+
+    def heartbeat(self) -> list:
+        now = time.monotonic()
+        if self.done or now - self.last_beat < SSE_HEARTBEAT_SEC:
+            return []
+        self.last_beat = now
+        return [": ping\n\n"]
+
+    def _finish(self) -> list:
+        # the job is over: replay what is still buffered past the client's position, then end
+        events, gap = self.bus.read(self.job_id, self.after_seq)
+        chunks = self.deliver(events, False, None) if events and not gap else []
+        if not self.done:
+            self.done = True
+            chunks.append(_sse("end", self.snapshot))
+        return chunks
+
+
+def _job_stream(job_id: str, after_seq: int, counters: dict, max_sec: int):
+    stream = _JobStream(job_id, after_seq, counters, max_sec)
+    yield from stream.open()
+    while stream.running():
+        events, gap = stream.bus.read(job_id, stream.after_seq, timeout=1.0)
+        yield from stream.deliver(events, gap, get_job_counters(job_id) if gap else None)
+        if stream.poll_due():
+            yield from stream.polled(get_job_counters(job_id))
+        yield from stream.heartbeat()
+
+
+@bp.route("/jobs/<string:job_id>/stream", methods=["GET"])
+def jobs_stream(job_id: str):
+    try:
+        counters = get_job_counters(job_id)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    if not counters:
+        return jsonify({"success": False, "error": "not found"}), 404
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or "0"
+    try:
+        after_seq = max(0, int(last_id))
+    except ValueError:
+        after_seq = 0
+    # streams end after max_sec; EventSource reconnects with Last-Event-ID
+    try:
+        max_sec = max(1, min(int(request.args.get("timeout", "300")), 3600))
+    except ValueError:
+        return jsonify({"success": False, "error": "invalid timeout"}), 400
+    return Response(
+        stream_with_context(_job_stream(job_id, after_seq, counters, max_sec)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @bp.route("/jobs/<string:job_id>/pause", methods=["POST"])
 def jobs_pause(job_id: str):
     ok, resp = _require_api_key()
@@ -302,6 +670,11 @@ def templates_list():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@bp.route("/templates/cache_stats", methods=["GET"])
+def templates_cache_stats():
+    return jsonify({"success": True, "stats": get_template_store().get_stats()})
+
+
 @bp.route("/templates/<int:tpl_id>", methods=["GET"])
 def templates_get(tpl_id: int):
     try:
@@ -315,6 +688,33 @@ def templates_get(tpl_id: int):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@bp.route("/templates/<int:tpl_id>/validate", methods=["POST"])
+def templates_validate(tpl_id: int):
+    """Check a column list and/or job recipients against the template's precomputed placeholders."""
+    data = request.get_json() or {}
+    master_user_id = str(data.get("master_user_id", "") or "")
+    store_id = str(data.get("store_id", "") or "")
+    if not master_user_id or not store_id:
+        return jsonify({"success": False, "error": "missing master_user_id/store_id"}), 400
+    columns = data.get("columns")
+    recipients = data.get("recipients")
+    if columns is None and recipients is None:
+        return jsonify({"success": False, "error": "missing columns/recipients"}), 400
+    try:
+        tpl = get_template_store().get_db_template(master_user_id, store_id, tpl_id)
+        if not tpl:
+            return jsonify({"success": False, "error": "not found"}), 404
+        result = {"success": True, "template_parameters": tpl["params"]}
+        if columns is not None:
+            result["columns"] = validate_params(tpl["params"], columns)
+        if recipients is not None:
+            result["recipients"] = validate_recipient_params(recipients, lambda language: tpl["params"])
+        result["valid"] = all(result[k]["valid"] for k in ("columns", "recipients") if k in result)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @bp.route("/templates/<int:tpl_id>", methods=["PUT", "PATCH"])
 def templates_update(tpl_id: int):
     ok, resp = _require_api_key()
@@ -327,6 +727,7 @@ def templates_update(tpl_id: int):
         if not master_user_id or not store_id:
             return jsonify({"success": False, "error": "missing master_user_id/store_id"}), 400
         cnt = update_template(master_user_id, store_id, tpl_id, data)
+        get_template_store().invalidate_db_template(master_user_id, store_id, tpl_id)
         if cnt == 0:
             return jsonify({"success": False, "error": "not found or nothing changed"}), 404
         return jsonify({"success": True, "updated": cnt})
@@ -343,6 +744,7 @@ def templates_delete(tpl_id: int):
         master_user_id = request.args.get("master_user_id", "")
         store_id = request.args.get("store_id", "")
         cnt = delete_template(master_user_id, store_id, tpl_id)
+        get_template_store().invalidate_db_template(master_user_id, store_id, tpl_id)
         if cnt == 0:
             return jsonify({"success": False, "error": "not found"}), 404
         return jsonify({"success": True, "deleted": cnt})
@@ -414,6 +816,7 @@ def template_files_upload():
             tfm.save_content(mu, store, language, f.read().decode("utf-8", errors="ignore"))
         else:
             return jsonify({"success": False, "error": "kind must be subject|content"}), 400
+        get_template_store().invalidate_file_template(mu, store, language)
         return jsonify({"success": True, "language": language, "kind": kind})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
@@ -474,8 +877,9 @@ def template_files_delete(language: str):
         mu = request.args.get("master_user_id", "")
         store = request.args.get("store_id", "")
         kind = request.args.get("kind")  # subject|content|None
-        tfm = TemplateFileManager()
+        tfm = TemplateFileManager(get_config().get("FILES_ROOT"))
         removed = tfm.delete_language(mu, store, language, kind)
+        get_template_store().invalidate_file_template(mu, store, language)
         return jsonify({"success": True, "removed": removed})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
@@ -616,3 +1020,9 @@ def senders_delete(sender_id: int):
         return jsonify({"success": True, "deleted": deleted})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+
+
+# ===== Webhook delivery metrics =====
+@bp.route("/webhooks/metrics", methods=["GET"])
+def webhooks_metrics():
+    return jsonify({"success": True, "metrics": get_webhook_dispatcher().get_metrics()})
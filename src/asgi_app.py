@@ -0,0 +1,411 @@
+"""
+ASGI serving mode for the Email Assistant API.
+
+Long-held and frequently polled read endpoints are served natively on the event loop:
+
+    GET /api/health
+    GET /api/jobs/<id>/status     (same body/ETag/304 semantics as the Flask route)
+    GET /api/jobs/<id>/events
+    GET /api/jobs/<id>/stream     (Server-Sent Events)
+
+A waiting SSE client is a coroutine, not a thread: it wakes when the in-process event bus
+publishes to its job, and DB reads go through src.dao_async (bounded pool, coalesced
+counters). Every other request is handed to the Flask app (src.api_server:app) on a bounded
+thread pool, so the full API keeps working unchanged.
+
+    uvicorn src.asgi_app:app --host 0.0.0.0 --port 5000
+
+The WSGI deployment (gunicorn src.api_server:app) remains the default; see
+test/bench_asgi.py to compare the two modes.
+"""
+import asyncio
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl
+from uuid import UUID
+
+from src import dao_async
+from src.config import get_config
+from src.event_bus import get_event_bus
+
+# request bodies larger than this are spooled to disk before reaching Flask
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+def _json_default(o):
+    # same encodings as Flask's jsonify
+    if isinstance(o, date):
+        from werkzeug.http import http_date
+        return http_date(o)
+    if isinstance(o, (Decimal, UUID)):
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _json_body(payload: Any) -> bytes:
+    return json.dumps(payload, default=_json_default, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+async def _respond(send, status: int, body: bytes, content_type: str = "application/json",
+                   headers: Optional[List[Tuple[str, str]]] = None) -> None:
+    raw = [(b"content-type", content_type.encode("latin-1")), (b"content-length", str(len(body)).encode("latin-1"))]
+    raw += [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers or []]
+    await send({"type": "http.response.start", "status": status, "headers": raw})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _respond_json(send, status: int, payload: Any) -> None:
+    await _respond(send, status, _json_body(payload))
+
+
+class _Request:
+    def __init__(self, scope: Dict[str, Any]):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers") or []}
+
+
+class _JobWaiters:
+    """Wakes coroutines waiting on a job when the event bus publishes to it (from any thread)."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._waiting: Dict[str, Set[asyncio.Event]] = {}
+
+    def notify_threadsafe(self, job_id: str) -> None:
+        # event bus listener: runs on the publishing (sender) thread
+        if job_id in self._waiting:
+            try:
+                self._loop.call_soon_threadsafe(self._wake, job_id)
+            except RuntimeError:
+                pass  # loop closed
+
+    def _wake(self, job_id: str) -> None:
+        for ev in self._waiting.get(job_id, ()):
+            ev.set()
+
+    def register(self, job_id: str) -> asyncio.Event:
+        ev = asyncio.Event()
+        self._waiting.setdefault(job_id, set()).add(ev)
+        return ev
+
+    def unregister(self, job_id: str, ev: asyncio.Event) -> None:
+        waiters = self._waiting.get(job_id)
+        if waiters is not None:
+            waiters.discard(ev)
+            if not waiters:
+                del self._waiting[job_id]
+
+    @staticmethod
+    async def wait(ev: asyncio.Event, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(ev.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class _WsgiBridge:
+    """Runs a WSGI app for one ASGI request on a bounded thread pool, streaming its body."""
+
+    def __init__(self, load_app: Callable[[], Callable], threads: int):
+        self._load_app = load_app
+        self._app: Optional[Callable] = None
+        self._app_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="asgi-wsgi")
+
+    def get_app(self) -> Callable:
+        if self._app is None:
+            with self._app_lock:
+                if self._app is None:
+                    self._app = self._load_app()
+        return self._app
+
+    async def warm_up(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._pool, self.get_app)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    async def __call__(self, scope, receive, send) -> None:
+        loop = asyncio.get_running_loop()
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        length = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                return
+            chunk = message.get("body", b"")
+            if chunk:
+                body.write(chunk)
+                length += len(chunk)
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+        environ = self._environ(scope, body, length)
+        started: Dict[str, Any] = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = response_headers
+            return lambda data: started.setdefault("written", []).append(data)
+
+        def call():
+            result = self.get_app()(environ, start_response)
+            return result, iter(result)
+
+        result = None
+        try:
+            result, chunks = await loop.run_in_executor(self._pool, call)
+            sent_start = False
+            while True:
+                chunk = await loop.run_in_executor(self._pool, next, chunks, None)
+                if not sent_start:
+                    await send({
+                        "type": "http.response.start",
+                        "status": started["status"],
+                        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in started["headers"]],
+                    })
+                    sent_start = True
+                    for data in started.get("written", []):
+                        await send({"type": "http.response.body", "body": data, "more_body": True})
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            if result is not None and hasattr(result, "close"):
+                await loop.run_in_executor(self._pool, result.close)
+            body.close()
+
+    @staticmethod
+    def _environ(scope, body, length: int) -> Dict[str, Any]:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": str(server[0]),
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers") or []:
+            key = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                environ[key] = value
+                continue
+            key = "HTTP_" + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        if length or "CONTENT_LENGTH" in environ:
+            environ["CONTENT_LENGTH"] = str(length)
+        return environ
+
+
+def _load_flask_app():
+    # importing the server module also starts the JobRunner when JOB_RUNNER_ENABLED
+    from src.api_server import app
+    return app
+
+
+class AsgiApp:
+    """ASGI entry point: native async job status/events/stream, everything else via Flask."""
+
+    def __init__(self, wsgi_app: Optional[Callable] = None):
+        cfg = get_config()
+        self.fallback = _WsgiBridge((lambda: wsgi_app) if wsgi_app is not None else _load_flask_app, cfg["ASGI_WSGI_THREADS"])
+        self._waiters: Optional[_JobWaiters] = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        self._ensure_waiters()
+        req = _Request(scope)
+        if req.method == "GET":
+            if req.path == "/api/health":
+                await _respond_json(send, 200, {"status": "ok", "timestamp": datetime.now().isoformat()})
+                return
+            parts = req.path.split("/")
+            # ["", "api", "jobs", "<id>", "<action>"]
+            if len(parts) == 5 and parts[1] == "api" and parts[2] == "jobs" and parts[3]:
+                handler = {"status": self._status, "events": self._events, "stream": self._stream}.get(parts[4])
+                if handler is not None:
+                    await handler(req, parts[3], receive, send)
+                    return
+        await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._ensure_waiters()
+                try:
+                    await self.fallback.warm_up()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._waiters is not None:
+                    get_event_bus().remove_listener(self._waiters.notify_threadsafe)
+                    self._waiters = None
+                self.fallback.shutdown()
+                dao_async.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _ensure_waiters(self) -> None:
+        if self._waiters is None:
+            self._waiters = _JobWaiters(asyncio.get_running_loop())
+            get_event_bus().add_listener(self._waiters.notify_threadsafe)
+
+    # ----- /api/jobs/<id>/status -----
+    async def _status(self, req: _Request, job_id: str, receive, send) -> None:
+        from src.api_v2 import _wants_breakdown, job_status_body
+        try:
+            counters = await dao_async.get_job_counters(job_id, fresh=True)
+            if not counters:
+                await _respond_json(send, 404, {"success": False, "error": "not found"})
+                return
+            by_status = None
+            if _wants_breakdown(req.query.get("breakdown")):
+                by_status = await dao_async.count_job_recipients_by_status(job_id)
+            body = job_status_body(counters, by_status).encode("utf-8")
+        except Exception as e:
+            await _respond_json(send, 500, {"success": False, "error": str(e)})
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+        if _etag_matches(req.headers.get("if-none-match"), etag):
+            await send({
+                "type": "http.response.start", "status": 304,
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await _respond(send, 200, body, headers=headers)
+
+    # ----- /api/jobs/<id>/events -----
+    async def _events(self, req: _Request, job_id: str, receive, send) -> None:
+        try:
+            after_id = req.query.get("after_id")
+            after_id = int(after_id) if after_id not in (None, "") else None
+            limit = max(1, min(int(req.query.get("limit", "500")), 5000))
+            items = await dao_async.list_job_events(job_id, after_id=after_id, limit=limit)
+            next_after_id = items[-1]["id"] if len(items) == limit else None
+            await _respond_json(send, 200, {"success": True, "events": items, "next_after_id": next_after_id})
+        except Exception as e:
+            await _respond_json(send, 500, {"success": False, "error": str(e)})
+
+    # ----- /api/jobs/<id>/stream -----
+    async def _stream(self, req: _Request, job_id: str, receive, send) -> None:
+        try:
+            counters = await dao_async.get_job_counters(job_id, fresh=True)
+        except Exception as e:
+            await _respond_json(send, 500, {"success": False, "error": str(e)})
+            return
+        if not counters:
+            await _respond_json(send, 404, {"success": False, "error": "not found"})
+            return
+        last_id = req.headers.get("last-event-id") or req.query.get("last_event_id") or "0"
+        try:
+            after_seq = max(0, int(last_id))
+        except ValueError:
+            after_seq = 0
+        # streams end after max_sec; EventSource reconnects with Last-Event-ID
+        try:
+            max_sec = max(1, min(int(req.query.get("timeout", "300")), 3600))
+        except ValueError:
+            await _respond_json(send, 400, {"success": False, "error": "invalid timeout"})
+            return
+
+        await send({
+            "type": "http.response.start", "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        disconnected = asyncio.Event()
+        watcher = asyncio.ensure_future(_watch_disconnect(receive, disconnected))
+        try:
+            async for chunk in self._job_stream(job_id, after_seq, counters, max_sec, disconnected):
+                await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            pass  # client went away mid-write
+        finally:
+            watcher.cancel()
+
+    async def _job_stream(self, job_id: str, after_seq: int, counters: dict, max_sec: int, disconnected: asyncio.Event):
+        """Drives api_v2._JobStream (same framing and end detection as the WSGI route) on the event loop."""
+        from src.api_v2 import _JobStream
+        stream = _JobStream(job_id, after_seq, counters, max_sec, get_event_bus())
+        for chunk in stream.open():
+            yield chunk
+        while stream.running() and not disconnected.is_set():
+            # register before reading so a publish in between still wakes us
+            ev = self._waiters.register(job_id)
+            try:
+                events, gap = stream.bus.read(job_id, stream.after_seq)
+                if not events and not gap:
+                    await self._waiters.wait(ev, 1.0)
+                    events, gap = stream.bus.read(job_id, stream.after_seq)
+            finally:
+                self._waiters.unregister(job_id, ev)
+            chunks = stream.deliver(events, gap, await dao_async.get_job_counters(job_id) if gap else None)
+            if stream.poll_due():
+                # coalesced: clients watching the same job share one query per second
+                chunks += stream.polled(await dao_async.get_job_counters(job_id))
+            chunks += stream.heartbeat()
+            for chunk in chunks:
+                yield chunk
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag or tag == "W/" + etag:
+            return True
+    return False
+
+
+async def _watch_disconnect(receive, disconnected: asyncio.Event) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+def create_app(wsgi_app: Optional[Callable] = None) -> AsgiApp:
+    """Factory for ASGI servers; wsgi_app defaults to src.api_server:app (loaded at startup)."""
+    return AsgiApp(wsgi_app)
+
+
+app = create_app()
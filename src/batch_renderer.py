@@ -0,0 +1,196 @@
+"""
+批量模板渲染模块
+对过滤后的DataFrame按列渲染邮件：模板预先切分为「文本片段 + 参数名」，
+按「语言」分组后每种语言只解析一次模板，参数列整列转换为字符串后拼接；
+按块处理并以生成器逐条输出，块内保持原始行顺序，内存占用与块大小相关
+"""
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.template_compiler import PLACEHOLDER_PATTERN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKSIZE = 1000
+
+Segments = Tuple[List[str], List[str]]
+TemplateResolver = Callable[[str], Optional[Dict[str, Any]]]
+
+
+def compile_segments(template: Optional[str]) -> Segments:
+    """
+    把模板切分为文本片段与参数名：literals[0] + p0 + literals[1] + p1 + ... + literals[-1]
+
+    Returns:
+        元组：(文本片段列表, 参数名列表)，len(literals) == len(params) + 1
+    """
+    literals: List[str] = []
+    params: List[str] = []
+    pos = 0
+    for m in PLACEHOLDER_PATTERN.finditer(template or ""):
+        literals.append(template[pos:m.start()])
+        params.append(m.group(1))
+        pos = m.end()
+    literals.append((template or "")[pos:])
+    return literals, params
+
+
+def compile_template(subject: Optional[str], html: Optional[str], text: Optional[str]) -> Dict[str, Any]:
+    """预编译一种语言的模板（主题/HTML/纯文本），params 为引用的全部参数"""
+    compiled = {
+        "subject": compile_segments(subject) if subject else None,
+        "html": compile_segments(html) if html else None,
+        "text": compile_segments(text) if text else None,
+    }
+    params = set()
+    for seg in compiled.values():
+        if seg:
+            params.update(seg[1])
+    compiled["params"] = params
+    return compiled
+
+
+def file_template_resolver(template_manager) -> TemplateResolver:
+    """
+    基于 TemplateManager 文件模板的解析器（与 generate_email_content 的模板选择与回退规则一致）
+
+    Returns:
+        language -> {"subject", "html", "text", "errors"}
+    """
+    def resolve(language: str) -> Dict[str, Any]:
+        errors = []
+        subject = template_manager.load_subject_template(language)
+        if not subject:
+            errors.append(f"未找到语言 {language} 的主题模板")
+        html = template_manager.load_html_content_template(language)
+        if not html:
+            errors.append(f"未找到语言 {language} 的HTML内容模板")
+        text = template_manager.text_template(language) if html else None
+        return {"subject": subject, "html": html, "text": text, "errors": errors}
+    return resolve
+
+
+def column_strings(frame: pd.DataFrame, column: str) -> np.ndarray:
+    """参数列转换为字符串数组（空值渲染为空字符串）"""
+    col = frame[column]
+    return np.where(col.isna().to_numpy(), "", col.astype(str).to_numpy()).astype(object)
+
+
+def render_segments(segments: Segments, frame: pd.DataFrame, cache: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    按列渲染一个模板片段序列
+
+    不存在的列保留原占位符（与逐行替换的行为一致）。
+
+    Args:
+        cache: 本组已转换的参数列（列名 -> 字符串数组），跨主题/正文复用
+    """
+    literals, params = segments
+    n = len(frame)
+    out = np.full(n, literals[0], dtype=object)
+    for name, literal in zip(params, literals[1:]):
+        if name in frame.columns:
+            if name not in cache:
+                cache[name] = column_strings(frame, name)
+            out = out + cache[name]
+        else:
+            out = out + f"[{name}]"
+        if literal:
+            out = out + literal
+    return out
+
+
+def _render_group(
+    group: pd.DataFrame,
+    language: str,
+    compiled: Dict[str, Any],
+    errors: List[str],
+    email_column: str,
+) -> List[Tuple[int, Dict[str, Any]]]:
+    n = len(group)
+    cache: Dict[str, np.ndarray] = {}
+    empty = np.full(n, "", dtype=object)
+    subjects = render_segments(compiled["subject"], group, cache) if compiled["subject"] else empty
+    htmls = render_segments(compiled["html"], group, cache) if compiled["html"] else empty
+    texts = render_segments(compiled["text"], group, cache) if compiled["text"] else empty
+
+    missing = sorted(p for p in compiled["params"] if p not in group.columns)
+    present = sorted(p for p in compiled["params"] if p in group.columns)
+    # 每行值为空的参数（矩阵 n × 参数数）
+    empty_mask = group[present].isna().to_numpy() if present else np.zeros((n, 0), dtype=bool)
+    rows_with_empty = set(np.flatnonzero(empty_mask.any(axis=1)).tolist()) if present else set()
+
+    out = []
+    for i, (pos, to_email) in enumerate(zip(group["__pos__"].tolist(), group[email_column].tolist())):
+        out.append((pos, {
+            "index": pos,
+            "to_email": to_email,
+            "language": language,
+            "subject": subjects[i],
+            "html_content": htmls[i],
+            "content": texts[i],
+            "missing": missing,
+            "empty": [present[j] for j in np.flatnonzero(empty_mask[i])] if i in rows_with_empty else [],
+            "errors": errors,
+        }))
+    return out
+
+
+def render_frame(
+    df: pd.DataFrame,
+    resolve: TemplateResolver,
+    email_column: str = "邮箱",
+    language_column: str = "语言",
+    default_language: str = "English",
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    include_row: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """
+    按列批量渲染DataFrame中的每一行
+
+    Args:
+        df: 过滤后的数据（需包含邮箱列）
+        resolve: language -> {"subject", "html", "text", "errors"}（每种语言只调用一次）
+        include_row: 是否在结果中附带该行数据（row_data，供发送时使用）
+
+    Yields:
+        {"index", "to_email", "language", "subject", "html_content", "content",
+         "missing": 表格中不存在的参数, "empty": 本行值为空的参数, "errors", ["row"]}
+        index 为行在 df 中的位置（从0开始），输出顺序与 df 行顺序一致
+    """
+    compiled_by_language: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+    columns = list(df.columns)
+    chunksize = max(1, int(chunksize))
+
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize].copy()
+        chunk["__pos__"] = np.arange(start, start + len(chunk))
+        if language_column in chunk.columns:
+            languages = chunk[language_column].astype(object).where(chunk[language_column].notna(), default_language)
+        else:
+            languages = pd.Series(default_language, index=chunk.index)
+        chunk["__lang__"] = languages.astype(str).to_numpy()
+
+        rendered: List[Tuple[int, Dict[str, Any]]] = []
+        for language, group in chunk.groupby("__lang__", sort=False):
+            if language not in compiled_by_language:
+                tpl = resolve(language) or {}
+                compiled_by_language[language] = (
+                    compile_template(tpl.get("subject"), tpl.get("html"), tpl.get("text")),
+                    list(tpl.get("errors") or []),
+                )
+            compiled, errors = compiled_by_language[language]
+            rendered.extend(_render_group(group, language, compiled, errors, email_column))
+        rendered.sort(key=lambda item: item[0])
+
+        if include_row:
+            records = chunk[columns].to_dict("records")
+            for (pos, msg) in rendered:
+                msg["row"] = records[pos - start]
+                yield msg
+        else:
+            for _, msg in rendered:
+                yield msg
@@ -28,4 +28,46 @@ def get_config():
         "ALLOW_DEV_LOCALHOST": os.getenv("ALLOW_DEV_LOCALHOST", "false").lower() == "true",
         # Absolute path to files root; defaults to project_root/files
         "FILES_ROOT": os.getenv("FILES_ROOT", default_files_root),
+        # Background webhook delivery (see src/webhook_dispatcher.py)
+        "WEBHOOK_QUEUE_SIZE": int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000")),
+        "WEBHOOK_WORKERS": int(os.getenv("WEBHOOK_WORKERS", "2")),
+        "WEBHOOK_MAX_ATTEMPTS": int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5")),
+        "WEBHOOK_TIMEOUT_SEC": float(os.getenv("WEBHOOK_TIMEOUT_SEC", "5")),
+        # >1 enables batch mode: POST {"events": [...]} with up to N events
+        "WEBHOOK_BATCH_MAX": int(os.getenv("WEBHOOK_BATCH_MAX", "1")),
+        # Per-recipient job events: full | sampled | aggregated (see src/job_events.py)
+        "JOB_EVENTS_GRANULARITY": os.getenv("JOB_EVENTS_GRANULARITY", "full").strip().lower(),
+        "JOB_EVENTS_SAMPLE_EVERY": int(os.getenv("JOB_EVENTS_SAMPLE_EVERY", "100")),
+        "JOB_EVENTS_BUCKET_SEC": int(os.getenv("JOB_EVENTS_BUCKET_SEC", "60")),
+        # Retention: events older than N days are pruned in batches (0 disables)
+        "JOB_EVENTS_RETENTION_DAYS": int(os.getenv("JOB_EVENTS_RETENTION_DAYS", "0")),
+        "JOB_EVENTS_ARCHIVE": os.getenv("JOB_EVENTS_ARCHIVE", "false").lower() == "true",
+        # Running jobs hold a lease renewed by a heartbeat; expired leases are requeued by the reaper
+        "JOB_LEASE_SEC": int(os.getenv("JOB_LEASE_SEC", "120")),
+        "JOB_HEARTBEAT_SEC": int(os.getenv("JOB_HEARTBEAT_SEC", "30")),
+        # Run the JobRunner inside the API process; set false for API-only workers and run
+        # `python -m src.job_runner` as a separate process instead
+        "JOB_RUNNER_ENABLED": os.getenv("JOB_RUNNER_ENABLED", "true").lower() == "true",
+        # JobRunner worker pool and fair-share dispatch across tenants (see src/fair_scheduler.py)
+        "JOB_RUNNER_WORKERS": int(os.getenv("JOB_RUNNER_WORKERS", "4")),
+        "FAIR_QUANTUM": int(os.getenv("FAIR_QUANTUM", "500")),
+        "TENANT_MAX_CONCURRENT_JOBS": int(os.getenv("TENANT_MAX_CONCURRENT_JOBS", "1")),
+        # Recipients per tenant per UTC day (0 = unlimited)
+        "TENANT_DAILY_QUOTA": int(os.getenv("TENANT_DAILY_QUOTA", "0")),
+        # Per-tenant overrides, JSON: {"<master_user_id>:<store_id>": {"weight": 2, "max_concurrent": 3, "daily_quota": 5000}}
+        "TENANT_LIMITS": os.getenv("TENANT_LIMITS", ""),
+        # Per-sender daily send cap shared by all jobs (0 = unlimited; Gmail allows ~500/day, Workspace ~2000)
+        "SENDER_DAILY_CAP": int(os.getenv("SENDER_DAILY_CAP", "0")),
+        # Per-sender overrides, JSON: {"sender@example.com": 2000}
+        "SENDER_DAILY_CAPS": os.getenv("SENDER_DAILY_CAPS", ""),
+        # Legacy Excel sends append statuses to <workbook>.status.jsonl and compact in batches (see src/status_journal.py)
+        "EXCEL_JOURNAL_COMPACT_EVERY": int(os.getenv("EXCEL_JOURNAL_COMPACT_EVERY", "200")),
+        "EXCEL_JOURNAL_COMPACT_SEC": float(os.getenv("EXCEL_JOURNAL_COMPACT_SEC", "60")),
+        # ASGI mode (src/asgi_app.py): threads for blocking DB calls, and for requests handed to the Flask app
+        "ASYNC_DB_THREADS": int(os.getenv("ASYNC_DB_THREADS", "8")),
+        "ASGI_WSGI_THREADS": int(os.getenv("ASGI_WSGI_THREADS", "32")),
+        # Dry-run rendering (see src/dry_run.py): worker processes, and the size above which a message is flagged
+        # (Gmail clips HTML bodies larger than ~102KB)
+        "DRY_RUN_WORKERS": int(os.getenv("DRY_RUN_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        "DRY_RUN_MAX_MESSAGE_BYTES": int(os.getenv("DRY_RUN_MAX_MESSAGE_BYTES", str(102 * 1024))),
     }
@@ -0,0 +1,98 @@
+"""
+Async facade over src.dao_mysql for the ASGI app (src/asgi_app.py).
+
+PyMySQL is blocking, so each call runs on a dedicated, bounded thread pool
+(ASYNC_DB_THREADS). Thousands of waiting clients then share a handful of DB
+connections instead of holding a thread each. Reads that many clients poll
+for the same job are coalesced into one query.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src import dao_mysql
+from src.config import get_config
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = max(1, get_config()["ASYNC_DB_THREADS"])
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dao-async")
+    return _executor
+
+
+async def run(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking DAO call on the DB thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(fn, *args, **kwargs))
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+class _Coalescer:
+    """Single-flight per key: concurrent callers share one in-flight query, and a
+    result younger than max_age is served without querying again."""
+
+    def __init__(self, fn: Callable[[str], Any], max_age: float):
+        self.fn = fn
+        self.max_age = max_age
+        # key -> (loop, fetched_at, future); one event loop per process in practice
+        self._entries: Dict[str, Tuple[Any, float, "asyncio.Future"]] = {}
+
+    async def get(self, key: str) -> Any:
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is loop:
+            _, fetched_at, fut = entry
+            if not fut.done() or (now - fetched_at < self.max_age and not fut.cancelled() and fut.exception() is None):
+                return await asyncio.shield(fut)
+        fut = asyncio.ensure_future(run(self.fn, key))
+        self._entries[key] = (loop, now, fut)
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            if len(self._entries) > 10000:
+                self._gc(now)
+
+    def _gc(self, now: float) -> None:
+        stale = [k for k, (_, t, f) in self._entries.items() if f.done() and now - t >= self.max_age]
+        for k in stale:
+            del self._entries[k]
+
+
+_counters = _Coalescer(lambda job_id: dao_mysql.get_job_counters(job_id), max_age=1.0)
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return await run(dao_mysql.get_job, job_id)
+
+
+async def get_job_counters(job_id: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+    """Job counters; unless fresh=True, a result up to 1s old may be shared with other clients."""
+    if fresh:
+        return await run(dao_mysql.get_job_counters, job_id)
+    return await _counters.get(job_id)
+
+
+async def count_job_recipients_by_status(job_id: str) -> Dict[str, int]:
+    return await run(dao_mysql.count_job_recipients_by_status, job_id)
+
+
+async def list_job_events(job_id: str, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    return await run(dao_mysql.list_job_events, job_id, after_id=after_id, limit=limit)
@@ -1,10 +1,11 @@
 import json
 import os
 import pymysql
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import uuid
 import logging
 import time
+from datetime import timedelta
 
 from src.config import get_config
 
@@ -90,9 +91,11 @@ def get_sender_account(master_user_id: str, store_id: str, email: str) -> Option
 
 # Templates minimal CRUD
 def create_template(data: Dict[str, Any]) -> int:
+    from src.template_compiler import compile_html_template
+
     sql = (
-        "INSERT INTO templates (master_user_id, store_id, name, language, subject, html_content, text_content, version, is_active)"
-        " VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)"
+        "INSERT INTO templates (master_user_id, store_id, name, language, subject, html_content, text_content, version, is_active, compiled_json)"
+        " VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
     )
     args = (
         data["master_user_id"],
@@ -104,6 +107,7 @@ def create_template(data: Dict[str, Any]) -> int:
         data.get("text_content"),
         int(data.get("version", 1)),
         1 if data.get("is_active", True) else 0,
+        json.dumps(compile_html_template(data["html_content"])),
     )
     with _conn() as conn:
         with conn.cursor() as cur:
@@ -119,6 +123,15 @@ def get_template(master_user_id: str, store_id: str, template_id: int) -> Option
             return cur.fetchone()
 
 
+def get_template_stamp(master_user_id: str, store_id: str, template_id: int) -> Optional[Dict[str, Any]]:
+    """Lightweight lookup (no content columns) used to validate cached templates."""
+    sql = "SELECT id, version, updated_at FROM templates WHERE id=%s AND master_user_id=%s AND store_id=%s"
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (template_id, master_user_id, store_id))
+            return cur.fetchone()
+
+
 def list_templates(master_user_id: str, store_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
     sql = "SELECT * FROM templates WHERE master_user_id=%s AND store_id=%s ORDER BY id DESC LIMIT %s OFFSET %s"
     with _conn() as conn:
@@ -139,6 +152,12 @@ def update_template(master_user_id: str, store_id: str, template_id: int, update
             args.append(val)
     if not fields:
         return 0
+    if "html_content" in updates:
+        # keep the precompiled form (html, text, params + <img id> manifest) in sync; cids are rewritten at send time
+        from src.template_compiler import compile_html_template
+
+        fields.append("compiled_json=%s")
+        args.append(json.dumps(compile_html_template(updates["html_content"])))
     sql = f"UPDATE templates SET {', '.join(fields)}, updated_at=CURRENT_TIMESTAMP(6) WHERE id=%s AND master_user_id=%s AND store_id=%s"
     args.extend([template_id, master_user_id, store_id])
     with _conn() as conn:
@@ -147,6 +166,15 @@ def update_template(master_user_id: str, store_id: str, template_id: int, update
             return cur.rowcount
 
 
+def set_template_compiled(template_id: int, compiled: Dict[str, Any]) -> int:
+    """Backfill compiled_json without touching updated_at (which keys the template caches)."""
+    sql = "UPDATE templates SET compiled_json=%s, updated_at=updated_at WHERE id=%s"
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (json.dumps(compiled), template_id))
+            return cur.rowcount
+
+
 def delete_template(master_user_id: str, store_id: str, template_id: int) -> int:
     sql = "DELETE FROM templates WHERE id=%s AND master_user_id=%s AND store_id=%s"
     with _conn() as conn:
@@ -193,12 +221,17 @@ def create_job(
     max_interval: int,
     webhook_url: Optional[str] = None,
     schedule_at: Optional[str] = None,
+    priority: int = 0,
+    sender_pool: Optional[List[str]] = None,
+    status: str = "queued",
+    source_file: Optional[str] = None,
 ) -> str:
+    """`status='paused'` keeps the runner away until recipients are fully added (see src/excel_job_importer.py)."""
     job_id = str(uuid.uuid4())
     sql = (
-        "INSERT INTO jobs (id, master_user_id, store_id, type, sender_email, template_id, subject, content, html_content,"
-        " min_interval, max_interval, schedule_at, total, success_count, failure_count, status, webhook_url)"
-        " VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,0,0,0,'queued',%s)"
+        "INSERT INTO jobs (id, master_user_id, store_id, type, sender_email, sender_pool, template_id, subject, content,"
+        " html_content, min_interval, max_interval, schedule_at, priority, total, success_count, failure_count, status,"
+        " webhook_url, source_file) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,0,0,0,%s,%s,%s)"
     )
     with _conn() as conn:
         with conn.cursor() as cur:
@@ -210,6 +243,7 @@ def create_job(
                     store_id,
                     job_type,
                     sender_email,
+                    json.dumps(sender_pool) if sender_pool else None,
                     template_id,
                     subject,
                     content,
@@ -217,7 +251,10 @@ def create_job(
                     min_interval,
                     max_interval,
                     schedule_at,
+                    priority,
+                    status,
                     webhook_url,
+                    source_file,
                 ),
             )
     return job_id
@@ -230,22 +267,16 @@ def add_job_recipients(job_id: str, recipients: List[Dict[str, Any]]) -> int:
         "INSERT INTO job_recipients (job_id, to_email, language, variables, status)"
         " VALUES (%s,%s,%s,%s,'pending')"
     )
-    count = 0
+    rows = [
+        (job_id, r.get("to_email"), r.get("language"), json.dumps(r.get("variables", {})))
+        for r in recipients
+    ]
     with _conn() as conn:
         with conn.cursor() as cur:
-            for r in recipients:
-                cur.execute(
-                    sql,
-                    (
-                        job_id,
-                        r.get("to_email"),
-                        r.get("language"),
-                        json.dumps(r.get("variables", {})),
-                    ),
-                )
-                count += 1
-            cur.execute("UPDATE jobs SET total = total + %s WHERE id=%s", (count, job_id))
-    return count
+            # pymysql rewrites executemany INSERT ... VALUES into multi-row statements
+            cur.executemany(sql, rows)
+            cur.execute("UPDATE jobs SET total = total + %s WHERE id=%s", (len(rows), job_id))
+    return len(rows)
 
 
 def list_job_recipients(job_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -261,6 +292,36 @@ def list_job_recipients(job_id: str, status: Optional[str] = None) -> List[Dict[
             return cur.fetchall()
 
 
+def iter_job_recipients(job_id: str, status: Optional[str] = None, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """Yield recipients in id order, one page at a time (keyset pagination on id)."""
+    last_id = 0
+    while True:
+        if status:
+            sql = "SELECT * FROM job_recipients WHERE job_id=%s AND status=%s AND id>%s ORDER BY id LIMIT %s"
+            args = (job_id, status, last_id, batch_size)
+        else:
+            sql = "SELECT * FROM job_recipients WHERE job_id=%s AND id>%s ORDER BY id LIMIT %s"
+            args = (job_id, last_id, batch_size)
+        with _conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, args)
+                rows = cur.fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def list_job_recipient_statuses(job_id: str) -> List[Dict[str, Any]]:
+    """(to_email, status) only, without the variables JSON."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_email, status FROM job_recipients WHERE job_id=%s ORDER BY id", (job_id,))
+            return cur.fetchall()
+
+
 def get_job(job_id: str) -> Optional[Dict[str, Any]]:
     with _conn() as conn:
         with conn.cursor() as cur:
@@ -268,6 +329,62 @@ def get_job(job_id: str) -> Optional[Dict[str, Any]]:
             return cur.fetchone()
 
 
+def get_job_counters(job_id: str) -> Optional[Dict[str, Any]]:
+    """Status and counters only (no content columns); cheap enough to poll."""
+    sql = (
+        "SELECT id, status, total, success_count, failure_count, created_at, started_at, completed_at"
+        " FROM jobs WHERE id=%s"
+    )
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (job_id,))
+            return cur.fetchone()
+
+
+def count_job_recipients_by_status(job_id: str) -> Dict[str, int]:
+    """Recipient counts per status, answered from the (job_id, status) index."""
+    sql = "SELECT status, COUNT(*) AS cnt FROM job_recipients WHERE job_id=%s GROUP BY status"
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (job_id,))
+            return {r["status"]: int(r["cnt"]) for r in cur.fetchall()}
+
+
+# listing projection: everything except the content/html_content mediumtext columns
+JOB_LIST_COLUMNS = (
+    "id, master_user_id, store_id, type, sender_email, sender_pool, template_id, subject, min_interval, max_interval,"
+    " total, success_count, failure_count, status, priority, locked_by, heartbeat_at, webhook_url, source_file, schedule_at, created_at, started_at, completed_at"
+)
+
+
+def list_jobs(
+    master_user_id: str,
+    store_id: str,
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    before: Optional[Tuple[str, str]] = None,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    """Newest first; `before` is the (created_at, id) keyset cursor of the previous page's last row."""
+    where = ["master_user_id=%s", "store_id=%s"]
+    args: List[Any] = [master_user_id, store_id]
+    if status:
+        where.append("status=%s")
+        args.append(status)
+    if since:
+        where.append("created_at>=%s")
+        args.append(since)
+    if before:
+        where.append("(created_at<%s OR (created_at=%s AND id<%s))")
+        args.extend([before[0], before[0], before[1]])
+    sql = f"SELECT {JOB_LIST_COLUMNS} FROM jobs WHERE {' AND '.join(where)} ORDER BY created_at DESC, id DESC LIMIT %s"
+    args.append(limit)
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, args)
+            return cur.fetchall()
+
+
 def get_next_queued_job() -> Optional[Dict[str, Any]]:
     sql = (
         "SELECT * FROM jobs WHERE status='queued' AND schedule_at IS NOT NULL AND schedule_at<=NOW()"
@@ -299,21 +416,209 @@ def get_next_queued_job() -> Optional[Dict[str, Any]]:
         raise
 
 
-def claim_job(job_id: str) -> bool:
+def list_due_queued_jobs(per_tenant: int = 3) -> List[Dict[str, Any]]:
+    """Due queued jobs, at most `per_tenant` per (master_user_id, store_id), so one
+    tenant's backlog cannot hide the others from the fair scheduler."""
+    sql = (
+        "SELECT id, master_user_id, store_id, type, sender_email, priority, total, schedule_at, created_at FROM ("
+        " SELECT id, master_user_id, store_id, type, sender_email, priority, total, schedule_at, created_at,"
+        " ROW_NUMBER() OVER (PARTITION BY master_user_id, store_id ORDER BY priority DESC, schedule_at, created_at) AS rn"
+        " FROM jobs WHERE status='queued' AND schedule_at IS NOT NULL AND schedule_at<=NOW()"
+        ") q WHERE rn<=%s"
+    )
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (per_tenant,))
+            return cur.fetchall()
+
+
+def count_running_jobs_by_tenant() -> Dict[Tuple[str, str], int]:
+    sql = "SELECT master_user_id, store_id, COUNT(*) AS cnt FROM jobs WHERE status='running' GROUP BY master_user_id, store_id"
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            return {(r["master_user_id"], r["store_id"]): int(r["cnt"]) for r in cur.fetchall()}
+
+
+def defer_job(job_id: str, schedule_at: str) -> bool:
+    """Put a running job back in the queue until schedule_at (quota exhausted etc.)."""
     with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "UPDATE jobs SET status='running', started_at=NOW() WHERE id=%s AND status='queued'",
-                (job_id,),
+                "UPDATE jobs SET status='queued', schedule_at=%s, locked_by=NULL, lease_expires_at=NULL"
+                " WHERE id=%s AND status='running'",
+                (schedule_at, job_id),
             )
             return cur.rowcount == 1
 
 
-def list_job_events(job_id: str) -> List[Dict[str, Any]]:
-    sql = "SELECT * FROM job_events WHERE job_id=%s ORDER BY created_at"
+def add_tenant_usage(master_user_id: str, store_id: str, sent: int = 1) -> None:
+    sql = (
+        "INSERT INTO tenant_daily_usage (usage_date, master_user_id, store_id, sent_count)"
+        " VALUES (UTC_DATE(), %s, %s, %s) ON DUPLICATE KEY UPDATE sent_count=sent_count+VALUES(sent_count)"
+    )
     with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (job_id,))
+            cur.execute(sql, (master_user_id, store_id, sent))
+
+
+def get_tenant_usage_today(master_user_id: str, store_id: str) -> int:
+    sql = "SELECT sent_count FROM tenant_daily_usage WHERE usage_date=UTC_DATE() AND master_user_id=%s AND store_id=%s"
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (master_user_id, store_id))
+            row = cur.fetchone()
+            return int(row["sent_count"]) if row else 0
+
+
+def list_tenant_usage_today() -> Dict[Tuple[str, str], int]:
+    sql = "SELECT master_user_id, store_id, sent_count FROM tenant_daily_usage WHERE usage_date=UTC_DATE()"
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            return {(r["master_user_id"], r["store_id"]): int(r["sent_count"]) for r in cur.fetchall()}
+
+
+def reserve_sender_slot(sender_email: str, gap_sec: float, daily_cap: int = 0) -> Dict[str, Any]:
+    """Reserve the sender's next send slot (shared by all jobs/processes) unless the daily cap is reached.
+
+    The reservation counts toward the cap until record_sender_send (sent) or release_sender_slot
+    (not sent) settles it, so concurrent jobs cannot overshoot the cap with sends in flight.
+    Returns {"allowed", "wait_sec", "sent_count"}; the row is locked for the read-modify-write.
+    """
+    key = "usage_date=UTC_DATE() AND sender_email=%s"
+    with _conn() as conn:
+        conn.begin()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("INSERT IGNORE INTO sender_daily_usage (usage_date, sender_email) VALUES (UTC_DATE(), %s)", (sender_email,))
+                cur.execute(
+                    f"SELECT sent_count, reserved_count, next_slot_at, UTC_TIMESTAMP(6) AS now_at"
+                    f" FROM sender_daily_usage WHERE {key} FOR UPDATE",
+                    (sender_email,),
+                )
+                row = cur.fetchone()
+                sent = int(row["sent_count"])
+                if daily_cap > 0 and sent + int(row["reserved_count"]) >= daily_cap:
+                    conn.commit()
+                    return {"allowed": False, "wait_sec": 0.0, "sent_count": sent}
+                now_at = row["now_at"]
+                slot = max(now_at, row["next_slot_at"] or now_at)
+                cur.execute(
+                    f"UPDATE sender_daily_usage SET next_slot_at=%s, reserved_count=reserved_count+1 WHERE {key}",
+                    (slot + timedelta(seconds=gap_sec), sender_email),
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return {"allowed": True, "wait_sec": (slot - now_at).total_seconds(), "sent_count": sent}
+
+
+def record_sender_send(sender_email: str) -> int:
+    """Count one successful send for today (settling its reservation); returns the sender's new daily total."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO sender_daily_usage (usage_date, sender_email, sent_count) VALUES (UTC_DATE(), %s, 1)"
+                " ON DUPLICATE KEY UPDATE reserved_count=GREATEST(reserved_count-1, 0), sent_count=LAST_INSERT_ID(sent_count+1)",
+                (sender_email,),
+            )
+            if cur.rowcount == 1:
+                return 1
+            cur.execute("SELECT LAST_INSERT_ID() AS n")
+            return int(cur.fetchone()["n"])
+
+
+def release_sender_slot(sender_email: str) -> None:
+    """Give back a reservation whose send did not happen (failed, skipped or deferred)."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE sender_daily_usage SET reserved_count=GREATEST(reserved_count-1, 0)"
+                " WHERE usage_date=UTC_DATE() AND sender_email=%s",
+                (sender_email,),
+            )
+
+
+def claim_job(job_id: str, worker_id: Optional[str] = None, lease_seconds: int = 120) -> bool:
+    """queued -> running under a lease held by worker_id; the owner renews it with renew_job_lease."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE jobs SET status='running', started_at=COALESCE(started_at, NOW()), locked_by=%s,"
+                " lease_expires_at=DATE_ADD(NOW(6), INTERVAL %s SECOND), heartbeat_at=NOW(6)"
+                " WHERE id=%s AND status='queued'",
+                (worker_id, int(lease_seconds), job_id),
+            )
+            return cur.rowcount == 1
+
+
+def renew_job_lease(job_id: str, worker_id: str, lease_seconds: int) -> bool:
+    """Heartbeat; False means the job is no longer ours (reaped/requeued, or finished)."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE jobs SET lease_expires_at=DATE_ADD(NOW(6), INTERVAL %s SECOND), heartbeat_at=NOW(6)"
+                " WHERE id=%s AND locked_by=%s AND status IN ('running','paused')",
+                (int(lease_seconds), job_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+
+def release_job_lease(job_id: str, worker_id: str) -> None:
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE jobs SET locked_by=NULL, lease_expires_at=NULL WHERE id=%s AND locked_by=%s",
+                (job_id, worker_id),
+            )
+
+
+def requeue_expired_jobs(limit: int = 100) -> List[Dict[str, Any]]:
+    """Running jobs whose lease lapsed (worker died) go back to queued.
+
+    Their in-flight recipients get an expired lease so the next recovery sweep reconciles
+    them before the job is picked up again. Returns the requeued jobs (id, locked_by).
+    """
+    requeued: List[Dict[str, Any]] = []
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, locked_by FROM jobs WHERE status='running'"
+                " AND (lease_expires_at IS NULL OR lease_expires_at<NOW(6)) ORDER BY lease_expires_at LIMIT %s",
+                (int(limit),),
+            )
+            for row in cur.fetchall():
+                cur.execute(
+                    "UPDATE jobs SET status='queued', locked_by=NULL, lease_expires_at=NULL, schedule_at=NOW(6)"
+                    " WHERE id=%s AND status='running' AND (lease_expires_at IS NULL OR lease_expires_at<NOW(6))",
+                    (row["id"],),
+                )
+                if cur.rowcount != 1:
+                    continue
+                cur.execute(
+                    "UPDATE job_recipients SET lease_expires_at=NOW(6) WHERE job_id=%s AND status='sending'",
+                    (row["id"],),
+                )
+                requeued.append(row)
+    return requeued
+
+
+def list_job_events(job_id: str, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Events in id order; pass the last seen id as after_id to page forward."""
+    sql = "SELECT * FROM job_events WHERE job_id=%s"
+    args: List[Any] = [job_id]
+    if after_id is not None:
+        sql += " AND id>%s"
+        args.append(int(after_id))
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT %s"
+        args.append(int(limit))
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, args)
             return cur.fetchall()
 
 
@@ -325,6 +630,39 @@ def insert_job_event(job_id: str, event_type: str, payload: Optional[Dict[str, A
             cur.execute(sql, (job_id, event_type, _json.dumps(payload or {})))
 
 
+def insert_job_events(job_id: str, events: List[Any]) -> int:
+    """Bulk insert [(event_type, payload), ...] for one job."""
+    if not events:
+        return 0
+    sql = "INSERT INTO job_events (job_id, event_type, payload) VALUES (%s,%s,%s)"
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(sql, [(job_id, et, json.dumps(p or {})) for et, p in events])
+            return cur.rowcount
+
+
+def prune_job_events(retention_days: int, batch_size: int = 1000, archive: bool = False) -> int:
+    """Delete one batch of events older than retention_days (optionally copying to job_events_archive)."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id FROM job_events WHERE created_at<DATE_SUB(NOW(6), INTERVAL %s DAY) ORDER BY id LIMIT %s",
+                (int(retention_days), int(batch_size)),
+            )
+            ids = [r["id"] for r in cur.fetchall()]
+            if not ids:
+                return 0
+            placeholders = ",".join(["%s"] * len(ids))
+            if archive:
+                cur.execute(
+                    "INSERT IGNORE INTO job_events_archive (id, job_id, event_type, payload, created_at)"
+                    f" SELECT id, job_id, event_type, payload, created_at FROM job_events WHERE id IN ({placeholders})",
+                    ids,
+                )
+            cur.execute(f"DELETE FROM job_events WHERE id IN ({placeholders})", ids)
+            return cur.rowcount
+
+
 def get_job_status(job_id: str) -> Optional[str]:
     with _conn() as conn:
         with conn.cursor() as cur:
@@ -380,6 +718,30 @@ def get_asset_by_file_id(master_user_id: str, store_id: str, asset_type: str, fi
             return cur.fetchone()
 
 
+def get_assets_by_file_ids(master_user_id: str, store_id: str, asset_type: str, file_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Batch variant of get_asset_by_file_id: one query for many file_ids.
+
+    Returns a mapping file_id -> asset row; ids without a row are absent.
+    When several rows share a file_id the newest one (highest id) wins,
+    matching get_asset_by_file_id.
+    """
+    ids = list(dict.fromkeys(fid for fid in file_ids if fid))
+    if not ids:
+        return {}
+    ph = ",".join(["%s"] * len(ids))
+    sql = (
+        "SELECT * FROM assets WHERE master_user_id=%s AND store_id=%s AND asset_type=%s"
+        f" AND file_id IN ({ph}) ORDER BY id"
+    )
+    mapping: Dict[str, Dict[str, Any]] = {}
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (master_user_id, store_id, asset_type, *ids))
+            for row in cur.fetchall():
+                mapping[row["file_id"]] = row
+    return mapping
+
+
 # ===== Sender accounts =====
 def list_senders(master_user_id: str, store_id: str) -> List[Dict[str, Any]]:
     sql = (
@@ -419,6 +781,93 @@ def set_recipient_status(job_recipient_id: int, status: str, error: Optional[str
     with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "UPDATE job_recipients SET status=%s, error=%s, provider_message_id=%s, updated_at=CURRENT_TIMESTAMP(6) WHERE id=%s",
+                "UPDATE job_recipients SET status=%s, error=%s, provider_message_id=%s, lease_expires_at=NULL, updated_at=CURRENT_TIMESTAMP(6) WHERE id=%s",
                 (status, error, provider_message_id, job_recipient_id),
             )
+
+
+def finish_recipient(
+    job_id: str,
+    job_recipient_id: int,
+    status: str,
+    error: Optional[str] = None,
+    provider_message_id: Optional[str] = None,
+) -> bool:
+    """Move a 'sending' recipient to success/failed and bump the job counter, in one transaction.
+
+    The counter only moves when the row actually leaves 'sending', so the send path and the
+    recovery scan can never both count the same recipient. Returns False if it was not 'sending'.
+    """
+    counter = {"success": "success_count", "failed": "failure_count"}[status]
+    with _conn() as conn:
+        conn.begin()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE job_recipients SET status=%s, error=%s, provider_message_id=%s, lease_expires_at=NULL,"
+                    " updated_at=CURRENT_TIMESTAMP(6) WHERE id=%s AND status='sending'",
+                    (status, error, provider_message_id, job_recipient_id),
+                )
+                moved = cur.rowcount == 1
+                if moved:
+                    cur.execute(f"UPDATE jobs SET {counter}={counter}+1 WHERE id=%s", (job_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return moved
+
+
+def claim_recipient(job_recipient_id: int, lease_seconds: int, sender: Optional[str] = None) -> bool:
+    """Move a recipient pending -> sending with a lease; False if another worker owns it.
+
+    `sender` records which account sends it (jobs with a sender pool), for crash recovery.
+    """
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE job_recipients SET status='sending', attempts=attempts+1, sent_from=%s,"
+                " lease_expires_at=DATE_ADD(NOW(6), INTERVAL %s SECOND), updated_at=CURRENT_TIMESTAMP(6)"
+                " WHERE id=%s AND status='pending'",
+                (sender, int(lease_seconds), job_recipient_id),
+            )
+            return cur.rowcount == 1
+
+
+def release_recipient(job_recipient_id: int) -> int:
+    """Return a 'sending' recipient to pending (the send is known not to have happened)."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE job_recipients SET status='pending', lease_expires_at=NULL, updated_at=CURRENT_TIMESTAMP(6)"
+                " WHERE id=%s AND status='sending'",
+                (job_recipient_id,),
+            )
+            return cur.rowcount
+
+
+def requeue_recipient(job_recipient_id: int, error: Optional[str] = None) -> int:
+    """Return a 'sending' recipient to pending after a transient failure, keeping the last error."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE job_recipients SET status='pending', error=%s, lease_expires_at=NULL, updated_at=CURRENT_TIMESTAMP(6)"
+                " WHERE id=%s AND status='sending'",
+                (error, job_recipient_id),
+            )
+            return cur.rowcount
+
+
+def list_expired_sending_recipients(limit: int = 200) -> List[Dict[str, Any]]:
+    """Recipients stuck in 'sending' past their lease, with the sending account and tenant."""
+    sql = (
+        "SELECT r.id, r.job_id, r.to_email, r.attempts, COALESCE(r.sent_from, j.sender_email) AS sender_email,"
+        " j.master_user_id, j.store_id"
+        " FROM job_recipients r JOIN jobs j ON j.id=r.job_id"
+        " WHERE r.status='sending' AND (r.lease_expires_at IS NULL OR r.lease_expires_at<NOW(6))"
+        " ORDER BY r.id LIMIT %s"
+    )
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (int(limit),))
+            return cur.fetchall()
@@ -0,0 +1,89 @@
+"""
+发送幂等与崩溃恢复模块
+每个收件人使用确定性的 Message-ID，进程在调用Gmail后、写回状态前崩溃时，
+恢复扫描通过 rfc822msgid: 查询已发送邮件来判断该收件人是否已送达
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from src.dao_mysql import (
+    list_expired_sending_recipients,
+    finish_recipient,
+    release_recipient,
+    insert_job_event,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def message_id_for(job_id: str, recipient_id: int, sender_email: str) -> str:
+    """收件人的确定性 Message-ID 头（同一收件人多次尝试保持不变）"""
+    domain = (sender_email or "").rsplit("@", 1)[-1] or "localhost"
+    return f"<{job_id}.{recipient_id}@{domain}>"
+
+
+def find_sent_message(gmail_service, message_id_header: str) -> Optional[str]:
+    """在发件人邮箱中按 Message-ID 查找已发送邮件，返回Gmail消息ID"""
+    query = f"rfc822msgid:{message_id_header.strip('<>')}"
+    result = (
+        gmail_service.users()
+        .messages()
+        .list(userId="me", q=query, maxResults=1, includeSpamTrash=True)
+        .execute()
+    )
+    messages = (result or {}).get("messages") or []
+    return messages[0].get("id") if messages else None
+
+
+def reconcile_sending_recipients(gmail_auth_manager, limit: int = 200) -> Dict[str, int]:
+    """
+    处理租约已过期的 sending 收件人
+
+    - Gmail中能找到对应 Message-ID：标记 success（补记计数）
+    - 找不到：说明邮件未送出，退回 pending 等待重发
+    - 无法查询（授权失效等）：保持 sending，下次扫描再试
+
+    Returns:
+        统计字典 {"sent", "released", "unknown"}
+    """
+    stats = {"sent": 0, "released": 0, "unknown": 0}
+    rows = list_expired_sending_recipients(limit)
+    if not rows:
+        return stats
+
+    services: Dict[Any, Any] = {}
+    for row in rows:
+        key = (row["sender_email"], row["master_user_id"], row["store_id"])
+        if key not in services:
+            try:
+                services[key] = gmail_auth_manager.get_gmail_service(*key)
+            except Exception as e:
+                logger.warning(f"恢复扫描获取Gmail服务失败: {key[0]}, {e}")
+                services[key] = None
+        service = services[key]
+        if not service:
+            stats["unknown"] += 1
+            continue
+
+        header = message_id_for(row["job_id"], row["id"], row["sender_email"])
+        try:
+            provider_id = find_sent_message(service, header)
+        except Exception as e:
+            logger.warning(f"恢复扫描查询失败: recipient_id={row['id']}, {e}")
+            stats["unknown"] += 1
+            continue
+
+        if provider_id:
+            # counts only if the row is still 'sending' (the sender may have finished it meanwhile)
+            if not finish_recipient(row["job_id"], row["id"], "success", None, provider_id):
+                continue
+            try:
+                insert_job_event(row["job_id"], "recipient_success", {"email": row["to_email"], "recovered": True})
+            except Exception:
+                pass
+            stats["sent"] += 1
+        elif release_recipient(row["id"]):
+            stats["released"] += 1
+
+    logger.info(f"发送恢复扫描完成: {stats}")
+    return stats
@@ -0,0 +1,345 @@
+"""
+活动试运行（dry-run）模块
+在不发送的前提下渲染整个活动的全部收件人，用于在启动大任务前发现缺失的占位符、空值和超大邮件。
+数据按块交给进程池并行渲染（src/batch_renderer.py），每个块只返回可合并的统计结果，
+渲染出的邮件内容不会被保留，内存占用与块大小和并发数相关，与收件人总数无关
+"""
+import json
+import logging
+import math
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from src.batch_renderer import file_template_resolver, render_frame
+from src.config import get_config
+from src.dao_mysql import get_job, iter_job_recipients
+from src.template_store import get_template_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKSIZE = 2000
+# Gmail 会截断超过约102KB的HTML正文，默认以此作为超大邮件阈值
+DEFAULT_MAX_MESSAGE_BYTES = 102 * 1024
+DEFAULT_SAMPLE_LIMIT = 20
+
+# 试运行内部使用的收件人/语言列名，避免与表格或 variables 中的列冲突
+EMAIL_COLUMN = "__to_email__"
+LANGUAGE_COLUMN = "__language__"
+
+
+def _size_bucket(size: int) -> int:
+    """大小分桶：按2的幂向上取整（单位：字节）"""
+    return 1 << max(0, math.ceil(math.log2(size))) if size > 0 else 0
+
+
+def _bucket_label(upper: int) -> str:
+    if upper < 1024:
+        return f"<={upper}B"
+    if upper < 1024 * 1024:
+        return f"<={upper // 1024}KB"
+    return f"<={upper // (1024 * 1024)}MB"
+
+
+class DryRunStats:
+    """试运行统计（可在进程间传递并合并）"""
+
+    def __init__(self, max_message_bytes: int = DEFAULT_MAX_MESSAGE_BYTES, sample_limit: int = DEFAULT_SAMPLE_LIMIT):
+        self.max_message_bytes = max_message_bytes
+        self.sample_limit = sample_limit
+        self.total = 0
+        self.ok = 0
+        self.oversized = 0
+        self.languages: Counter = Counter()
+        self.missing: Counter = Counter()
+        self.empty: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.size_buckets: Counter = Counter()
+        self.size_min: Optional[int] = None
+        self.size_max = 0
+        self.size_sum = 0
+        self.samples: List[Dict[str, Any]] = []
+
+    def add(self, msg: Dict[str, Any], index_offset: int = 0) -> None:
+        """记录一封渲染结果（render_frame 的输出）"""
+        size = sum(len((msg.get(k) or "").encode("utf-8")) for k in ("subject", "html_content", "content"))
+        self.total += 1
+        self.languages[msg["language"]] += 1
+        self.size_buckets[_size_bucket(size)] += 1
+        self.size_sum += size
+        self.size_max = max(self.size_max, size)
+        self.size_min = size if self.size_min is None else min(self.size_min, size)
+        oversized = size > self.max_message_bytes
+        if oversized:
+            self.oversized += 1
+        for name in msg["missing"]:
+            self.missing[name] += 1
+        for name in msg["empty"]:
+            self.empty[name] += 1
+        for err in msg["errors"]:
+            self.errors[err] += 1
+
+        if not (msg["missing"] or msg["empty"] or msg["errors"] or oversized):
+            self.ok += 1
+        elif len(self.samples) < self.sample_limit:
+            self.samples.append({
+                "index": msg["index"] + index_offset,
+                "to_email": msg["to_email"],
+                "language": msg["language"],
+                "size": size,
+                "missing": msg["missing"],
+                "empty": msg["empty"],
+                "errors": msg["errors"],
+            })
+
+    def merge(self, other: "DryRunStats") -> None:
+        """合并另一个块的统计（样本按收件人顺序保留前 sample_limit 条）"""
+        self.total += other.total
+        self.ok += other.ok
+        self.oversized += other.oversized
+        self.languages.update(other.languages)
+        self.missing.update(other.missing)
+        self.empty.update(other.empty)
+        self.errors.update(other.errors)
+        self.size_buckets.update(other.size_buckets)
+        self.size_sum += other.size_sum
+        self.size_max = max(self.size_max, other.size_max)
+        if other.size_min is not None:
+            self.size_min = other.size_min if self.size_min is None else min(self.size_min, other.size_min)
+        self.samples = sorted(self.samples + other.samples, key=lambda s: s["index"])[:self.sample_limit]
+
+    def _percentile(self, q: float) -> int:
+        """近似分位数（所在分桶的上界）"""
+        target = q * self.total
+        seen = 0
+        for upper in sorted(self.size_buckets):
+            seen += self.size_buckets[upper]
+            if seen >= target:
+                return upper
+        return self.size_max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "ok": self.ok,
+            "with_issues": self.total - self.ok,
+            "languages": dict(self.languages),
+            "missing_variables": dict(self.missing.most_common()),
+            "empty_variables": dict(self.empty.most_common()),
+            "errors": dict(self.errors.most_common()),
+            "size": {
+                "min": self.size_min or 0,
+                "max": self.size_max,
+                "mean": round(self.size_sum / self.total) if self.total else 0,
+                "p50": self._percentile(0.5) if self.total else 0,
+                "p95": self._percentile(0.95) if self.total else 0,
+                "distribution": {_bucket_label(u): self.size_buckets[u] for u in sorted(self.size_buckets)},
+                "max_message_bytes": self.max_message_bytes,
+                "oversized": self.oversized,
+            },
+            "samples": self.samples,
+        }
+
+
+def _render_chunk(
+    chunk: pd.DataFrame,
+    templates: Dict[str, Dict[str, Any]],
+    index_offset: int,
+    max_message_bytes: int,
+    sample_limit: int,
+    default_language: str,
+) -> DryRunStats:
+    """进程池任务：渲染一个块并只返回统计"""
+    stats = DryRunStats(max_message_bytes, sample_limit)
+    messages = render_frame(
+        chunk, templates.get, email_column=EMAIL_COLUMN, language_column=LANGUAGE_COLUMN,
+        default_language=default_language, chunksize=len(chunk) or 1,
+    )
+    for msg in messages:
+        stats.add(msg, index_offset)
+    return stats
+
+
+def run_dry_run(
+    chunks: Iterable[pd.DataFrame],
+    resolve: Callable[[str], Optional[Dict[str, Any]]],
+    workers: Optional[int] = None,
+    max_message_bytes: Optional[int] = None,
+    sample_limit: int = DEFAULT_SAMPLE_LIMIT,
+    default_language: str = "English",
+) -> Dict[str, Any]:
+    """
+    并行渲染全部块并汇总统计
+
+    模板在主进程中按语言解析（每种语言一次），与块一起发给工作进程；
+    同时在途的块最多为 2 × workers 个，读取速度快于渲染时不会堆积。
+
+    Args:
+        chunks: 含 EMAIL_COLUMN / LANGUAGE_COLUMN 及参数列的数据块
+        resolve: language -> {"subject", "html", "text", "errors"}
+        workers: 渲染进程数（默认 DRY_RUN_WORKERS；<=1 时在当前进程内渲染）
+
+    Returns:
+        DryRunStats.to_dict() 加上 workers、elapsed_sec、messages_per_sec
+    """
+    cfg = get_config()
+    workers = cfg["DRY_RUN_WORKERS"] if workers is None else workers
+    workers = max(1, int(workers))
+    max_message_bytes = max_message_bytes or cfg["DRY_RUN_MAX_MESSAGE_BYTES"]
+    templates: Dict[str, Dict[str, Any]] = {}
+
+    def _tasks() -> Iterator[tuple]:
+        offset = 0
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            languages = chunk[LANGUAGE_COLUMN].where(chunk[LANGUAGE_COLUMN].notna(), default_language).astype(str)
+            for language in languages.unique():
+                if language not in templates:
+                    templates[language] = resolve(language) or {}
+            subset = {language: templates[language] for language in languages.unique()}
+            yield (chunk, subset, offset, max_message_bytes, sample_limit, default_language)
+            offset += len(chunk)
+
+    total = DryRunStats(max_message_bytes, sample_limit)
+    started = time.perf_counter()
+    if workers == 1:
+        for task in _tasks():
+            total.merge(_render_chunk(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for task in _tasks():
+                pending.add(pool.submit(_render_chunk, *task))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        total.merge(fut.result())
+            for fut in pending:
+                total.merge(fut.result())
+    elapsed = time.perf_counter() - started
+
+    report = total.to_dict()
+    report["workers"] = workers
+    report["elapsed_sec"] = round(elapsed, 3)
+    report["messages_per_sec"] = round(total.total / elapsed, 1) if elapsed > 0 else None
+    return report
+
+
+def _frame_chunks(df: pd.DataFrame, chunksize: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def dry_run_workbook(
+    file_path: str,
+    excel_processor,
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    max_message_bytes: Optional[int] = None,
+    sample_limit: int = DEFAULT_SAMPLE_LIMIT,
+) -> Dict[str, Any]:
+    """
+    试运行表格模板活动：与 send_template_emails_scheduled 使用相同的过滤规则和文件模板
+
+    Returns:
+        统计结果（见 run_dry_run）
+    """
+    data = excel_processor.get_filtered_data_with_language(file_path, columnar=True)
+    if data.empty:
+        return run_dry_run([], lambda language: None, workers=1)
+    # 原列保留，模板仍可引用 [邮箱] / [语言]
+    data[EMAIL_COLUMN] = data["邮箱"]
+    data[LANGUAGE_COLUMN] = data["语言"].astype(object) if "语言" in data.columns else "English"
+    return run_dry_run(
+        _frame_chunks(data, chunksize),
+        file_template_resolver(excel_processor.template_manager),
+        workers=workers,
+        max_message_bytes=max_message_bytes,
+        sample_limit=sample_limit,
+    )
+
+
+def _recipient_frame(rows: List[Dict[str, Any]], with_variables: bool) -> pd.DataFrame:
+    """job_recipients 行 -> 数据块（语言选择与 send_job_emails_from_db 一致）"""
+    records = []
+    for row in rows:
+        variables = row.get("variables") or {}
+        if isinstance(variables, str):
+            try:
+                variables = json.loads(variables)
+            except Exception:
+                variables = {}
+        record = dict(variables) if with_variables else {}
+        record[EMAIL_COLUMN] = row["to_email"]
+        record[LANGUAGE_COLUMN] = row.get("language") or variables.get("语言") or "English"
+        records.append(record)
+    return pd.DataFrame.from_records(records)
+
+
+def _job_template_resolver(job: Dict[str, Any]) -> Callable[[str], Optional[Dict[str, Any]]]:
+    """任务模板解析器：custom 任务使用任务自身的主题/正文，template 任务使用数据库模板或按语言的文件模板"""
+    master_user_id, store_id = job["master_user_id"], job["store_id"]
+    if job.get("type") != "template":
+        fixed = {
+            "subject": job.get("subject"),
+            "html": job.get("html_content"),
+            "text": job.get("content"),
+            "errors": [],
+        }
+        return lambda language: fixed
+
+    store = get_template_store()
+    template_id = job.get("template_id")
+
+    def resolve(language: str) -> Dict[str, Any]:
+        # 与 send_job_emails_from_db 相同的模板选择（数据库模板，或文件模板回退 en）
+        tpl = store.get_job_template(master_user_id, store_id, language, template_id)
+        if tpl:
+            return {"subject": tpl["subject"], "html": tpl["html"], "text": tpl["text"], "errors": []}
+        if template_id is not None:
+            return {"errors": ["Template not found for given template_id"]}
+        return {"errors": [f"Template files not found for language={language} (fallback en tried)"]}
+    return resolve
+
+
+def dry_run_job(
+    job_id: str,
+    status: Optional[str] = "pending",
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    max_message_bytes: Optional[int] = None,
+    sample_limit: int = DEFAULT_SAMPLE_LIMIT,
+) -> Optional[Dict[str, Any]]:
+    """
+    试运行数据库任务：分页读取收件人，按任务类型渲染
+
+    custom 任务发送时不做变量替换，因此只带入收件人和语言列，正文中的 [参数] 会报告为缺失。
+
+    Args:
+        status: 只渲染该状态的收件人（默认 pending；None 表示全部）
+
+    Returns:
+        统计结果（见 run_dry_run），任务不存在时返回None
+    """
+    job = get_job(job_id)
+    if not job:
+        return None
+    with_variables = job.get("type") == "template"
+    chunks = (
+        _recipient_frame(rows, with_variables)
+        for rows in iter_job_recipients(job_id, status=status, batch_size=chunksize)
+    )
+    report = run_dry_run(
+        chunks,
+        _job_template_resolver(job),
+        workers=workers,
+        max_message_bytes=max_message_bytes,
+        sample_limit=sample_limit,
+    )
+    report["job_id"] = job_id
+    report["job_type"] = job.get("type")
+    return report
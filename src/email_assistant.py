@@ -8,9 +8,10 @@ import argparse
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
-from src.gmail_auth import GmailAuthManager
-from src.email_sender import EmailSender
-from src.excel_processor import ExcelProcessor
+from src.email_sender import EmailSender, format_template_preview
+from src.batch_renderer import file_template_resolver, render_frame
+from src.dry_run import dry_run_workbook
+from src.services import get_excel_processor, get_gmail_auth_manager
 from src.email_scheduler import EmailScheduler
 
 class EmailAssistant:
@@ -23,8 +24,8 @@ class EmailAssistant:
         Args:
             credentials_file: Google OAuth凭据文件路径
         """
-        self.gmail_auth_manager = GmailAuthManager(credentials_file)
-        self.excel_processor = ExcelProcessor()
+        self.gmail_auth_manager = get_gmail_auth_manager(credentials_file)
+        self.excel_processor = get_excel_processor()
         self.scheduler = EmailScheduler(self.gmail_auth_manager, self.excel_processor)
 
         # 配置日志
@@ -250,26 +251,20 @@ class EmailAssistant:
             if filtered_data.empty:
                 return {"success": False, "error": "没有找到符合条件的邮箱数据"}
 
-            # 预览前几个邮件
+            # 预览前几个邮件（按列批量渲染，模板每种语言只读取一次）
             previews = []
-            for i, (_, row) in enumerate(filtered_data.head(max_previews).iterrows()):
-                to_email = row["邮箱"]
-                language = row.get("语言", "English")
-                row_data = row.to_dict()
-
-                # 创建临时的EmailSender来生成预览
-                if hasattr(self, '_temp_email_sender'):
-                    email_sender = self._temp_email_sender
+            resolver = file_template_resolver(self.excel_processor.template_manager)
+            for rendered in render_frame(filtered_data.head(max_previews), resolver):
+                if rendered["errors"]:
+                    preview_text = f"模板处理错误:\n{chr(10).join(rendered['errors'])}"
                 else:
-                    # 使用虚拟的gmail_service进行预览
-                    from src.email_sender import EmailSender
-                    email_sender = EmailSender(None, "preview@example.com")
-
-                preview_text = email_sender.preview_email_from_template(to_email, language, row_data)
+                    preview_text = format_template_preview(
+                        "preview@example.com", rendered["to_email"], rendered["language"], rendered
+                    )
                 previews.append({
-                    "index": i + 1,
-                    "to_email": to_email,
-                    "language": language,
+                    "index": rendered["index"] + 1,
+                    "to_email": rendered["to_email"],
+                    "language": rendered["language"],
                     "preview": preview_text
                 })
 
@@ -288,6 +283,26 @@ class EmailAssistant:
             self.logger.error(f"预览模板邮件失败: {e}")
             return {"success": False, "error": str(e)}
 
+    def dry_run_template_emails(self, excel_file_path: str, workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        试运行模板邮件：渲染全部待发送邮件但不发送，返回汇总统计
+
+        Args:
+            excel_file_path: Excel文件路径
+            workers: 渲染进程数（默认 DRY_RUN_WORKERS）
+
+        Returns:
+            试运行结果（缺失/为空的参数、邮件大小分布、语言分布、渲染速度等）
+        """
+        try:
+            report = dry_run_workbook(excel_file_path, self.excel_processor, workers=workers)
+            if not report["total"]:
+                return {"success": False, "error": "没有找到符合条件的邮箱数据"}
+            return {"success": True, "dry_run": report}
+        except Exception as e:
+            self.logger.error(f"试运行模板邮件失败: {e}")
+            return {"success": False, "error": str(e)}
+
     def send_template_emails(
         self,
         sender_email: str,
@@ -379,6 +394,8 @@ def main():
     # 操作参数
     parser.add_argument("--preview", action="store_true", help="仅预览待发送邮箱列表")
     parser.add_argument("--preview-templates", action="store_true", help="预览模板邮件内容")
+    parser.add_argument("--dry-run", action="store_true", help="试运行：渲染全部模板邮件但不发送，输出统计")
+    parser.add_argument("--workers", type=int, help="试运行的渲染进程数")
     parser.add_argument("--stats", action="store_true", help="显示统计信息")
 
     # 模板参数
@@ -422,6 +439,26 @@ def main():
                 print(f"模板预览失败: {result['error']}")
             return
 
+        if args.dry_run:
+            # 试运行模板邮件
+            result = assistant.dry_run_template_emails(args.excel, workers=args.workers)
+            if result["success"]:
+                report = result["dry_run"]
+                print(f"渲染邮件数: {report['total']} (有问题: {report['with_issues']})")
+                print(f"语言分布: {report['languages']}")
+                print(f"缺失参数: {report['missing_variables']}")
+                print(f"空值参数: {report['empty_variables']}")
+                print(f"模板错误: {report['errors']}")
+                size = report["size"]
+                print(f"邮件大小: 平均 {size['mean']}B, 最大 {size['max']}B, p95 <= {size['p95']}B, 超过 {size['max_message_bytes']}B: {size['oversized']}")
+                print(f"大小分布: {size['distribution']}")
+                print(f"渲染速度: {report['messages_per_sec']} 封/秒 ({report['workers']} 个进程, {report['elapsed_sec']} 秒)")
+                for sample in report["samples"]:
+                    print(f"  #{sample['index'] + 1} {sample['to_email']} [{sample['language']}] 缺失={sample['missing']} 空值={sample['empty']} 错误={sample['errors']} 大小={sample['size']}B")
+            else:
+                print(f"试运行失败: {result['error']}")
+            return
+
         if args.preview:
             # 预览邮箱列表
             result = assistant.preview_email_list(args.excel)
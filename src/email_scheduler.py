@@ -10,32 +10,49 @@ from email.message import EmailMessage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
-from bs4 import BeautifulSoup
 from email.mime.application import MIMEApplication
 from email.mime.base import MIMEBase
 from email import encoders
 import random
 import logging
 import threading
+from collections import deque
 from datetime import datetime, timedelta
-from urllib import request as _urlrequest
-from urllib.error import URLError, HTTPError
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from enum import Enum
 
 from src.gmail_auth import GmailAuthManager
 from src.email_sender import EmailSender
 from src.excel_processor import ExcelProcessor
+from src.html_images import cid_for, rewrite_img_ids
+from src.template_store import get_template_store
+from src.delivery_recovery import find_sent_message, message_id_for
+from src.send_retry import RetryPolicy, RetryQueue, classify_send_error, is_quota_exhausted
+from src.webhook_dispatcher import get_webhook_dispatcher
+from src.job_events import JobEventRecorder
+from src.event_bus import get_event_bus
 import pandas as pd
 from src.dao_mysql import (
     get_job,
     list_job_recipients,
     set_job_status,
-    set_recipient_status,
-    update_job_counts,
+    finish_recipient,
     insert_job_event,
     get_job_status,
+    get_assets_by_file_ids,
+    claim_recipient,
+    requeue_recipient,
+    defer_job,
+    add_tenant_usage,
+    get_tenant_usage_today,
 )
+from src.fair_scheduler import tenant_limits, next_quota_reset
+from src.sender_ledger import get_sender_ledger
+from src.sender_pool import SenderPool, parse_sender_pool
+from src.batch_renderer import file_template_resolver, render_frame
+
+# 收件人发送租约（秒）；超过租约仍处于sending的收件人由恢复扫描处理
+RECIPIENT_LEASE_SEC = 300
 
 class SchedulerStatus(Enum):
     """调度器状态枚举"""
@@ -86,6 +103,9 @@ class EmailScheduler:
             "estimated_completion": None
         }
 
+        # 同一发件人的所有任务共享发送节奏与每日配额
+        self.sender_ledger = get_sender_ledger()
+
         # 回调函数
         self.progress_callback: Optional[Callable] = None
         self.completion_callback: Optional[Callable] = None
@@ -93,8 +113,9 @@ class EmailScheduler:
         # 停止标志
         self._stop_flag = threading.Event()
         self._pause_flag = threading.Event()
-        # cache for file-based templates: key=(mu,store,lang)
-        self._template_cache: Dict[str, Dict[str, str]] = {}
+
+        # 临时发送失败的重试策略（指数退避 + 抖动）
+        self.retry_policy = RetryPolicy()
 
     def _reset_status(self):
         """重置调度器状态和统计信息"""
@@ -241,6 +262,15 @@ class EmailScheduler:
                 remaining = total_count - i
                 self.update_stats(total_count, success_count, failed_count, remaining, email)
 
+                # 发件人共享节奏/每日配额（间隔在预约时隙时生效）
+                turn = self._await_sender_slot(sender_email)
+                if turn == "capped":
+                    self.logger.warning(f"发件人 {sender_email} 当日配额已用尽，剩余邮件保持待发送状态")
+                    break
+                if turn == "stopped":
+                    self.logger.info("收到停止信号，中止发送")
+                    break
+
                 self.logger.info(f"正在发送邮件 {i + 1}/{total_count}: {email}")
 
                 # 发送邮件
@@ -252,27 +282,20 @@ class EmailScheduler:
                     attachments=norm_attachments,
                 )
 
-                # 更新Excel状态
+                # 记录状态（追加到状态日志，批量合并回Excel）
                 status = 1 if result["success"] else -1
-                self.excel_processor.update_email_status(excel_file_path, email, status)
+                self.excel_processor.record_email_status(excel_file_path, email, status)
 
                 # 更新计数
                 if result["success"]:
                     success_count += 1
+                    self.sender_ledger.record_send(sender_email)
                     self.logger.info(f"邮件发送成功: {email}")
                 else:
                     failed_count += 1
+                    self.sender_ledger.release(sender_email)
                     self.logger.error(f"邮件发送失败: {email}, 错误: {result.get('error', '未知错误')}")
 
-                # 如果不是最后一封邮件，等待随机间隔
-                if i < len(email_list) - 1:
-                    wait_time = self.calculate_wait_time()
-                    self.logger.info(f"等待 {wait_time} 秒后发送下一封邮件")
-
-                    if self._wait_with_interruption(wait_time):
-                        self.logger.info("收到停止信号，中止发送")
-                        break
-
             # 最终统计
             remaining = total_count - success_count - failed_count
             self.update_stats(total_count, success_count, failed_count, remaining)
@@ -304,6 +327,54 @@ class EmailScheduler:
             error_msg = f"邮件发送调度失败: {e}"
             self.logger.error(error_msg)
             return {"success": False, "error": error_msg}
+        finally:
+            # 任务结束（含停止/异常）时合并状态日志
+            self.excel_processor.flush_email_status(excel_file_path)
+
+    def _await_sender_slot(self, sender_email: str) -> Optional[str]:
+        """
+        在发件人账本中预约发送时隙并等待到点
+
+        Returns:
+            None 表示可以发送；"capped" 表示发件人当日配额已用尽；"stopped" 表示等待中收到停止信号
+        """
+        allowed, wait_seconds = self.sender_ledger.acquire(sender_email, self.calculate_wait_time())
+        if not allowed:
+            return "capped"
+        if wait_seconds > 0:
+            self.logger.info(f"等待 {wait_seconds:.0f} 秒后发送下一封邮件（发件人 {sender_email} 共享节奏）")
+            if self._wait_with_interruption(wait_seconds):
+                return "stopped"
+        return None
+
+    def _await_pool_slot(self, sender_pool: SenderPool, pinned: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        从发件人池中选出发件人并等待其发送时隙；被账本拒绝（当日配额用尽）的发件人本任务内不再选择
+
+        Args:
+            pinned: 重试时固定使用的发件人（首次尝试的账号，保证Message-ID不变）；不在池中时按常规选择
+
+        Returns:
+            元组：(发件人, None)；全部用尽（或固定的发件人已用尽）时为 (None, "capped")；等待中停止时为 (None, "stopped")
+        """
+        if pinned and pinned in sender_pool:
+            if sender_pool.is_capped(pinned):
+                return None, "capped"
+            turn = self._await_sender_slot(pinned)
+            if turn == "capped":
+                sender_pool.mark_capped(pinned)
+            return (None, turn) if turn else (pinned, None)
+        while True:
+            sender = sender_pool.choose()
+            if sender is None:
+                return None, "capped"
+            turn = self._await_sender_slot(sender)
+            if turn == "capped":
+                sender_pool.mark_capped(sender)
+                continue
+            if turn == "stopped":
+                return None, "stopped"
+            return sender, None
 
     def _wait_with_interruption(self, seconds: float) -> bool:
         """
@@ -454,8 +525,9 @@ class EmailScheduler:
             self.start_time = datetime.now()
             self.logger.info(f"开始基于模板的邮件发送，总数: {len(filtered_data)}")
 
-            # 发送邮件并更新状态
-            for index, (_, row) in enumerate(filtered_data.iterrows()):
+            # 发送邮件并更新状态（按语言分组批量渲染，每种语言的模板只解析一次）
+            for rendered in render_frame(filtered_data, file_template_resolver(email_sender.template_manager)):
+                index = rendered["index"]
                 # 检查停止标志
                 if self._stop_flag.is_set():
                     self.status = SchedulerStatus.STOPPED
@@ -465,26 +537,40 @@ class EmailScheduler:
                 while self._pause_flag.is_set() and not self._stop_flag.is_set():
                     time.sleep(0.1)
 
-                to_email = row["邮箱"]
-                language = row.get("语言", "English")
-                row_data = row.to_dict()
+                # 发件人共享节奏/每日配额（间隔在预约时隙时生效）
+                turn = self._await_sender_slot(email_sender.sender_email)
+                if turn == "capped":
+                    self.logger.warning(f"发件人 {email_sender.sender_email} 当日配额已用尽，剩余邮件保持待发送状态")
+                    break
+                if turn == "stopped":
+                    self.status = SchedulerStatus.STOPPED
+                    break
+
+                to_email = rendered["to_email"]
+                language = rendered["language"]
 
                 self.logger.info(f"发送邮件 ({index + 1}/{len(filtered_data)}): {to_email} [{language}]")
 
+                # 预约的时隙是否已结算（成功计数或释放）
+                settled = False
                 try:
                     # 发送邮件
-                    result = email_sender.send_email_from_template(to_email, language, row_data, attachments)
+                    result = email_sender.send_email_from_rendered(rendered, attachments)
 
-                    # 更新Excel状态
+                    # 记录状态（追加到状态日志，批量合并回Excel）
                     status = 1 if result["success"] else -1
-                    self.excel_processor.update_email_status(excel_file_path, to_email, status)
+                    self.excel_processor.record_email_status(excel_file_path, to_email, status)
 
                     # 更新统计
                     if result["success"]:
                         self.stats["success_count"] += 1
+                        self.sender_ledger.record_send(email_sender.sender_email)
+                        settled = True
                         self.logger.info(f"邮件发送成功: {to_email}")
                     else:
                         self.stats["failure_count"] += 1
+                        self.sender_ledger.release(email_sender.sender_email)
+                        settled = True
                         self.logger.error(f"邮件发送失败: {to_email}, 错误: {result.get('error', '未知错误')}")
 
                     # 回调通知
@@ -500,20 +586,13 @@ class EmailScheduler:
 
                 except Exception as e:
                     self.stats["failure_count"] += 1
+                    if not settled:
+                        self.sender_ledger.release(email_sender.sender_email)
                     error_msg = f"处理邮件失败: {to_email}, {e}"
                     self.logger.error(error_msg)
 
-                    # 更新Excel状态为失败
-                    self.excel_processor.update_email_status(excel_file_path, to_email, -1)
-
-                # 等待间隔（除了最后一个邮件）
-                if index < len(filtered_data) - 1:
-                    interval = random.randint(self.min_interval, self.max_interval)
-                    self.logger.info(f"等待 {interval} 秒...")
-
-                    if self._wait_with_interruption(interval):
-                        self.status = SchedulerStatus.STOPPED
-                        break
+                    # 记录状态为失败
+                    self.excel_processor.record_email_status(excel_file_path, to_email, -1)
 
             # 完成发送
             if self.status != SchedulerStatus.STOPPED:
@@ -538,6 +617,9 @@ class EmailScheduler:
             self.logger.error(error_msg)
             self.status = SchedulerStatus.ERROR
             return {"success": False, "error": error_msg}
+        finally:
+            # 任务结束（含停止/异常）时合并状态日志
+            self.excel_processor.flush_email_status(excel_file_path)
 
     def _render_from_template_row(self, template_row: dict, variables: dict) -> Dict[str, str]:
         def repl(s: str) -> str:
@@ -552,23 +634,176 @@ class EmailScheduler:
         text = repl(template_row.get("text_content")) or repl(template_row.get("subject") or "")
         return {"subject": subject, "html": html, "text": text}
 
-    def _get_file_template(self, master_user_id: str, store_id: str, language: str) -> Optional[Dict[str, str]]:
-        key = f"{master_user_id}:{store_id}:{language}"
-        if key in self._template_cache:
-            return self._template_cache[key]
-        # load files; fallback en
-        from src.template_files import TemplateFileManager
-        tfm = TemplateFileManager()
-        langs_to_try = [language]
-        if language != "en":
-            langs_to_try.append("en")
-        for lang in langs_to_try:
-            data = tfm.read_language(master_user_id, store_id, lang)
-            if data.get("subject") and data.get("content"):
-                tpl = {"subject": data["subject"], "html": data["content"], "text": data["content"]}
-                self._template_cache[key] = tpl
-                return tpl
-        return None
+    def _get_file_template(self, master_user_id: str, store_id: str, language: str) -> Optional[Dict[str, Any]]:
+        # served from the shared template store (mtime-validated); fallback en
+        return get_template_store().get_job_template(master_user_id, store_id, language)
+
+    def _resolve_image_assets(
+        self,
+        master_user_id: str,
+        store_id: str,
+        image_ids: List[str],
+        asset_cache: Dict[str, Optional[Dict[str, Any]]],
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        解析图片ID对应的素材记录（按任务缓存）
+
+        只对缓存中尚未出现的ID发起一次批量查询，查不到的ID也会缓存为None，
+        避免同一任务内对相同图片重复查库。
+        """
+        missing = [img_id for img_id in dict.fromkeys(image_ids) if img_id not in asset_cache]
+        if missing:
+            found = get_assets_by_file_ids(master_user_id, store_id, "image", missing)
+            for img_id in missing:
+                asset_cache[img_id] = found.get(img_id)
+        return {img_id: asset_cache[img_id] for img_id in image_ids if asset_cache.get(img_id)}
+
+    def _images_to_embed(
+        self,
+        image_ids: List[str],
+        master_user_id: str,
+        store_id: str,
+        asset_cache: Dict[str, Optional[Dict[str, Any]]],
+    ) -> List[Dict[str, str]]:
+        """
+        根据模板的图片清单生成待内嵌图片列表（只包含能解析到素材文件的图片）
+        """
+        if not image_ids:
+            return []
+        assets = self._resolve_image_assets(master_user_id, store_id, image_ids, asset_cache)
+        return [
+            {"cid": cid_for(img_id), "path": row["storage_path"], "filename": row.get("filename") or img_id}
+            for img_id, row in assets.items()
+            if row.get("storage_path")
+        ]
+
+    def _inline_images(
+        self,
+        base_tpl: Dict[str, Any],
+        master_user_id: str,
+        store_id: str,
+        asset_cache: Dict[str, Optional[Dict[str, Any]]],
+        html_cache: Dict[str, str],
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        把模板中能解析到素材的 <img id> 改写为 cid 引用，并返回待内嵌图片
+
+        没有对应素材的标签保持原样（保留原 src，如外部图片链接）。
+        改写结果按模板HTML在任务内缓存，每个模板只改写一次。
+
+        Returns:
+            元组：(改写后的模板HTML, 待内嵌图片列表)
+        """
+        html = base_tpl.get("html") or ""
+        images = self._images_to_embed(base_tpl.get("images") or [], master_user_id, store_id, asset_cache)
+        if not images:
+            return html, []
+        if html not in html_cache:
+            cids = {img["cid"] for img in images}
+            html_cache[html], _ = rewrite_img_ids(html, should_rewrite=lambda img_id: cid_for(img_id) in cids)
+        return html_cache[html], images
+
+    def _build_job_message(
+        self,
+        email_sender: EmailSender,
+        to_email: str,
+        sender_email: str,
+        subject: str,
+        text: str,
+        html: Optional[str],
+        images_to_embed: List[Dict[str, str]],
+        attachments: List[str],
+    ):
+        """
+        构建任务邮件的MIME消息
+
+        Returns:
+            元组：(消息对象, 错误信息)，构建失败时消息为None
+        """
+        if attachments and not images_to_embed:
+            # attachments only: reuse EmailSender's validated builder
+            validation = email_sender.attachment_manager.validate_attachment_list(attachments)
+            if not validation["valid"]:
+                error_msg = "附件验证失败: "
+                if validation.get("size_error"):
+                    error_msg += validation["size_error"]
+                else:
+                    error_msg += f"无效文件: {', '.join(f['file_id'] for f in validation['invalid_files'])}"
+                return None, error_msg
+            msg = email_sender.create_email_message_with_attachments(
+                to_email, subject, text, html, None, attachments
+            )
+            if msg is None:
+                return None, "创建包含附件的邮件消息失败"
+            return msg, None
+
+        if images_to_embed:
+            related = MIMEMultipart('related')
+            alt = MIMEMultipart('alternative')
+            alt.attach(MIMEText(text, 'plain', 'utf-8'))
+            alt.attach(MIMEText(html or "", 'html', 'utf-8'))
+            related.attach(alt)
+            for info in images_to_embed:
+                try:
+                    with open(info["path"], 'rb') as f:
+                        img_bytes = f.read()
+                    mime_img = MIMEImage(img_bytes)
+                    mime_img.add_header('Content-ID', f'<{info["cid"]}>')
+                    mime_img.add_header('Content-Disposition', 'inline', filename=info["filename"])
+                    related.attach(mime_img)
+                except Exception:
+                    continue
+            if attachments:
+                msg = MIMEMultipart('mixed')
+                msg.attach(related)
+                self._attach_job_files(email_sender, msg, attachments)
+            else:
+                msg = related
+        else:
+            msg = EmailMessage()
+            msg.set_content(text)
+            if html:
+                msg.add_alternative(html, subtype='html')
+        msg["To"] = to_email
+        msg["From"] = sender_email
+        msg["Subject"] = subject
+        return msg, None
+
+    def _attach_job_files(self, email_sender: EmailSender, root: MIMEMultipart, attachments: List[str]):
+        """将附件加入mixed消息（单个附件失败时跳过）"""
+        try:
+            att_mgr = email_sender.attachment_manager
+            for fid in attachments:
+                ad = att_mgr.load_attachment_data(fid)
+                if not ad.get("success"):
+                    continue
+                file_bytes = base64.urlsafe_b64decode(ad["base64_data"]) if '-' in ad["base64_data"] or '_' in ad["base64_data"] else base64.b64decode(ad["base64_data"])
+                mime_type = ad["mime_type"] or 'application/octet-stream'
+                filename = ad["filename"] or 'file'
+                if mime_type.startswith('application/') or mime_type.startswith('text/'):
+                    part = MIMEApplication(file_bytes, _subtype=mime_type.split('/')[-1])
+                else:
+                    main, sub = (mime_type.split('/', 1) + ['octet-stream'])[:2]
+                    part = MIMEBase(main, sub)
+                    part.set_payload(file_bytes)
+                    encoders.encode_base64(part)
+                part.add_header('Content-Disposition', 'attachment', filename=filename)
+                root.attach(part)
+        except Exception:
+            pass
+
+    def _send_message(self, email_sender: EmailSender, msg, message_id_header: str) -> Dict[str, Any]:
+        """以确定性的Message-ID发送消息（供崩溃恢复时按 rfc822msgid 查找）"""
+        del msg["Message-ID"]
+        msg["Message-ID"] = message_id_header
+        encoded = base64.urlsafe_b64encode(msg.as_bytes()).decode()
+        result = (
+            email_sender.gmail_service.users()
+            .messages()
+            .send(userId="me", body={"raw": encoded})
+            .execute()
+        )
+        return {"success": True, "message_id": result.get("id", "")}
 
     def send_job_emails_from_db(
         self,
@@ -593,78 +828,144 @@ class EmailScheduler:
 
             # Mark job running
             set_job_status(job_id, "running")
-            try:
-                insert_job_event(job_id, "started", {"total": len(list_job_recipients(job_id))})
-            except Exception:
-                pass
+            # per-recipient events honour JOB_EVENTS_GRANULARITY (full/sampled/aggregated)
+            events = JobEventRecorder(job_id)
 
             # Read webhook_url once and define sender
             try:
                 job_row = get_job(job_id)
                 webhook_url = (job_row or {}).get("webhook_url")
             except Exception:
+                job_row = None
                 webhook_url = None
+            # jobs.total is maintained by add_job_recipients; no need to load every recipient row
+            job_total = int((job_row or {}).get("total") or 0)
+            # a job requeued after a worker restart (or deferral) continues from its pending recipients
+            resumed = bool((job_row or {}).get("success_count") or (job_row or {}).get("failure_count"))
+            try:
+                events.record("started", {"total": job_total, "resumed": resumed} if resumed else {"total": job_total})
+            except Exception:
+                pass
+            # tenant daily quota (0 = unlimited): once used up the job goes back to the queue until the next UTC day
+            daily_quota = tenant_limits(master_user_id, store_id)["daily_quota"]
+            deferred_until = None
+            defer_reason = None
+
+            # job-wide counters for live progress (includes sends from earlier runs of a resumed job)
+            base_success = int((job_row or {}).get("success_count") or 0)
+            base_failed = int((job_row or {}).get("failure_count") or 0)
+
+            def _progress() -> Dict[str, Any]:
+                return {
+                    "total": job_total or self.stats.get("total_emails", 0),
+                    "success": base_success + self.stats["success_count"],
+                    "failed": base_failed + self.stats["failure_count"],
+                }
 
             def _send_webhook(event_type: str, event_data: Dict[str, Any]):
                 if not webhook_url:
                     return
-                try:
-                    payload = {
-                        "job_id": job_id,
-                        "event_type": event_type,
-                        "event_data": event_data,
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                    }
-                    data = json.dumps(payload).encode("utf-8")
-                    req = _urlrequest.Request(
-                        webhook_url,
-                        data=data,
-                        headers={"Content-Type": "application/json"},
-                        method="POST",
-                    )
-                    # Fire-and-forget with short timeout
-                    _urlrequest.urlopen(req, timeout=5)
-                except (HTTPError, URLError, Exception):
-                    # Ignore webhook errors to not affect job execution
-                    try:
-                        self.logger.debug(f"Webhook POST failed for job {job_id} event {event_type}")
-                    except Exception:
-                        pass
+                payload = {
+                    "job_id": job_id,
+                    "event_type": event_type,
+                    "event_data": event_data,
+                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                }
+                # queued for background delivery; never blocks the send loop
+                get_webhook_dispatcher().submit(webhook_url, payload)
 
             # Notify started
             try:
-                _send_webhook("started", {"total": len(list_job_recipients(job_id))})
+                _send_webhook("started", {"total": job_total})
             except Exception:
                 pass
 
-            # Gmail service
-            gmail_service = self.gmail_auth_manager.get_gmail_service(sender_email, master_user_id, store_id)
-            if not gmail_service:
+            # Gmail service(s): the job's sender plus the optional pool of the tenant's other authorized senders
+            pool_emails = [sender_email] + [
+                e for e in parse_sender_pool((job_row or {}).get("sender_pool")) if e.lower() != sender_email.lower()
+            ]
+            sender_pool, _ = SenderPool.build(
+                self.gmail_auth_manager, master_user_id, store_id, pool_emails, self.sender_ledger, EmailSender
+            )
+            if sender_pool is None:
                 set_job_status(job_id, "error")
                 return {"success": False, "error": "Gmail service init failed"}
-            email_sender = EmailSender(gmail_service, sender_email)
+            # recipient events name the sending account only when the job rotates senders
+            pooled = len(sender_pool) > 1
 
             # Load template if needed (only when template_id is provided)
-            template_row = None
+            db_template = None
             if job_type == "template" and template_id is not None:
-                from src.dao_mysql import get_template
                 try:
-                    template_row = get_template(master_user_id, store_id, int(template_id))
+                    db_template = get_template_store().get_db_template(master_user_id, store_id, int(template_id))
                 except Exception:
-                    template_row = None
-                if template_row is None:
+                    db_template = None
+                if db_template is None:
                     # If explicit template_id provided but not found -> error
                     set_job_status(job_id, "error")
                     return {"success": False, "error": "Template not found for given template_id"}
 
             recipients = list_job_recipients(job_id, status="pending")
             total = len(recipients)
+            # image assets referenced by the template(s), resolved lazily and cached for this job
+            image_asset_cache: Dict[str, Optional[Dict[str, Any]]] = {}
+            # template html -> html with resolvable images rewritten to cid references
+            inline_html_cache: Dict[str, str] = {}
             self._reset_status()
             self.stats["total_emails"] = total
             self.status = SchedulerStatus.RUNNING
             self.start_time = datetime.now()
 
-            for i, row in enumerate(recipients):
+            # fresh recipients in id order; transient failures come back through retry_queue
+            # and are interleaved with fresh ones once their backoff has elapsed
+            fresh = deque(recipients)
+            retry_queue = RetryQueue()
+            seen_ids = {r["id"] for r in recipients}
+
+            def _refill() -> bool:
+                # recipients put back to pending while this run was going (the recovery sweep
+                # releasing ones a dead worker had in flight) are sent before the job completes
+                nonlocal total
+                extra = [r for r in list_job_recipients(job_id, status="pending") if r["id"] not in seen_ids]
+                for r in extra:
+                    seen_ids.add(r["id"])
+                    fresh.append(r)
+                total += len(extra)
+                self.stats["total_emails"] = total
+                return bool(extra)
+
+            def _record_success(row: Dict[str, Any], cur_sender: str, who: Dict[str, Any], message_id: Optional[str]):
+                # status and counter in one transaction (recovery only counts rows still 'sending')
+                finish_recipient(job_id, row["id"], "success", None, message_id)
+                self.stats["success_count"] += 1
+                self.sender_ledger.record_send(cur_sender)
+                sender_pool.report(cur_sender, True)
+                if daily_quota > 0:
+                    try:
+                        add_tenant_usage(master_user_id, store_id, 1)
+                    except Exception as usage_err:
+                        self.logger.warning(f"租户配额用量记录失败: {usage_err}")
+                try:
+                    events.record("recipient_success", {"email": row["to_email"], **who}, _progress())
+                except Exception:
+                    pass
+                try:
+                    _send_webhook("recipient_success", {"to_email": row["to_email"], **who})
+                except Exception:
+                    pass
+
+            while fresh or retry_queue or _refill():
+                row = retry_queue.pop_due()
+                if row is None:
+                    if not fresh:
+                        # only retries left and none due yet: wait for the earliest one
+                        if self._wait_with_interruption(retry_queue.seconds_until_due() or 0):
+                            self.status = SchedulerStatus.STOPPED
+                            break
+                        continue
+                    row = fresh.popleft()
+                    row["_index"] = total - len(fresh) - 1
+                i = row["_index"]
                 recipient_id = row["id"]
                 to_email = row["to_email"]
 
@@ -688,6 +989,12 @@ class EmailScheduler:
                 except Exception:
                     pass
 
+                # re-read on every send: other jobs of the same tenant draw from the same quota
+                if daily_quota > 0 and get_tenant_usage_today(master_user_id, store_id) >= daily_quota:
+                    deferred_until, defer_reason = next_quota_reset(), "tenant_daily_quota"
+                    self.logger.info(f"⏸️  租户 {master_user_id}/{store_id} 当日配额({daily_quota})已用尽，任务 {job_id} 推迟到 {deferred_until}")
+                    break
+
                 variables = row.get("variables") or {}
                 if isinstance(variables, str):
                     try:
@@ -718,259 +1025,168 @@ class EmailScheduler:
                     else:
                         norm_attachments.append(fid)
 
+                # a recipient already attempted (possibly delivered) stays on the account that tried it,
+                # so its Message-ID - and the Gmail lookup for it - does not change between attempts
+                if "_pinned" not in row:
+                    row["_pinned"] = row.get("sent_from") if int(row.get("attempts") or 0) > 0 else None
+                # pick a sender from the pool; shared per-sender pacing and daily cap apply
+                # (the send interval is applied when the slot is reserved). Reserved only now, after
+                # the pause/stop and tenant quota checks, so a job that stops or defers here does not
+                # hold a slot (and a daily-cap count) it never uses
+                cur_sender, turn = self._await_pool_slot(sender_pool, row["_pinned"])
+                if turn == "capped":
+                    deferred_until, defer_reason = next_quota_reset(), "sender_daily_cap"
+                    self.logger.info(f"⏸️  发件人当日配额已用尽({', '.join(pool_emails)})，任务 {job_id} 推迟到 {deferred_until}")
+                    break
+                if turn == "stopped":
+                    self.status = SchedulerStatus.STOPPED
+                    break
+                # claim the recipient (pending -> sending) before talking to Gmail so a
+                # crash between send and status write-back can be reconciled later
+                if not claim_recipient(recipient_id, RECIPIENT_LEASE_SEC, sender=cur_sender):
+                    self.logger.warning(f"⚠️  收件人 {recipient_id} 已被其他进程处理，跳过")
+                    self.sender_ledger.release(cur_sender)
+                    continue
+                row["attempts"] = int(row.get("attempts") or 0) + 1
+                email_sender = sender_pool.sender(cur_sender)
+                who = {"sender": cur_sender} if pooled else {}
+                message_id_header = message_id_for(job_id, recipient_id, cur_sender)
+                # the reserved slot counts toward the sender's cap until a send is recorded or it is released
+                slot_used = False
+
                 try:
                     if job_type == "template":
-                        if template_row is not None:
-                            rendered = self._render_from_template_row(template_row, variables)
+                        if db_template is not None:
+                            base_tpl = db_template
                         else:
                             base_tpl = self._get_file_template(master_user_id, store_id, language)
                             if not base_tpl:
                                 raise RuntimeError(f"Template files not found for language={language} (fallback en tried)")
-                            # apply variables
-                            rendered = self._render_from_template_row(
-                                {"subject": base_tpl["subject"], "html_content": base_tpl["html"], "text_content": base_tpl["text"]},
-                                variables,
-                            )
-
-                        if norm_attachments:
-                            # Try to inline images even when attachments exist
-                            html = rendered.get("html") or ""
-                            text = rendered.get("text") or ""
-                            images_to_embed = []
-                            if html:
-                                try:
-                                    soup = BeautifulSoup(html, "html.parser")
-                                    for img in soup.find_all("img"):
-                                        img_id = img.get("id")
-                                        if not img_id:
-                                            continue
-                                        from src.dao_mysql import get_asset_by_file_id
-                                        row_img = get_asset_by_file_id(master_user_id, store_id, "image", img_id)
-                                        if row_img and row_img.get("storage_path"):
-                                            cid = f"image_{img_id}"
-                                            images_to_embed.append({"cid": cid, "path": row_img["storage_path"], "filename": row_img.get("filename", img_id)})
-                                            img.attrs.pop("id", None)
-                                            img["src"] = f"cid:{cid}"
-                                    html = str(soup)
-                                except Exception:
-                                    pass
-
-                            if images_to_embed:
-                                root = MIMEMultipart('mixed')
-                                root["To"] = to_email
-                                root["From"] = sender_email
-                                root["Subject"] = rendered["subject"]
-
-                                related = MIMEMultipart('related')
-                                alt = MIMEMultipart('alternative')
-                                alt.attach(MIMEText(text, 'plain', 'utf-8'))
-                                alt.attach(MIMEText(html, 'html', 'utf-8'))
-                                related.attach(alt)
-
-                                # inline images
-                                for info in images_to_embed:
-                                    try:
-                                        with open(info["path"], 'rb') as f:
-                                            img_bytes = f.read()
-                                        mime_img = MIMEImage(img_bytes)
-                                        mime_img.add_header('Content-ID', f'<{info["cid"]}>')
-                                        mime_img.add_header('Content-Disposition', 'inline', filename=info["filename"]) 
-                                        related.attach(mime_img)
-                                    except Exception:
-                                        continue
-
-                                root.attach(related)
-
-                                # file attachments
-                                try:
-                                    att_mgr = email_sender.attachment_manager
-                                    for fid in norm_attachments:
-                                        ad = att_mgr.load_attachment_data(fid)
-                                        if not ad.get("success"):
-                                            continue
-                                        file_bytes = base64.urlsafe_b64decode(ad["base64_data"]) if '-' in ad["base64_data"] or '_' in ad["base64_data"] else base64.b64decode(ad["base64_data"]) 
-                                        mime_type = ad["mime_type"] or 'application/octet-stream'
-                                        filename = ad["filename"] or 'file'
-                                        if mime_type.startswith('application/') or mime_type.startswith('text/'):
-                                            part = MIMEApplication(file_bytes, _subtype=mime_type.split('/')[-1])
-                                        else:
-                                            main, sub = (mime_type.split('/', 1) + ['octet-stream'])[:2]
-                                            part = MIMEBase(main, sub)
-                                            part.set_payload(file_bytes)
-                                            encoders.encode_base64(part)
-                                        part.add_header('Content-Disposition', 'attachment', filename=filename)
-                                        root.attach(part)
-                                except Exception:
-                                    pass
-
-                                encoded = base64.urlsafe_b64encode(root.as_bytes()).decode()
-                                create_message = {"raw": encoded}
-                                result = (
-                                    email_sender.gmail_service.users()
-                                    .messages()
-                                    .send(userId="me", body=create_message)
-                                    .execute()
-                                )
-                                send_res = {"success": True, "message_id": result.get("id", "")}
-                            else:
-                                # no inline images, use existing attachment path
-                                send_res = email_sender.send_email_with_attachments(
-                                    to_email=to_email,
-                                    subject=rendered["subject"],
-                                    content=rendered["text"],
-                                    html_content=rendered["html"],
-                                    images=None,
-                                    attachments=norm_attachments,
-                                )
-                        else:
-                            # Direct send with optional inline images
-                            html = rendered.get("html") or ""
-                            text = rendered.get("text") or ""
-                            # Parse <img id="...">
-                            images_to_embed = []
-                            if html:
-                                try:
-                                    soup = BeautifulSoup(html, "html.parser")
-                                    for img in soup.find_all("img"):
-                                        img_id = img.get("id")
-                                        if not img_id:
-                                            continue
-                                        # lookup asset image by file_id=img_id
-                                        from src.dao_mysql import get_asset_by_file_id
-                                        row_img = get_asset_by_file_id(master_user_id, store_id, "image", img_id)
-                                        if row_img and row_img.get("storage_path"):
-                                            cid = f"image_{img_id}"
-                                            images_to_embed.append({"cid": cid, "path": row_img["storage_path"], "filename": row_img["filename"]})
-                                            img.attrs.pop("id", None)
-                                            img["src"] = f"cid:{cid}"
-                                    html = str(soup)
-                                except Exception:
-                                    pass
-
-                            if images_to_embed:
-                                msg = MIMEMultipart('related')
-                                msg["To"] = to_email
-                                msg["From"] = sender_email
-                                msg["Subject"] = rendered["subject"]
-                                alt = MIMEMultipart('alternative')
-                                alt.attach(MIMEText(text, 'plain', 'utf-8'))
-                                alt.attach(MIMEText(html, 'html', 'utf-8'))
-                                msg.attach(alt)
-                                for info in images_to_embed:
-                                    try:
-                                        with open(info["path"], 'rb') as f:
-                                            img_bytes = f.read()
-                                        mime_img = MIMEImage(img_bytes)
-                                        mime_img.add_header('Content-ID', f'<{info["cid"]}>')
-                                        mime_img.add_header('Content-Disposition', 'inline', filename=info.get("filename", info["cid"]))
-                                        msg.attach(mime_img)
-                                    except Exception:
-                                        continue
-                            else:
-                                msg = EmailMessage()
-                                msg["To"] = to_email
-                                msg["From"] = sender_email
-                                msg["Subject"] = rendered["subject"]
-                                if html:
-                                    msg.set_content(text)
-                                    msg.add_alternative(html, subtype='html')
-                                else:
-                                    msg.set_content(text)
-                            encoded = base64.urlsafe_b64encode(msg.as_bytes()).decode()
-                            create_message = {"raw": encoded}
-                            result = (
-                                email_sender.gmail_service.users()
-                                .messages()
-                                .send(userId="me", body=create_message)
-                                .execute()
-                            )
-                            send_res = {"success": True, "message_id": result.get("id", "")}
+                        tpl_html, images_to_embed = self._inline_images(
+                            base_tpl, master_user_id, store_id, image_asset_cache, inline_html_cache
+                        )
+                        # apply variables to the precompiled template
+                        rendered = self._render_from_template_row(
+                            {"subject": base_tpl["subject"], "html_content": tpl_html, "text_content": base_tpl["text"]},
+                            variables,
+                        )
+                        msg_subject = rendered["subject"]
+                        msg_text = rendered.get("text") or ""
+                        msg_html = rendered.get("html") or ""
                     else:
-                        if norm_attachments:
-                            send_res = email_sender.send_email_with_attachments(
-                                to_email=to_email,
-                                subject=subject,
-                                content=content,
-                                html_content=html_content,
-                                images=None,
-                                attachments=norm_attachments,
-                            )
-                        else:
-                            msg = EmailMessage()
-                            msg["To"] = to_email
-                            msg["From"] = sender_email
-                            msg["Subject"] = subject
-                            if html_content:
-                                msg.set_content(content)
-                                msg.add_alternative(html_content, subtype="html")
-                            else:
-                                msg.set_content(content)
-                            encoded = base64.urlsafe_b64encode(msg.as_bytes()).decode()
-                            create_message = {"raw": encoded}
-                            result = (
-                                email_sender.gmail_service.users()
-                                .messages()
-                                .send(userId="me", body=create_message)
-                                .execute()
-                            )
-                            send_res = {"success": True, "message_id": result.get("id", "")}
+                        images_to_embed = []
+                        msg_subject, msg_text, msg_html = subject, content, html_content
+
+                    msg, build_error = self._build_job_message(
+                        email_sender, to_email, cur_sender, msg_subject, msg_text, msg_html,
+                        images_to_embed, norm_attachments,
+                    )
+                    if msg is None:
+                        send_res = {"success": False, "error": build_error}
+                    else:
+                        send_res = self._send_message(email_sender, msg, message_id_header)
 
                     if send_res.get("success"):
                         message_id = send_res.get("message_id")
                         # 添加成功日志
                         self.logger.info(f"✅ [{i+1}/{total}] 邮件发送成功: {to_email}, message_id={message_id}")
-                        update_job_counts(job_id, success_inc=1)
-                        set_recipient_status(row["id"], "success", None, message_id)
-                        self.stats["success_count"] += 1
+                        slot_used = True
+                        _record_success(row, cur_sender, who, message_id)
+                    else:
+                        error_msg = send_res.get("error")
+                        # 添加失败日志
+                        self.logger.error(f"❌ [{i+1}/{total}] 邮件发送失败: {to_email}, 错误: {error_msg}")
+                        finish_recipient(job_id, row["id"], "failed", error_msg)
+                        self.stats["failure_count"] += 1
                         try:
-                            insert_job_event(job_id, "recipient_success", {"email": to_email})
+                            events.record("recipient_failed", {"email": to_email, "error": error_msg, **who}, _progress())
                         except Exception:
                             pass
                         try:
-                            _send_webhook("recipient_success", {"to_email": to_email})
+                            _send_webhook("recipient_failed", {"to_email": to_email, "error": error_msg, **who})
+                        except Exception:
+                            pass
+                except Exception as e:
+                    if is_quota_exhausted(e):
+                        # the account's daily sending limit: Gmail rejected the message, so it goes back
+                        # to pending and waits for the next quota reset instead of a backoff retry
+                        self.logger.warning(f"⏸️  发件人 {cur_sender} 当日发送配额已用尽: {to_email}, 错误: {e}")
+                        sender_pool.mark_capped(cur_sender)
+                        requeue_recipient(row["id"], str(e))
+                        # an unpinned recipient may go out from another account of the pool; a pinned
+                        # one (or a pool with every account capped) defers the job
+                        fresh.appendleft(row)
+                        continue
+                    transient, reason = classify_send_error(e)
+                    if transient:
+                        # the account may be throttled: rotate away from it for a while
+                        sender_pool.report(cur_sender, False, transient=True)
+                    if transient and self.retry_policy.should_retry(row["attempts"]):
+                        # the request may have reached Gmail before failing: look the message up by its
+                        # Message-ID before sending it again
+                        try:
+                            found_id = find_sent_message(email_sender.gmail_service, message_id_header)
+                        except Exception as lookup_err:
+                            found_id = None
+                            self.logger.warning(f"按Message-ID查找已发送邮件失败: {to_email}, 错误: {lookup_err}")
+                        if found_id:
+                            self.logger.info(f"✅ [{i+1}/{total}] 发送报错但邮件已送达: {to_email}, message_id={found_id}")
+                            slot_used = True
+                            _record_success(row, cur_sender, who, found_id)
+                            continue
+                        # temporary failure: back to pending and retry after a backoff, on the same account
+                        delay = self.retry_policy.delay_for(row["attempts"])
+                        self.logger.warning(
+                            f"🔁 [{i+1}/{total}] 临时发送失败({reason})，{delay:.0f}秒后第{row['attempts'] + 1}次尝试: {to_email}, 错误: {e}"
+                        )
+                        requeue_recipient(row["id"], str(e))
+                        row["_pinned"] = cur_sender
+                        retry_queue.push(row, delay)
+                        try:
+                            events.record("recipient_retry", {"email": to_email, "error": str(e), "attempts": row["attempts"], "delay_sec": round(delay, 1), **who}, _progress())
                         except Exception:
                             pass
                     else:
-                        error_msg = send_res.get("error")
-                        # 添加失败日志
-                        self.logger.error(f"❌ [{i+1}/{total}] 邮件发送失败: {to_email}, 错误: {error_msg}")
-                        update_job_counts(job_id, failure_inc=1)
-                        set_recipient_status(row["id"], "failed", error_msg)
+                        # 添加异常详细日志
+                        self.logger.error(f"❌ [{i+1}/{total}] 邮件发送异常: {to_email}, 错误: {e}", exc_info=True)
+                        finish_recipient(job_id, row["id"], "failed", str(e))
                         self.stats["failure_count"] += 1
                         try:
-                            insert_job_event(job_id, "recipient_failed", {"email": to_email, "error": error_msg})
+                            events.record("recipient_failed", {"email": to_email, "error": str(e), **who}, _progress())
                         except Exception:
                             pass
                         try:
-                            _send_webhook("recipient_failed", {"to_email": to_email, "error": error_msg})
+                            _send_webhook("recipient_failed", {"to_email": to_email, "error": str(e), **who})
                         except Exception:
                             pass
-                except Exception as e:
-                    # 添加异常详细日志
-                    self.logger.error(f"❌ [{i+1}/{total}] 邮件发送异常: {to_email}, 错误: {e}", exc_info=True)
-                    update_job_counts(job_id, failure_inc=1)
-                    set_recipient_status(row["id"], "failed", str(e))
-                    self.stats["failure_count"] += 1
-                    try:
-                        insert_job_event(job_id, "recipient_failed", {"email": to_email, "error": str(e)})
-                    except Exception:
-                        pass
-                    try:
-                        _send_webhook("recipient_failed", {"to_email": to_email, "error": str(e)})
-                    except Exception:
-                        pass
+                finally:
+                    if not slot_used:
+                        # nothing went out on the reserved slot: its daily-cap unit goes back to the sender
+                        self.sender_ledger.release(cur_sender)
 
-                if i < total - 1:
-                    interval = self.calculate_wait_time()
-                    if self._wait_with_interruption(interval):
-                        self.status = SchedulerStatus.STOPPED
-                        break
+            try:
+                events.flush()
+            except Exception:
+                pass
 
-            if self.status != SchedulerStatus.STOPPED:
+            if deferred_until:
+                self.status = SchedulerStatus.IDLE
+                defer_job(job_id, deferred_until)
+                try:
+                    events.record("deferred", {"until": deferred_until, "reason": defer_reason}, _progress())
+                except Exception:
+                    pass
+                try:
+                    _send_webhook("deferred", {"until": deferred_until, "reason": defer_reason})
+                except Exception:
+                    pass
+            elif self.status == SchedulerStatus.STOPPED:
+                get_event_bus().publish(job_id, "stopped", _progress())
+            else:
                 self.status = SchedulerStatus.IDLE
                 set_job_status(job_id, "completed")
                 try:
-                    insert_job_event(job_id, "completed", {"success": self.stats["success_count"], "failed": self.stats["failure_count"]})
+                    events.record("completed", {"success": self.stats["success_count"], "failed": self.stats["failure_count"]}, _progress())
                 except Exception:
                     pass
                 try:
@@ -994,6 +1210,7 @@ class EmailScheduler:
                 self.logger.error(f"Job {job_id} failed: {e}")
                 set_job_status(job_id, "error")
                 insert_job_event(job_id, "failed", {"error": str(e)})
+                get_event_bus().publish(job_id, "failed", {"error": str(e)})
             except Exception:
                 pass
             try:
@@ -1011,14 +1228,7 @@ class EmailScheduler:
                         "event_data": {"error": str(e)},
                         "timestamp": datetime.utcnow().isoformat() + "Z",
                     }
-                    data = json.dumps(payload).encode("utf-8")
-                    req = _urlrequest.Request(
-                        webhook_url,
-                        data=data,
-                        headers={"Content-Type": "application/json"},
-                        method="POST",
-                    )
-                    _urlrequest.urlopen(req, timeout=5)
+                    get_webhook_dispatcher().submit(webhook_url, payload)
             except Exception:
                 pass
             return {"success": False, "error": str(e)}
@@ -15,13 +15,36 @@ from typing import Optional, Dict, Any, List
 import pandas as pd
 
 from googleapiclient.errors import HttpError
-from src.template_manager import TemplateManager
+from src.services import get_attachment_manager, get_template_manager
+from src.batch_renderer import file_template_resolver, render_frame
+
+def format_template_preview(sender_email: str, to_email: str, language: str, email_content: Dict[str, Any]) -> str:
+    """
+    生成模板邮件的预览文本
+
+    Args:
+        email_content: 渲染结果（含 subject/content/html_content）
+    """
+    return f"""
+邮件预览 (基于模板):
+========================================
+发件人: {sender_email}
+收件人: {to_email}
+语言: {language}
+主题: {email_content["subject"]}
+========================================
+
+纯文本内容:
+{email_content["content"]}
+
+========================================
+
+HTML内容:
+{email_content["html_content"]}
+
+========================================
+"""
 
-# 处理不同的导入路径
-try:
-    from src.attachment_manager import AttachmentManager
-except ImportError:
-    from attachment_manager import AttachmentManager
 
 class EmailSender:
     """邮件发送器"""
@@ -37,8 +60,9 @@ class EmailSender:
         """
         self.gmail_service = gmail_service
         self.sender_email = sender_email
-        self.template_manager = TemplateManager(template_dir)
-        self.attachment_manager = AttachmentManager()
+        # 模板/附件管理器进程内共享（见 src/services.py），每个任务的发送器直接复用已有缓存
+        self.template_manager = get_template_manager(template_dir)
+        self.attachment_manager = get_attachment_manager()
         self.logger = logging.getLogger(__name__)
 
     def create_email_message(
@@ -297,39 +321,41 @@ class EmailSender:
         try:
             # 生成包含图片处理的邮件内容
             email_content = self.template_manager.generate_email_content_with_images(language, row_data)
+            return self._send_template_content(to_email, language, email_content, attachments)
 
-            if email_content["errors"]:
-                return {
-                    "success": False,
-                    "error": f"模板处理错误: {', '.join(email_content['errors'])}",
-                    "to_email": to_email,
-                    "language": language
-                }
+        except Exception as e:
+            self.logger.error(f"基于模板发送邮件失败: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "to_email": to_email,
+                "language": language,
+                "template_used": True
+            }
 
-            # 根据是否有附件和图片选择发送方法
-            if attachments or email_content["has_images"]:
-                # 使用完整的多媒体发送方法
-                result = self.send_email_with_attachments(
-                    to_email=to_email,
-                    subject=email_content["subject"],
-                    content=email_content["content"],
-                    html_content=email_content["html_content"],
-                    attachments=attachments or [],
-                    images=email_content["images"] if email_content["has_images"] else []
-                )
-            else:
-                # 简单邮件发送
-                result = self.send_email(
-                    to_email=to_email,
-                    subject=email_content["subject"],
-                    content=email_content["content"],
-                    html_content=email_content["html_content"]
-                )
+    def send_email_from_rendered(self, rendered: Dict[str, Any], attachments: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        发送批量渲染器（src/batch_renderer.py）生成的邮件，图片与附件处理同 send_email_from_template
 
-            # 添加模板和语言信息
-            result["template_used"] = True
-            result["language"] = language
-            return result
+        Args:
+            rendered: render_frame 输出的单条邮件
+            attachments: 附件文件列表
+
+        Returns:
+            发送结果字典
+        """
+        to_email = rendered["to_email"]
+        language = rendered["language"]
+        try:
+            email_content = {
+                "subject": rendered["subject"],
+                "html_content": rendered["html_content"],
+                "content": rendered["content"],
+                "language": language,
+                "errors": list(rendered.get("errors") or []),
+            }
+            self.template_manager.apply_html_images(email_content)
+            return self._send_template_content(to_email, language, email_content, attachments)
 
         except Exception as e:
             self.logger.error(f"基于模板发送邮件失败: {e}")
@@ -341,9 +367,44 @@ class EmailSender:
                 "template_used": True
             }
 
+    def _send_template_content(self, to_email: str, language: str, email_content: Dict[str, Any], attachments: Optional[List[str]]) -> Dict[str, Any]:
+        """发送已生成的模板邮件内容"""
+        if email_content["errors"]:
+            return {
+                "success": False,
+                "error": f"模板处理错误: {', '.join(email_content['errors'])}",
+                "to_email": to_email,
+                "language": language
+            }
+
+        # 根据是否有附件和图片选择发送方法
+        if attachments or email_content["has_images"]:
+            # 使用完整的多媒体发送方法
+            result = self.send_email_with_attachments(
+                to_email=to_email,
+                subject=email_content["subject"],
+                content=email_content["content"],
+                html_content=email_content["html_content"],
+                attachments=attachments or [],
+                images=email_content["images"] if email_content["has_images"] else []
+            )
+        else:
+            # 简单邮件发送
+            result = self.send_email(
+                to_email=to_email,
+                subject=email_content["subject"],
+                content=email_content["content"],
+                html_content=email_content["html_content"]
+            )
+
+        # 添加模板和语言信息
+        result["template_used"] = True
+        result["language"] = language
+        return result
+
     def send_bulk_emails_from_data(self, filtered_data: pd.DataFrame) -> Dict[str, Any]:
         """
-        基于过滤后的数据批量发送邮件
+        基于过滤后的数据批量发送邮件（按语言分组批量渲染，每种语言的模板只解析一次）
 
         Args:
             filtered_data: 过滤后的DataFrame，包含邮箱、语言和其他参数列
@@ -359,16 +420,12 @@ class EmailSender:
             "languages_used": set()
         }
 
-        for _, row in filtered_data.iterrows():
-            to_email = row["邮箱"]
-            language = row.get("语言", "English")
-            row_data = row.to_dict()
-
+        for rendered in render_frame(filtered_data, file_template_resolver(self.template_manager)):
             # 记录使用的语言
-            results["languages_used"].add(language)
+            results["languages_used"].add(rendered["language"])
 
             # 发送邮件
-            result = self.send_email_from_template(to_email, language, row_data)
+            result = self.send_email_from_rendered(rendered)
             results["results"].append(result)
 
             if result["success"]:
@@ -406,27 +463,7 @@ class EmailSender:
             if email_content["errors"]:
                 return f"模板处理错误:\n{chr(10).join(email_content['errors'])}"
 
-            # 生成预览
-            preview = f"""
-邮件预览 (基于模板):
-========================================
-发件人: {self.sender_email}
-收件人: {to_email}
-语言: {language}
-主题: {email_content["subject"]}
-========================================
-
-纯文本内容:
-{email_content["content"]}
-
-========================================
-
-HTML内容:
-{email_content["html_content"]}
-
-========================================
-"""
-            return preview
+            return format_template_preview(self.sender_email, to_email, language, email_content)
 
         except Exception as e:
             self.logger.error(f"预览邮件失败: {e}")
@@ -0,0 +1,123 @@
+"""
+进程内任务事件总线
+发送线程发布进度/收件人事件，SSE连接按事件序号等待新事件；
+每个任务保留一个有界环形缓冲区，支持按 Last-Event-ID 断点续传
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# 每个任务缓冲的事件数
+DEFAULT_BUFFER_SIZE = 1000
+# 任务结束后频道保留的秒数（供迟到的连接补读）
+FINISHED_TTL_SEC = 600
+
+TERMINAL_EVENTS = ("completed", "failed", "stopped")
+
+
+class _Channel:
+    def __init__(self, buffer_size: int):
+        self.events: Deque[Tuple[int, str, Dict[str, Any]]] = deque(maxlen=buffer_size)
+        self.last_seq = 0
+        self.finished_at: Optional[float] = None
+
+
+class JobEventBus:
+    """按任务分频道的事件总线（线程安全）"""
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._buffer_size = buffer_size
+        self._channels: Dict[str, _Channel] = {}
+        self._cond = threading.Condition()
+        # 发布后回调 listener(job_id)：供不占线程的等待方（如ASGI事件循环）唤醒自身
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        with self._cond:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str], None]) -> None:
+        with self._cond:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def publish(self, job_id: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> int:
+        """发布事件，返回该事件在任务内的序号"""
+        with self._cond:
+            ch = self._channels.get(job_id)
+            if ch is None:
+                self._gc()
+                ch = self._channels[job_id] = _Channel(self._buffer_size)
+            ch.last_seq += 1
+            ch.events.append((ch.last_seq, event_type, data or {}))
+            # a stopped job can be resumed in the same process: any later event reopens the channel
+            ch.finished_at = time.monotonic() if event_type in TERMINAL_EVENTS else None
+            self._cond.notify_all()
+            seq = ch.last_seq
+            listeners = list(self._listeners)
+        # 回调在锁外执行，且不影响发布方
+        for listener in listeners:
+            try:
+                listener(job_id)
+            except Exception:
+                pass
+        return seq
+
+    def has_job(self, job_id: str) -> bool:
+        with self._cond:
+            return job_id in self._channels
+
+    def read(self, job_id: str, after_seq: int = 0, timeout: float = 0.0) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]:
+        """
+        读取序号大于 after_seq 的事件，没有新事件时最多等待 timeout 秒
+
+        Returns:
+            元组：(事件列表[(seq, event_type, data)], 是否存在缺口)
+            缺口表示请求的位置已被环形缓冲淘汰（或来自其他进程/重启前），
+            调用方应先补发一次进度快照
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ch = self._channels.get(job_id)
+                if ch is not None and ch.last_seq > after_seq:
+                    first_seq = ch.events[0][0] if ch.events else ch.last_seq + 1
+                    gap = after_seq < first_seq - 1
+                    return [e for e in ch.events if e[0] > after_seq], gap
+                if ch is not None and after_seq > ch.last_seq:
+                    # 序号来自其他进程或重启之前：从当前位置继续
+                    return [], True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], False
+                self._cond.wait(remaining)
+
+    def is_finished(self, job_id: str, after_seq: int = 0) -> bool:
+        """任务已发布结束事件，且 after_seq 之后没有更多事件（断点续传到末尾的连接应直接结束）"""
+        with self._cond:
+            ch = self._channels.get(job_id)
+            return ch is not None and ch.finished_at is not None and after_seq >= ch.last_seq
+
+    def last_seq(self, job_id: str) -> int:
+        with self._cond:
+            ch = self._channels.get(job_id)
+            return ch.last_seq if ch else 0
+
+    def _gc(self) -> None:
+        """清理结束超过 FINISHED_TTL_SEC 的频道（调用方持有锁）"""
+        now = time.monotonic()
+        stale = [
+            job_id for job_id, ch in self._channels.items()
+            if ch.finished_at is not None and now - ch.finished_at > FINISHED_TTL_SEC
+        ]
+        for job_id in stale:
+            del self._channels[job_id]
+
+
+_bus = JobEventBus()
+
+
+def get_event_bus() -> JobEventBus:
+    """进程级共享的事件总线"""
+    return _bus
@@ -0,0 +1,213 @@
+"""
+Excel任务导入模块
+把表格活动转换为数据库任务：按 filter_email_list 规则流式读取待发送行，分批写入 jobs/job_recipients，
+由 JobRunner 以数据库发送引擎执行（可续跑、可并发、支持任务API）；任务完成后把收件人状态写回表格
+"""
+import logging
+import math
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from src.dao_mysql import (
+    add_job_recipients,
+    create_job,
+    get_job,
+    insert_job_event,
+    list_job_recipient_statuses,
+    set_job_status,
+)
+from src.excel_processor import ExcelProcessor
+from src.services import get_excel_processor
+from src.recipient_import import iter_recipient_chunks, read_header
+from src.status_journal import apply_statuses, journal_path_for, read_journal
+from src.workbook_session import STATUS_COLUMN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+# 收件人状态 -> 表格「是否已邮箱建联」取值；其余状态（pending/sending）不写回
+SHEET_STATUS = {"success": 1, "failed": -1}
+# CSV/Parquet 来源可以导入，但状态只写回 Excel 工作簿
+WRITABLE_SUFFIXES = (".xlsx", ".xlsm")
+
+
+def _json_value(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, "item"):
+        # numpy 标量
+        return _json_value(value.item())
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def _language_code(excel_processor: ExcelProcessor, language: str) -> str:
+    """表格里的语言名称（English、Spanish…）转换为文件模板使用的语言代码；已是代码或未知的取值原样保留"""
+    template_manager = excel_processor.template_manager
+    if language in template_manager.language_map:
+        return template_manager.get_language_code(language)
+    return language
+
+
+def iter_workbook_recipients(
+    file_path: str,
+    excel_processor: ExcelProcessor,
+    chunksize: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    流式读取表格中待发送的收件人（过滤规则与传统Excel路径一致，同一邮箱只保留第一行）
+
+    Yields:
+        收件人列表 [{"to_email", "language", "variables"}]
+    """
+    pending = read_journal(journal_path_for(file_path))
+    seen = set()
+    for chunk in iter_recipient_chunks(file_path, None, chunksize):
+        if pending:
+            apply_statuses(chunk, pending)
+        # raises on failure: a chunk that cannot be filtered must fail the import, not drop its rows
+        filtered = excel_processor.select_sendable(chunk)
+        if filtered.empty:
+            continue
+        filtered = filtered[filtered[STATUS_COLUMN].isna() | (filtered[STATUS_COLUMN] == 0)]
+        batch: List[Dict[str, Any]] = []
+        for row in filtered.to_dict("records"):
+            # 保持原值，写回时按原值匹配表格行
+            email = str(row["邮箱"])
+            if email in seen:
+                continue
+            seen.add(email)
+            variables = {k: _json_value(v) for k, v in row.items() if k != STATUS_COLUMN}
+            batch.append({
+                "to_email": email,
+                "language": _language_code(excel_processor, _json_value(row.get("语言")) or "English"),
+                "variables": variables,
+            })
+        if batch:
+            yield batch
+
+
+def missing_columns(file_path: str, excel_processor: Optional[ExcelProcessor] = None) -> List[str]:
+    """表格缺少的必需列（与 ExcelProcessor.required_columns 一致，只读取表头）"""
+    processor = excel_processor or get_excel_processor()
+    present = set(read_header(file_path))
+    return [col for col in processor.required_columns if col not in present]
+
+
+def import_workbook_job(
+    file_path: str,
+    master_user_id: str,
+    store_id: str,
+    sender_email: str,
+    template_id: Optional[int] = None,
+    subject: Optional[str] = None,
+    content: Optional[str] = None,
+    html_content: Optional[str] = None,
+    min_interval: int = 20,
+    max_interval: int = 90,
+    webhook_url: Optional[str] = None,
+    schedule_at: Optional[str] = None,
+    priority: int = 0,
+    sender_pool: Optional[List[str]] = None,
+    attachments: Optional[List[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    excel_processor: Optional[ExcelProcessor] = None,
+) -> Dict[str, Any]:
+    """
+    把表格导入为数据库任务
+
+    任务以 paused 状态创建，收件人全部写入后才转为 queued，避免 JobRunner 执行导入了一半的任务。
+    提供 subject/content 时为 custom 任务，否则为 template 任务（template_id 或按语言的文件模板）。
+
+    Args:
+        file_path: 表格路径（.xlsx/.csv/.parquet）
+        attachments: 已解析的附件相对路径（写入每个收件人的 __attachments__）
+        batch_size: 每批读取/写入的行数
+
+    Returns:
+        {"job_id", "recipients", "status"}
+
+    Raises:
+        ValueError: 表格缺少必需的列（此时不创建任务）
+    """
+    processor = excel_processor or get_excel_processor()
+    source_file = os.path.abspath(file_path)
+    missing = missing_columns(source_file, processor)
+    if missing:
+        raise ValueError(f"missing required columns: {', '.join(missing)}")
+    job_type = "custom" if (subject and (content or html_content)) else "template"
+    job_id = create_job(
+        master_user_id, store_id, job_type, sender_email, template_id if job_type == "template" else None,
+        subject, content, html_content, min_interval, max_interval, webhook_url, schedule_at, priority,
+        sender_pool, status="paused", source_file=source_file,
+    )
+    total = 0
+    try:
+        for batch in iter_workbook_recipients(source_file, processor, batch_size):
+            if attachments:
+                for r in batch:
+                    r["variables"]["__attachments__"] = attachments
+            total += add_job_recipients(job_id, batch)
+    except Exception:
+        logger.error(f"表格导入任务失败，任务 {job_id} 标记为error（已导入 {total} 个收件人）", exc_info=True)
+        set_job_status(job_id, "error")
+        raise
+
+    # 没有待发送行时直接完成，不进入队列
+    status = "queued" if total else "completed"
+    set_job_status(job_id, status)
+    try:
+        insert_job_event(job_id, "imported", {"source_file": source_file, "recipients": total})
+    except Exception:
+        pass
+    logger.info(f"表格已导入为任务 {job_id}: {source_file}, {total} 个收件人")
+    return {"job_id": job_id, "recipients": total, "status": status}
+
+
+def sync_job_to_workbook(job_id: str, excel_processor: Optional[ExcelProcessor] = None) -> Dict[str, Any]:
+    """
+    把任务的收件人结果写回来源表格（success→1，failed→-1，一次原子写回）
+
+    Returns:
+        {"success", "updated", "missing"} 或 {"success": False, "error"}
+    """
+    job = get_job(job_id)
+    if not job:
+        return {"success": False, "error": "job not found"}
+    source_file = job.get("source_file")
+    if not source_file:
+        return {"success": False, "error": "job was not imported from a workbook"}
+    if not os.path.exists(source_file):
+        return {"success": False, "error": f"source file not found: {source_file}"}
+    if not source_file.lower().endswith(WRITABLE_SUFFIXES):
+        return {"success": False, "error": "status write-back supports Excel workbooks only"}
+
+    statuses = {
+        r["to_email"]: SHEET_STATUS[r["status"]]
+        for r in list_job_recipient_statuses(job_id)
+        if r["status"] in SHEET_STATUS
+    }
+    if not statuses:
+        return {"success": True, "updated": 0, "missing": 0}
+    processor = excel_processor or get_excel_processor()
+    results = processor.batch_update_status(source_file, statuses)
+    updated = sum(1 for ok in results.values() if ok)
+    if not updated:
+        return {"success": False, "error": "write-back failed or no matching rows", "missing": len(results)}
+    try:
+        insert_job_event(job_id, "source_synced", {"source_file": source_file, "updated": updated, "missing": len(results) - updated})
+    except Exception:
+        pass
+    logger.info(f"任务 {job_id} 的收件人状态已写回表格: {source_file}, {updated} 行")
+    return {"success": True, "updated": updated, "missing": len(results) - updated}
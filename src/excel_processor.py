@@ -3,10 +3,14 @@ Excel文件处理模块
 负责读取、过滤和更新Excel文件中的邮箱数据
 """
 import logging
+import threading
 import pandas as pd
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Optional, Set
 from pathlib import Path
-from src.template_manager import TemplateManager
+from src.services import get_template_manager
+from src.status_journal import StatusJournal, apply_statuses, journal_path_for, read_journal
+from src.workbook_session import open_workbook
+from src.recipient_import import read_recipients, template_columns
 
 class ExcelProcessor:
     """Excel文件处理器"""
@@ -19,10 +23,13 @@ class ExcelProcessor:
             template_dir: 模板目录路径
         """
         self.logger = logging.getLogger(__name__)
-        self.template_manager = TemplateManager(template_dir)
+        self.template_manager = get_template_manager(template_dir)
         self.required_columns = [
             "邮箱", "合作次数", "回复次数", "跟进次数", "跟进方式", "是否已邮箱建联", "语言"
         ]
+        # 工作簿路径 -> 状态日志
+        self._journals: Dict[str, StatusJournal] = {}
+        self._journals_lock = threading.Lock()
 
     def validate_excel_file(self, file_path: str) -> bool:
         """
@@ -35,12 +42,12 @@ class ExcelProcessor:
             文件是否有效
         """
         try:
-            df = pd.read_excel(file_path)
+            columns = open_workbook(file_path).columns
 
             # 检查必需的列是否存在
             missing_columns = []
             for col in self.required_columns:
-                if col not in df.columns:
+                if col not in columns:
                     missing_columns.append(col)
 
             if missing_columns:
@@ -56,7 +63,7 @@ class ExcelProcessor:
 
     def read_excel_data(self, file_path: str) -> pd.DataFrame:
         """
-        读取Excel文件数据
+        读取Excel文件数据（同一文件未修改时复用已解析的结果）
 
         Args:
             file_path: Excel文件路径
@@ -65,13 +72,42 @@ class ExcelProcessor:
             数据DataFrame，失败时返回空DataFrame
         """
         try:
-            df = pd.read_excel(file_path)
+            df = open_workbook(file_path).copy()
+            # 叠加尚未合并回工作簿的状态日志
+            pending = read_journal(journal_path_for(file_path))
+            if pending:
+                apply_statuses(df, pending)
             self.logger.info(f"成功读取Excel文件: {file_path}, 共 {len(df)} 行数据")
             return df
         except Exception as e:
             self.logger.error(f"读取Excel文件失败: {e}")
             return pd.DataFrame()
 
+    def read_recipient_data(self, file_path: str, chunksize: Optional[int] = None) -> pd.DataFrame:
+        """
+        列式导入收件人数据：只读取过滤所需列与模板引用的占位符列，使用紧凑类型
+
+        适用于大表格，支持 .xlsx（只读流式）/.csv/.parquet。
+
+        Args:
+            file_path: 表格文件路径
+            chunksize: 每块读取的行数（可选）
+
+        Returns:
+            数据DataFrame，失败时返回空DataFrame
+        """
+        try:
+            columns = set(self.required_columns) | template_columns(self.template_manager)
+            kwargs = {"chunksize": chunksize} if chunksize else {}
+            df = read_recipients(file_path, columns, **kwargs)
+            pending = read_journal(journal_path_for(file_path))
+            if pending:
+                apply_statuses(df, pending)
+            return df
+        except Exception as e:
+            self.logger.error(f"列式导入收件人数据失败: {e}")
+            return pd.DataFrame()
+
     def filter_email_list(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         根据指定条件过滤邮箱列表
@@ -84,15 +120,7 @@ class ExcelProcessor:
             过滤后的DataFrame
         """
         try:
-            # 应用过滤条件
-            filtered_df = df[
-                (df["邮箱"].notna()) &  # 邮箱不为空
-                (df["邮箱"] != "") &     # 邮箱不为空字符串
-                (df["合作次数"] == 0) &  # 合作次数为0
-                (df["回复次数"] == 0) &  # 回复次数为0
-                (df["跟进次数"] == 1) &  # 跟进次数为1
-                (df["跟进方式"] != "手动")  # 跟进方式不是手动
-            ].copy()
+            filtered_df = self.select_sendable(df)
 
             self.logger.info(f"过滤后的邮箱数量: {len(filtered_df)}")
 
@@ -107,41 +135,64 @@ class ExcelProcessor:
             self.logger.error(f"邮箱列表过滤失败: {e}")
             return pd.DataFrame()
 
-    def update_email_status(self, file_path: str, email: str, status: int) -> bool:
+    def select_sendable(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        更新Excel文件中特定邮箱的建联状态
+        filter_email_list 的过滤条件本身：失败时抛出异常而不是返回空表
+        （分块导入需要区分“没有符合条件的行”与“过滤失败”）
+
+        Raises:
+            KeyError: 缺少过滤所需的列
+        """
+        # 应用过滤条件
+        return df[
+            (df["邮箱"].notna()) &  # 邮箱不为空
+            (df["邮箱"] != "") &     # 邮箱不为空字符串
+            (df["合作次数"] == 0) &  # 合作次数为0
+            (df["回复次数"] == 0) &  # 回复次数为0
+            (df["跟进次数"] == 1) &  # 跟进次数为1
+            (df["跟进方式"] != "手动")  # 跟进方式不是手动
+        ].copy()
+
+    def status_journal(self, file_path: str) -> StatusJournal:
+        """获取工作簿对应的状态日志（同一路径共享一个实例）"""
+        key = str(Path(file_path).resolve())
+        with self._journals_lock:
+            if key not in self._journals:
+                self._journals[key] = StatusJournal(file_path)
+            return self._journals[key]
+
+    def record_email_status(self, file_path: str, email: str, status: int) -> None:
+        """
+        记录邮箱的建联状态（追加到状态日志，达到阈值时批量合并回工作簿）
 
         Args:
             file_path: Excel文件路径
             email: 邮箱地址
             status: 状态值 (1: 成功, -1: 失败)
-
-        Returns:
-            是否更新成功
         """
-        try:
-            # 读取当前文件
-            df = pd.read_excel(file_path)
+        journal = self.status_journal(file_path)
+        journal.append(email, status)
+        journal.maybe_compact()
 
-            # 查找对应的邮箱行
-            mask = df["邮箱"] == email
-            if not mask.any():
-                self.logger.warning(f"未找到邮箱: {email}")
-                return False
+    def flush_email_status(self, file_path: str) -> bool:
+        """将状态日志立即合并回工作簿（任务结束时调用）"""
+        return self.status_journal(file_path).compact()
 
-            # 更新状态
-            df.loc[mask, "是否已邮箱建联"] = status
+    def update_email_status(self, file_path: str, email: str, status: int) -> bool:
+        """
+        更新Excel文件中特定邮箱的建联状态（立即写回工作簿）
 
-            # 保存文件
-            df.to_excel(file_path, index=False)
+        批量发送请使用 record_email_status，避免每封邮件重写整个工作簿。
 
-            status_text = "成功" if status == 1 else "失败"
-            self.logger.info(f"邮箱状态更新{status_text}: {email}")
-            return True
+        Args:
+            file_path: Excel文件路径
+            email: 邮箱地址
+            status: 状态值 (1: 成功, -1: 失败)
 
-        except Exception as e:
-            self.logger.error(f"更新邮箱状态失败: {e}")
-            return False
+        Returns:
+            是否更新成功
+        """
+        return self.batch_update_status(file_path, {email: status}).get(email, False)
 
     def batch_update_status(self, file_path: str, email_status_dict: Dict[str, int]) -> Dict[str, bool]:
         """
@@ -157,21 +208,18 @@ class ExcelProcessor:
         results = {}
 
         try:
-            # 读取当前文件
-            df = pd.read_excel(file_path)
-
-            # 批量更新
+            emails = open_workbook(file_path).emails()
+            journal = self.status_journal(file_path)
             for email, status in email_status_dict.items():
-                mask = df["邮箱"] == email
-                if mask.any():
-                    df.loc[mask, "是否已邮箱建联"] = status
-                    results[email] = True
+                results[email] = email in emails
+                if results[email]:
+                    journal.append(email, status)
                 else:
-                    results[email] = False
                     self.logger.warning(f"未找到邮箱: {email}")
 
-            # 保存文件
-            df.to_excel(file_path, index=False)
+            # 连同之前未合并的日志一起原子写回
+            if not journal.compact():
+                raise RuntimeError("写回工作簿失败")
             self.logger.info(f"批量更新完成，成功: {sum(results.values())}, 失败: {len(results) - sum(results.values())}")
 
         except Exception as e:
@@ -273,16 +321,17 @@ class ExcelProcessor:
             验证结果字典
         """
         try:
-            df = self.read_excel_data(file_path)
-            if df.empty:
+            # 只需要列名和语言列，直接读取已解析的工作簿，不复制整表
+            session = open_workbook(file_path)
+            if not len(session):
                 return {"valid": False, "error": "无法读取Excel文件"}
 
             # 获取所有列名
-            data_columns = df.columns.tolist()
+            data_columns = session.columns.tolist()
 
             # 获取所有唯一的语言
-            if "语言" in df.columns:
-                unique_languages = df["语言"].dropna().unique().tolist()
+            if "语言" in session.columns:
+                unique_languages = session.unique_values("语言")
             else:
                 unique_languages = ["English"]  # 默认英语
 
@@ -336,18 +385,19 @@ class ExcelProcessor:
             self.logger.error(f"获取模板参数失败: {e}")
             return set()
 
-    def get_filtered_data_with_language(self, file_path: str) -> pd.DataFrame:
+    def get_filtered_data_with_language(self, file_path: str, columnar: bool = False) -> pd.DataFrame:
         """
         获取过滤后的数据，包含语言信息
 
         Args:
             file_path: Excel文件路径
+            columnar: 是否使用列式导入（只读取需要的列，适用于大表格及CSV/Parquet）
 
         Returns:
             过滤后的DataFrame，包含所有需要的列
         """
         try:
-            df = self.read_excel_data(file_path)
+            df = self.read_recipient_data(file_path) if columnar else self.read_excel_data(file_path)
             if df.empty:
                 return pd.DataFrame()
 
@@ -0,0 +1,142 @@
+"""
+多租户公平调度模块
+按 (master_user_id, store_id) 对排队任务做赤字轮转（Deficit Round Robin）：
+每个租户每轮获得 quantum×权重 的额度，任务按收件人数计费，
+同一租户内按优先级、计划时间、创建时间排序；另提供租户并发/每日配额配置读取
+"""
+import json
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.config import get_config
+
+logger = logging.getLogger(__name__)
+
+Tenant = Tuple[str, str]
+
+
+def tenant_of(job: Dict[str, Any]) -> Tenant:
+    return (str(job["master_user_id"]), str(job["store_id"]))
+
+
+def tenant_limits(master_user_id: str, store_id: str) -> Dict[str, int]:
+    """
+    租户的调度限制：默认值来自配置，TENANT_LIMITS 中的同名键覆盖
+
+    Returns:
+        {"weight", "max_concurrent", "daily_quota"}；daily_quota 为0表示不限
+    """
+    cfg = get_config()
+    limits = {
+        "weight": 1,
+        "max_concurrent": cfg["TENANT_MAX_CONCURRENT_JOBS"],
+        "daily_quota": cfg["TENANT_DAILY_QUOTA"],
+    }
+    raw = cfg["TENANT_LIMITS"]
+    if raw:
+        try:
+            override = json.loads(raw).get(f"{master_user_id}:{store_id}") or {}
+            for key in limits:
+                if key in override:
+                    limits[key] = int(override[key])
+        except Exception as e:
+            logger.warning(f"TENANT_LIMITS 配置无法解析，使用默认值: {e}")
+    limits["weight"] = max(1, limits["weight"])
+    limits["max_concurrent"] = max(1, limits["max_concurrent"])
+    return limits
+
+
+def next_quota_reset(now: Optional[datetime] = None) -> str:
+    """下一次每日配额重置时间（次日UTC零点），格式与 jobs.schedule_at 一致"""
+    now = now or datetime.utcnow()
+    reset = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return reset.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+class FairScheduler:
+    """赤字轮转选择器（非线程安全，由JobRunner调度线程使用）"""
+
+    def __init__(self, quantum: int = 500):
+        """
+        Args:
+            quantum: 每轮为权重1的租户增加的额度（收件人数）
+        """
+        self.quantum = max(1, quantum)
+        self._ring: List[Tenant] = []
+        self._deficit: Dict[Tenant, float] = {}
+        self._cursor = 0
+
+    @staticmethod
+    def job_cost(job: Dict[str, Any]) -> int:
+        return max(1, int(job.get("total") or 0))
+
+    def pick(
+        self,
+        candidates: Iterable[Dict[str, Any]],
+        blocked: Iterable[Tenant] = (),
+        weights: Optional[Dict[Tenant, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        从候选任务中选出下一个要执行的任务
+
+        Args:
+            candidates: 已到期的排队任务（可只包含每个租户队首的若干个）
+            blocked: 本轮不可调度的租户（并发已满或当日配额用尽）
+            weights: 租户权重，缺省为1
+        """
+        weights = weights or {}
+        blocked = set(blocked)
+        queues: Dict[Tenant, List[Dict[str, Any]]] = {}
+        for job in candidates:
+            queues.setdefault(tenant_of(job), []).append(job)
+
+        # 没有积压的租户失去剩余额度（DRR规则），新租户排到轮转末尾
+        for t in [t for t in self._ring if t not in queues]:
+            self._remove(t)
+        for t in queues:
+            if t not in self._deficit:
+                self._ring.append(t)
+                self._deficit[t] = 0.0
+
+        active = [t for t in self._rotation() if t not in blocked]
+        if not active:
+            return None
+        heads = {
+            t: min(queues[t], key=lambda j: (-int(j.get("priority") or 0), str(j.get("schedule_at")), str(j.get("created_at"))))
+            for t in active
+        }
+
+        for _ in range(2):
+            for t in active:
+                cost = self.job_cost(heads[t])
+                if self._deficit[t] >= cost:
+                    self._deficit[t] -= cost
+                    self._cursor = (self._ring.index(t) + 1) % len(self._ring)
+                    return heads[t]
+            # 所有租户额度都不足：一次性补足最少的整轮数，等价于逐轮空转
+            rounds = min(
+                math.ceil((self.job_cost(heads[t]) - self._deficit[t]) / (self.quantum * weights.get(t, 1)))
+                for t in active
+            )
+            for t in active:
+                self._deficit[t] += max(1, rounds) * self.quantum * weights.get(t, 1)
+        return None
+
+    def _rotation(self) -> List[Tenant]:
+        if not self._ring:
+            return []
+        start = self._cursor % len(self._ring)
+        return self._ring[start:] + self._ring[:start]
+
+    def _remove(self, tenant: Tenant) -> None:
+        idx = self._ring.index(tenant)
+        self._ring.pop(idx)
+        self._deficit.pop(tenant, None)
+        if idx < self._cursor:
+            self._cursor -= 1
+        if self._ring:
+            self._cursor %= len(self._ring)
+        else:
+            self._cursor = 0
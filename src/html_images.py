@@ -0,0 +1,89 @@
+"""
+HTML图片标签改写模块
+用正则扫描 <img> 标签，把 id 引用改写为 cid 引用，无需构建完整的DOM树
+"""
+import html as _html
+import re
+from typing import Callable, List, Optional, Tuple
+
+# 属性值中允许出现 ">"（如 alt="a>b"），因此逐段匹配引号内容
+IMG_TAG_PATTERN = re.compile(r"""<img\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.IGNORECASE)
+ATTR_PATTERN = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?""")
+
+
+def cid_for(image_id: str) -> str:
+    """图片ID对应的Content-ID（与历史格式 image_{id} 保持一致）"""
+    return f"image_{image_id}"
+
+
+def _split_tag(tag: str) -> Tuple[str, str]:
+    close = "/>" if tag.endswith("/>") else ">"
+    return tag[4:len(tag) - len(close)], close
+
+
+def _attr_value(raw: Optional[str]) -> str:
+    if raw is None:
+        return ""
+    if raw[:1] in ("'", '"'):
+        raw = raw[1:-1]
+    return _html.unescape(raw)
+
+
+def _tag_id(tag: str) -> Optional[str]:
+    body, _ = _split_tag(tag)
+    for m in ATTR_PATTERN.finditer(body):
+        if m.group(1).lower() == "id":
+            return _attr_value(m.group(2)) or None
+    return None
+
+
+def extract_img_ids(html_content: str) -> List[str]:
+    """按出现顺序返回所有带 id 的 <img> 标签的 id（可能重复）"""
+    if not html_content:
+        return []
+    ids = []
+    for m in IMG_TAG_PATTERN.finditer(html_content):
+        img_id = _tag_id(m.group(0))
+        if img_id:
+            ids.append(img_id)
+    return ids
+
+
+def rewrite_img_ids(
+    html_content: str,
+    should_rewrite: Optional[Callable[[str], bool]] = None,
+    keep_id: bool = False,
+) -> Tuple[str, List[str]]:
+    """
+    将 <img id="x"> 改写为 <img src="cid:image_x">
+
+    Args:
+        html_content: HTML内容
+        should_rewrite: 可选过滤函数，返回False的图片ID保持原样
+        keep_id: 是否保留 id 属性（默认移除，与数据库发送路径一致）
+
+    Returns:
+        元组：(改写后的HTML, 去重后的已改写图片ID列表)
+    """
+    if not html_content:
+        return html_content, []
+    rewritten: List[str] = []
+
+    def _replace(m: "re.Match") -> str:
+        tag = m.group(0)
+        img_id = _tag_id(tag)
+        if not img_id or (should_rewrite is not None and not should_rewrite(img_id)):
+            return tag
+        if img_id not in rewritten:
+            rewritten.append(img_id)
+        body, close = _split_tag(tag)
+        kept = []
+        for attr in ATTR_PATTERN.finditer(body):
+            name = attr.group(1).lower()
+            if name == "src" or (name == "id" and not keep_id):
+                continue
+            kept.append(attr.group(0))
+        kept.append(f'src="cid:{_html.escape(cid_for(img_id), quote=True)}"')
+        return "<img " + " ".join(kept) + (" />" if close == "/>" else ">")
+
+    return IMG_TAG_PATTERN.sub(_replace, html_content), rewritten
@@ -0,0 +1,121 @@
+"""
+任务事件记录与保留模块
+按配置的粒度记录收件人级事件（full 全量 / sampled 抽样 / aggregated 按时间桶聚合），
+并提供按批次清理（可选归档）过期事件的保留任务
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.config import get_config
+from src.event_bus import get_event_bus
+from src.dao_mysql import insert_job_event, insert_job_events, prune_job_events
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("full", "sampled", "aggregated")
+# 聚合模式下每个时间桶最多保留的失败样例数
+MAX_FAILURE_SAMPLES = 20
+
+
+class JobEventRecorder:
+    """单个任务的事件记录器（非线程安全，由执行该任务的线程使用）"""
+
+    def __init__(
+        self,
+        job_id: str,
+        granularity: Optional[str] = None,
+        sample_every: Optional[int] = None,
+        bucket_sec: Optional[int] = None,
+    ):
+        cfg = get_config()
+        self.job_id = job_id
+        self.granularity = granularity or cfg["JOB_EVENTS_GRANULARITY"]
+        if self.granularity not in GRANULARITIES:
+            self.granularity = "full"
+        self.sample_every = max(1, sample_every or cfg["JOB_EVENTS_SAMPLE_EVERY"])
+        self.bucket_sec = max(1, bucket_sec or cfg["JOB_EVENTS_BUCKET_SEC"])
+        self._seen: Dict[str, int] = {}
+        self._bucket_start: Optional[datetime] = None
+        self._bucket_counts: Dict[str, int] = {}
+        self._bucket_failures: List[Dict[str, Any]] = []
+
+    def record(self, event_type: str, payload: Optional[Dict[str, Any]] = None, progress: Optional[Dict[str, Any]] = None) -> None:
+        """
+        记录事件；非 recipient_* 的生命周期事件总是立即写入
+
+        每个事件（不受粒度影响）都会附带进度发布到进程内事件总线，供SSE推送。
+        """
+        data = dict(payload or {})
+        if progress is not None:
+            data["progress"] = progress
+        get_event_bus().publish(self.job_id, event_type, data)
+
+        if not event_type.startswith("recipient_") or self.granularity == "full":
+            insert_job_event(self.job_id, event_type, payload)
+            return
+
+        if self.granularity == "sampled":
+            # 失败与重试总是保留，成功事件每N条保留一条
+            n = self._seen.get(event_type, 0)
+            self._seen[event_type] = n + 1
+            if event_type != "recipient_success" or n % self.sample_every == 0:
+                insert_job_event(self.job_id, event_type, dict(payload or {}, sample_every=self.sample_every))
+            return
+
+        now = datetime.utcnow()
+        if self._bucket_start and (now - self._bucket_start).total_seconds() >= self.bucket_sec:
+            self.flush()
+        if self._bucket_start is None:
+            self._bucket_start = now
+        self._bucket_counts[event_type] = self._bucket_counts.get(event_type, 0) + 1
+        if event_type != "recipient_success" and len(self._bucket_failures) < MAX_FAILURE_SAMPLES:
+            self._bucket_failures.append(dict(payload or {}, event_type=event_type))
+
+    def flush(self) -> None:
+        """写出当前聚合桶（任务结束前调用）"""
+        if self._bucket_start is None:
+            return
+        row = {
+            "bucket_start": self._bucket_start.isoformat() + "Z",
+            "bucket_end": datetime.utcnow().isoformat() + "Z",
+            "counts": self._bucket_counts,
+            "failure_samples": self._bucket_failures,
+        }
+        self._bucket_start = None
+        self._bucket_counts = {}
+        self._bucket_failures = []
+        insert_job_events(self.job_id, [("recipient_summary", row)])
+
+
+def prune_old_events(
+    retention_days: Optional[int] = None,
+    archive: Optional[bool] = None,
+    batch_size: int = 1000,
+    max_batches: int = 100,
+    pause_sec: float = 0.05,
+) -> int:
+    """
+    按批次删除（可选先归档）超过保留期的任务事件
+
+    每批只处理 batch_size 行并短暂停顿，避免长事务与锁等待。
+
+    Returns:
+        本次清理的行数
+    """
+    cfg = get_config()
+    days = cfg["JOB_EVENTS_RETENTION_DAYS"] if retention_days is None else retention_days
+    if not days or days <= 0:
+        return 0
+    do_archive = cfg["JOB_EVENTS_ARCHIVE"] if archive is None else archive
+    total = 0
+    for _ in range(max_batches):
+        n = prune_job_events(days, batch_size, archive=do_archive)
+        total += n
+        if n < batch_size:
+            break
+        time.sleep(pause_sec)
+    if total:
+        logger.info(f"任务事件保留清理完成: 删除{total}行, 归档={do_archive}, 保留{days}天")
+    return total
@@ -1,33 +1,86 @@
+import os
+import socket
 import threading
 import time
+import queue
+import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 import logging
 
-from src.dao_mysql import get_next_queued_job, claim_job
-from src.gmail_auth import GmailAuthManager
-from src.excel_processor import ExcelProcessor
+from src.config import get_config
+from src.dao_mysql import (
+    get_job,
+    get_job_status,
+    claim_job,
+    renew_job_lease,
+    release_job_lease,
+    requeue_expired_jobs,
+    insert_job_event,
+    list_due_queued_jobs,
+    count_running_jobs_by_tenant,
+    list_tenant_usage_today,
+)
 from src.email_scheduler import EmailScheduler
+from src.delivery_recovery import reconcile_sending_recipients
+from src.fair_scheduler import FairScheduler, tenant_limits, tenant_of
+from src.job_events import prune_old_events
+from src.services import get_excel_processor, get_gmail_auth_manager
+from src.excel_job_importer import sync_job_to_workbook
+
+# 每个租户取出的候选任务数（按优先级/计划时间排序的队首）
+CANDIDATES_PER_TENANT = 3
 
 
 class JobRunner:
-    def __init__(self, interval_sec: int = 2):
+    def __init__(self, interval_sec: int = 2, recovery_interval_sec: int = 60, max_workers: Optional[int] = None):
+        cfg = get_config()
         self.interval_sec = interval_sec
+        # 发送恢复扫描间隔（启动时立即执行一次）
+        self.recovery_interval_sec = recovery_interval_sec
+        self._last_recovery = 0.0
+        # 任务事件保留清理间隔（秒）
+        self.retention_interval_sec = 3600
+        self._last_retention = 0.0
         self._stop = threading.Event()
         self._thread: Optional[threading.Thread] = None
 
         # 添加logger用于记录JobRunner运行状态
         self.logger = logging.getLogger(__name__)
 
-        self.gmail_auth_manager = GmailAuthManager()
-        self.excel_processor = ExcelProcessor()
-        self.scheduler = EmailScheduler(self.gmail_auth_manager, self.excel_processor)
+        # 与同进程的API共享认证管理器与Excel处理器（见 src/services.py）
+        self.gmail_auth_manager = get_gmail_auth_manager()
+        self.excel_processor = get_excel_processor()
+
+        # 工作线程池：每个任务使用独立的EmailScheduler（调度器带有按任务的状态）
+        self.max_workers = max(1, max_workers or cfg["JOB_RUNNER_WORKERS"])
+        self.fair_scheduler = FairScheduler(quantum=cfg["FAIR_QUANTUM"])
+        # 守护线程池（与主循环一致，进程退出时不等待长时间运行的任务）
+        self._job_queue: "queue.Queue[str]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._active: Dict[str, Tuple[str, str]] = {}
+        self._schedulers: Dict[str, EmailScheduler] = {}
+        self._active_lock = threading.Lock()
+
+        # 任务租约：认领时写入 locked_by/lease_expires_at，心跳线程定期续约；
+        # 进程重启后租约过期的 running 任务由回收扫描退回队列，从剩余 pending 收件人继续
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_sec = cfg["JOB_LEASE_SEC"]
+        self.heartbeat_sec = cfg["JOB_HEARTBEAT_SEC"]
+        self._heartbeat_thread: Optional[threading.Thread] = None
 
     def start(self):
         if self._thread and self._thread.is_alive():
             self.logger.info("JobRunner已在运行，跳过启动")
             return
-        self.logger.info(f"启动JobRunner，轮询间隔: {self.interval_sec}秒")
+        self.logger.info(f"启动JobRunner，轮询间隔: {self.interval_sec}秒，工作线程: {self.max_workers}")
+        while len(self._workers) < self.max_workers:
+            t = threading.Thread(target=self._worker, name=f"job-worker-{len(self._workers)}", daemon=True)
+            t.start()
+            self._workers.append(t)
+        if not (self._heartbeat_thread and self._heartbeat_thread.is_alive()):
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
         self._thread = threading.Thread(target=self._loop, daemon=True)
         self._thread.start()
         self.logger.info("JobRunner后台线程已启动")
@@ -36,63 +89,221 @@ class JobRunner:
         self.logger.info("收到停止信号，JobRunner即将退出")
         self._stop.set()
 
+    def _recover_inflight(self):
+        """回收租约过期的任务，并对租约过期的sending收件人做对账（启动时及之后定期执行）"""
+        now = time.monotonic()
+        if self._last_recovery and now - self._last_recovery < self.recovery_interval_sec:
+            return
+        self._last_recovery = now
+        self._reap_expired_jobs()
+        try:
+            reconcile_sending_recipients(self.gmail_auth_manager)
+        except Exception as e:
+            self.logger.error(f"❌ 发送恢复扫描失败: {e}", exc_info=True)
+
+    def _reap_expired_jobs(self) -> int:
+        """把执行进程已失联（租约过期）的 running 任务退回队列"""
+        try:
+            requeued = requeue_expired_jobs()
+        except Exception as e:
+            self.logger.error(f"❌ 任务租约回收失败: {e}", exc_info=True)
+            return 0
+        for row in requeued:
+            self.logger.warning(f"♻️  任务 {row['id']} 租约已过期(原执行者: {row.get('locked_by')})，已退回队列等待续跑")
+            try:
+                insert_job_event(row["id"], "requeued", {"reason": "lease_expired", "locked_by": row.get("locked_by")})
+            except Exception:
+                pass
+        return len(requeued)
+
+    def _heartbeat_loop(self):
+        """定期为本进程执行中的任务续约；续约失败说明任务已被回收或终止，停止本地执行"""
+        while not self._stop.wait(self.heartbeat_sec):
+            self._renew_leases()
+
+    def _renew_leases(self):
+        with self._active_lock:
+            job_ids = list(self._active)
+        for job_id in job_ids:
+            try:
+                owned = renew_job_lease(job_id, self.worker_id, self.lease_sec)
+            except Exception as e:
+                # 数据库暂时不可用：下次心跳重试（租约时长应为心跳间隔的数倍）
+                self.logger.warning(f"任务 {job_id} 续约失败: {e}")
+                continue
+            if not owned:
+                with self._active_lock:
+                    scheduler = self._schedulers.get(job_id) if job_id in self._active else None
+                if scheduler is not None:
+                    self.logger.warning(f"⚠️  任务 {job_id} 已不再由本进程持有（已回收或已结束），停止本地执行")
+                    scheduler.stop()
+
+    def _prune_events(self):
+        """按配置的保留期分批清理过期任务事件（每小时一次）"""
+        now = time.monotonic()
+        if self._last_retention and now - self._last_retention < self.retention_interval_sec:
+            return
+        self._last_retention = now
+        try:
+            prune_old_events()
+        except Exception as e:
+            self.logger.error(f"❌ 任务事件清理失败: {e}", exc_info=True)
+
+    def _active_count(self) -> int:
+        with self._active_lock:
+            return len(self._active)
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """
+        按租户公平选出下一个任务
+
+        并发上限按数据库中 running 的任务数计算（覆盖多个进程的JobRunner），
+        多进程同时认领时可能短暂超出上限一个任务。
+        """
+        candidates = list_due_queued_jobs(CANDIDATES_PER_TENANT)
+        if not candidates:
+            return None
+        running = count_running_jobs_by_tenant()
+        usage: Optional[Dict[Tuple[str, str], int]] = None
+        blocked = set()
+        weights = {}
+        for tenant in {tenant_of(job) for job in candidates}:
+            limits = tenant_limits(*tenant)
+            weights[tenant] = limits["weight"]
+            if running.get(tenant, 0) >= limits["max_concurrent"]:
+                blocked.add(tenant)
+            elif limits["daily_quota"] > 0:
+                if usage is None:
+                    usage = list_tenant_usage_today()
+                if usage.get(tenant, 0) >= limits["daily_quota"]:
+                    blocked.add(tenant)
+        return self.fair_scheduler.pick(candidates, blocked, weights)
+
     def _loop(self):
         self.logger.info("JobRunner主循环已启动，开始轮询任务...")
         loop_count = 0
 
         while not self._stop.is_set():
+            self._recover_inflight()
+            self._prune_events()
             try:
-                job = get_next_queued_job()
+                if self._active_count() >= self.max_workers:
+                    time.sleep(self.interval_sec)
+                    continue
+                job = self._next_job()
                 if not job:
                     # 每10次轮询记录一次心跳日志
                     loop_count += 1
                     if loop_count % 10 == 0:
-                        self.logger.debug(f"JobRunner心跳 - 已轮询{loop_count}次，暂无待处理任务")
+                        self.logger.debug(f"JobRunner心跳 - 已轮询{loop_count}次，暂无可调度任务，运行中{self._active_count()}个")
                     time.sleep(self.interval_sec)
                     continue
 
                 job_id = job["id"]
-                self.logger.info(f"🔍 发现待处理任务: job_id={job_id}, type={job['type']}, sender={job.get('sender_email')}")
+                self.logger.info(
+                    f"🔍 发现待处理任务: job_id={job_id}, type={job['type']}, sender={job.get('sender_email')}, "
+                    f"tenant={job['master_user_id']}/{job['store_id']}, priority={job.get('priority')}"
+                )
 
-                if not claim_job(job_id):
+                if not claim_job(job_id, self.worker_id, self.lease_sec):
                     # Claimed by other runner
                     self.logger.warning(f"⚠️  任务 {job_id} 已被其他JobRunner认领，跳过")
                     continue
 
-                self.logger.info(f"✅ 成功认领任务 {job_id}，开始执行邮件发送...")
-
-                # dispatch job
-                if job["type"] == "template":
-                    self.scheduler.send_job_emails_from_db(
-                        sender_email=job["sender_email"],
-                        master_user_id=job["master_user_id"],
-                        store_id=job["store_id"],
-                        job_id=job_id,
-                        job_type="template",
-                        template_id=job.get("template_id"),
-                        attachments=None,
-                        min_interval=job.get("min_interval"),
-                        max_interval=job.get("max_interval"),
-                    )
-                else:
-                    self.scheduler.send_job_emails_from_db(
-                        sender_email=job["sender_email"],
-                        master_user_id=job["master_user_id"],
-                        store_id=job["store_id"],
-                        job_id=job_id,
-                        job_type="custom",
-                        subject=job.get("subject"),
-                        content=job.get("content"),
-                        html_content=job.get("html_content"),
-                        attachments=None,
-                        min_interval=job.get("min_interval"),
-                        max_interval=job.get("max_interval"),
-                    )
-
-                self.logger.info(f"🎉 任务 {job_id} 执行完成")
+                self.logger.info(f"✅ 成功认领任务 {job_id}，交给工作线程执行...")
+                with self._active_lock:
+                    self._active[job_id] = tenant_of(job)
+                self._job_queue.put(job_id)
 
             except Exception as e:
                 # 记录详细异常信息而不是静默吞掉
                 self.logger.error(f"❌ JobRunner循环发生异常: {e}", exc_info=True)
                 time.sleep(self.interval_sec)
 
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self._job_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._run_job(job_id)
+
+    def _sync_source_file(self, job_id: str):
+        """由表格导入的任务完成后，把收件人状态写回来源表格"""
+        try:
+            if get_job_status(job_id) != "completed":
+                return
+            result = sync_job_to_workbook(job_id, self.excel_processor)
+            if not result.get("success"):
+                self.logger.warning(f"⚠️  任务 {job_id} 状态写回表格失败: {result.get('error')}")
+        except Exception as e:
+            self.logger.error(f"❌ 任务 {job_id} 状态写回表格异常: {e}", exc_info=True)
+
+    def _run_job(self, job_id: str):
+        """在工作线程中执行单个任务"""
+        try:
+            job = get_job(job_id)
+            if not job:
+                self.logger.warning(f"⚠️  任务 {job_id} 已不存在，跳过")
+                return
+            scheduler = EmailScheduler(self.gmail_auth_manager, self.excel_processor)
+            with self._active_lock:
+                self._schedulers[job_id] = scheduler
+
+            # dispatch job
+            if job["type"] == "template":
+                scheduler.send_job_emails_from_db(
+                    sender_email=job["sender_email"],
+                    master_user_id=job["master_user_id"],
+                    store_id=job["store_id"],
+                    job_id=job_id,
+                    job_type="template",
+                    template_id=job.get("template_id"),
+                    attachments=None,
+                    min_interval=job.get("min_interval"),
+                    max_interval=job.get("max_interval"),
+                )
+            else:
+                scheduler.send_job_emails_from_db(
+                    sender_email=job["sender_email"],
+                    master_user_id=job["master_user_id"],
+                    store_id=job["store_id"],
+                    job_id=job_id,
+                    job_type="custom",
+                    subject=job.get("subject"),
+                    content=job.get("content"),
+                    html_content=job.get("html_content"),
+                    attachments=None,
+                    min_interval=job.get("min_interval"),
+                    max_interval=job.get("max_interval"),
+                )
+
+            self.logger.info(f"🎉 任务 {job_id} 执行完成")
+            if job.get("source_file"):
+                self._sync_source_file(job_id)
+        except Exception as e:
+            self.logger.error(f"❌ 任务 {job_id} 执行异常: {e}", exc_info=True)
+        finally:
+            with self._active_lock:
+                self._active.pop(job_id, None)
+                self._schedulers.pop(job_id, None)
+            try:
+                release_job_lease(job_id, self.worker_id)
+            except Exception:
+                pass
+
+
+def main():
+    """独立运行JobRunner（API进程设置 JOB_RUNNER_ENABLED=false 时使用）"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    runner = JobRunner()
+    runner.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        runner.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+收件人表格列式导入模块
+大表只读取需要的列（邮箱、过滤条件列、模板实际引用的占位符列），并转换为紧凑类型；
+支持 Excel（openpyxl 只读流式）、CSV（分块）与 Parquet（按列读取，需要可选依赖 pyarrow，未安装时报 ValueError）输入
+"""
+import logging
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 过滤与状态所需的列（与 ExcelProcessor.required_columns 一致）
+BASE_COLUMNS = ["邮箱", "合作次数", "回复次数", "跟进次数", "跟进方式", "是否已邮箱建联", "语言"]
+# 数值列：float32 足够表示计数/状态且保留 NaN 语义（与默认读取的比较行为一致）
+NUMERIC_COLUMNS = ["合作次数", "回复次数", "跟进次数", "是否已邮箱建联"]
+# 低基数字符串列
+CATEGORY_COLUMNS = ["跟进方式", "语言"]
+DEFAULT_CHUNKSIZE = 10000
+
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+
+
+def _parquet_module():
+    """pyarrow.parquet；pyarrow 是可选依赖，未安装时给出明确的错误而不是 ModuleNotFoundError"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("reading .parquet files requires pyarrow (pip install pyarrow)") from e
+    return pq
+
+
+def template_columns(template_manager, languages: Optional[Iterable[str]] = None) -> Set[str]:
+    """
+    模板实际引用的占位符（主题与HTML内容模板，缺省检查所有已知语言）
+
+    Args:
+        template_manager: TemplateManager
+        languages: 语言名称列表
+    """
+    params: Set[str] = set()
+    for language in languages or template_manager.language_map.keys():
+        for template_params in template_manager.template_parameters(language).values():
+            if template_params:
+                params |= template_params
+    return params
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """将已知列转换为紧凑类型（原地修改并返回）"""
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            cat = df[col].astype("category")
+            # 保证 fillna("English") 等默认语言填充可用
+            if col == "语言" and "English" not in cat.cat.categories:
+                cat = cat.cat.add_categories(["English"])
+            df[col] = cat
+    return df
+
+
+def _iter_excel(path: str, columns: Optional[Set[str]], chunksize: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        picked = [(i, h) for i, h in enumerate(header) if h is not None and (columns is None or h in columns)]
+        names = [str(h) for _, h in picked]
+        batch: List[list] = []
+        for row in rows:
+            if row is None or all(v is None for v in row):
+                continue
+            batch.append([row[i] if i < len(row) else None for i, _ in picked])
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=names)
+                batch = []
+        if batch or not names:
+            yield pd.DataFrame(batch, columns=names)
+    finally:
+        wb.close()
+
+
+def read_header(file_path: str) -> List[str]:
+    """只读取表格的列名（不解析数据行）"""
+    suffix = Path(file_path).suffix.lower()
+    if suffix == ".csv":
+        return [str(c) for c in pd.read_csv(file_path, nrows=0).columns]
+    if suffix == ".parquet":
+        return list(_parquet_module().read_schema(file_path).names)
+    if suffix in EXCEL_SUFFIXES:
+        from openpyxl import load_workbook
+
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            header = next(wb.active.iter_rows(values_only=True), None) or ()
+        finally:
+            wb.close()
+        return [str(h) for h in header if h is not None]
+    return [str(c) for c in pd.read_excel(file_path, nrows=0).columns]
+
+
+def iter_recipient_chunks(
+    file_path: str,
+    columns: Optional[Iterable[str]] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    按块读取收件人表格
+
+    Args:
+        file_path: .xlsx/.xlsm/.csv/.parquet 文件路径
+        columns: 需要的列（不存在的列被忽略），None 表示全部列
+        chunksize: 每块行数（Parquet 整体读取后再切块）
+
+    Yields:
+        已转换为紧凑类型的DataFrame块
+    """
+    wanted = set(columns) if columns is not None else None
+    suffix = Path(file_path).suffix.lower()
+    chunksize = max(1, int(chunksize))
+
+    if suffix == ".csv":
+        usecols = (lambda c: c in wanted) if wanted is not None else None
+        # 字符串列统一读为字符串，数值列由 compact_dtypes 转换
+        chunks = pd.read_csv(file_path, usecols=usecols, dtype={"邮箱": str}, chunksize=chunksize)
+    elif suffix == ".parquet":
+        pq = _parquet_module()
+        schema_names = pq.read_schema(file_path).names
+        selected = [c for c in schema_names if wanted is None or c in wanted]
+        pf = pq.ParquetFile(file_path)
+        chunks = (batch.to_pandas() for batch in pf.iter_batches(batch_size=chunksize, columns=selected))
+    elif suffix in EXCEL_SUFFIXES:
+        chunks = _iter_excel(file_path, wanted, chunksize)
+    else:
+        # .xls 等旧格式没有流式读取，退回 pandas 默认读取
+        df = pd.read_excel(file_path, usecols=(lambda c: c in wanted) if wanted is not None else None)
+        chunks = (df.iloc[i:i + chunksize] for i in range(0, max(len(df), 1), chunksize))
+
+    for chunk in chunks:
+        yield compact_dtypes(chunk)
+
+
+def read_recipients(
+    file_path: str,
+    columns: Optional[Iterable[str]] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> pd.DataFrame:
+    """读取收件人表格的指定列，返回合并后的DataFrame"""
+    chunks = list(iter_recipient_chunks(file_path, columns, chunksize))
+    if not chunks:
+        return pd.DataFrame(columns=list(columns or []))
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0].reset_index(drop=True)
+    # 分块拼接后分类列可能退化为 object，统一再压缩一次
+    df = compact_dtypes(df)
+    logger.info(f"列式导入收件人表格: {file_path}, 共 {len(df)} 行, 列: {list(df.columns)}")
+    return df
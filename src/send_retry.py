@@ -0,0 +1,148 @@
+"""
+发送重试模块
+区分临时性/永久性发送失败，临时失败按指数退避（带抖动）重新入队
+"""
+import heapq
+import itertools
+import json
+import random
+import socket
+import ssl
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 视为临时故障的HTTP状态码与Gmail错误原因
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+TRANSIENT_REASONS = {
+    "rateLimitExceeded",
+    "userRateLimitExceeded",
+    "backendError",
+    "internalError",
+    "concurrentLimitExceeded",
+}
+# 发件账号当日发送配额用尽：退避重试无意义，需推迟到配额重置
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+
+def _http_error_details(exc: Exception) -> Tuple[Optional[int], List[str]]:
+    """从 googleapiclient HttpError 中取出状态码与错误原因列表"""
+    status = None
+    try:
+        status = int(exc.resp.status)
+    except Exception:
+        pass
+    reasons: List[str] = []
+    details = getattr(exc, "error_details", None)
+    if isinstance(details, list):
+        reasons.extend(d.get("reason") for d in details if isinstance(d, dict) and d.get("reason"))
+    if not reasons:
+        try:
+            body = json.loads(exc.content.decode("utf-8"))
+            for err in (body.get("error") or {}).get("errors") or []:
+                if err.get("reason"):
+                    reasons.append(err["reason"])
+        except Exception:
+            pass
+    return status, reasons
+
+
+def is_quota_exhausted(exc: Exception) -> bool:
+    """发送异常是否表示发件账号当日配额已用尽（Gmail 403/429 quotaExceeded 等）"""
+    status, reasons = _http_error_details(exc)
+    return status in (403, 429) and any(r in QUOTA_REASONS for r in reasons)
+
+
+def classify_send_error(exc: Exception) -> Tuple[bool, str]:
+    """
+    判断发送异常是否为临时故障
+
+    Returns:
+        元组：(是否可重试, 分类说明)
+    """
+    try:
+        from googleapiclient.errors import HttpError
+    except ImportError:  # pragma: no cover - google client always installed in deployments
+        HttpError = ()
+    try:
+        from google.auth.exceptions import RefreshError, TransportError
+    except ImportError:  # pragma: no cover
+        RefreshError = TransportError = ()
+
+    if HttpError and isinstance(exc, HttpError):
+        status, reasons = _http_error_details(exc)
+        if is_quota_exhausted(exc):
+            return False, f"http {status} quota exhausted"
+        if status in TRANSIENT_STATUS:
+            return True, f"http {status}"
+        if status == 403 and any(r in TRANSIENT_REASONS for r in reasons):
+            return True, f"http 403 {','.join(reasons)}"
+        return False, f"http {status} {','.join(reasons)}".strip()
+    if RefreshError and isinstance(exc, RefreshError):
+        # invalid_grant 等表示授权已失效，重试无意义
+        text = str(exc)
+        if "invalid_grant" in text or "unauthorized_client" in text:
+            return False, "token revoked"
+        return True, "token refresh"
+    if TransportError and isinstance(exc, TransportError):
+        return True, "transport"
+    if isinstance(exc, (socket.timeout, socket.gaierror, TimeoutError, ConnectionError, ssl.SSLError)):
+        return True, type(exc).__name__
+    try:
+        import httplib2
+
+        if isinstance(exc, httplib2.HttpLib2Error):
+            return True, type(exc).__name__
+    except ImportError:  # pragma: no cover
+        pass
+    return False, type(exc).__name__
+
+
+class RetryPolicy:
+    """指数退避重试策略"""
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 30.0, max_delay: float = 900.0, jitter: float = 0.5):
+        """
+        Args:
+            max_attempts: 最大尝试次数（含首次发送）
+            base_delay: 第一次重试的基础等待秒数
+            max_delay: 单次等待上限
+            jitter: 抖动比例，实际等待在 [delay*(1-jitter), delay] 之间
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def should_retry(self, attempts: int) -> bool:
+        return attempts < self.max_attempts
+
+    def delay_for(self, attempts: int) -> float:
+        """第 attempts 次尝试失败后的等待秒数"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(1.0 - self.jitter, 1.0)
+
+
+class RetryQueue:
+    """按到期时间排序的内存重试队列"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Dict[str, Any], delay: float) -> None:
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), item))
+
+    def pop_due(self) -> Optional[Dict[str, Any]]:
+        """取出一个已到期的条目，没有则返回None"""
+        if self._heap and self._heap[0][0] <= time.monotonic():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def seconds_until_due(self) -> Optional[float]:
+        """距最早条目到期的秒数，队列为空时返回None"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
@@ -0,0 +1,140 @@
+"""
+发件人发送账本
+同一 sender_email 的所有任务共享一条发送时隙队列与当日发送计数：
+发送前预约时隙（间隔由预约方的随机间隔决定），达到每日上限时拒绝预约；
+预约在发送结束前计入上限（成功由 record_send、未发送由 release 结算），并发任务不会超出上限；
+状态以 sender_daily_usage 表为准（跨进程共享），数据库不可用时退回进程内存
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from src.config import get_config
+from src.dao_mysql import release_sender_slot, reserve_sender_slot, record_sender_send
+
+logger = logging.getLogger(__name__)
+
+
+def sender_daily_cap(sender_email: str) -> int:
+    """发件人每日发送上限（0表示不限），SENDER_DAILY_CAPS 中的按邮箱配置优先"""
+    cfg = get_config()
+    raw = cfg["SENDER_DAILY_CAPS"]
+    if raw:
+        try:
+            caps = {k.lower(): int(v) for k, v in json.loads(raw).items()}
+            if sender_email.lower() in caps:
+                return caps[sender_email.lower()]
+        except Exception as e:
+            logger.warning(f"SENDER_DAILY_CAPS 配置无法解析，使用默认值: {e}")
+    return cfg["SENDER_DAILY_CAP"]
+
+
+class SenderLedger:
+    """按发件人共享的发送节奏与每日配额（线程安全）"""
+
+    def __init__(self, persist: bool = True):
+        """
+        Args:
+            persist: 是否以数据库为准（False 时仅使用进程内存，用于测试/无数据库环境）
+        """
+        self.persist = persist
+        self._lock = threading.Lock()
+        # sender -> 下一个可用时隙（epoch秒）
+        self._next_slot: Dict[str, float] = {}
+        # sender -> (UTC日期, 当日已发送数)
+        self._sent: Dict[str, Tuple[str, int]] = {}
+        # sender -> (UTC日期, 已预约但尚未结算的发送数)，仅进程内存模式使用
+        self._reserved: Dict[str, Tuple[str, int]] = {}
+
+    def acquire(self, sender_email: str, gap_sec: float) -> Tuple[bool, float]:
+        """
+        预约一次发送时隙
+
+        Args:
+            sender_email: 发件人
+            gap_sec: 本次发送后到该发件人下一次发送的最小间隔
+
+        Returns:
+            元组：(是否允许发送, 需要等待的秒数)；不允许表示当日配额已用尽
+        """
+        cap = sender_daily_cap(sender_email)
+        if self.persist:
+            try:
+                res = reserve_sender_slot(sender_email, gap_sec, cap)
+                self._remember_count(sender_email, res["sent_count"])
+                return res["allowed"], res["wait_sec"]
+            except Exception as e:
+                logger.warning(f"发件人账本数据库不可用，使用进程内计数: {sender_email}, {e}")
+        with self._lock:
+            reserved = self._count_today(sender_email, self._reserved)
+            if cap > 0 and self._count_today(sender_email) + reserved >= cap:
+                return False, 0.0
+            now = time.time()
+            slot = max(now, self._next_slot.get(sender_email, 0.0))
+            self._next_slot[sender_email] = slot + gap_sec
+            self._reserved[sender_email] = (self._today(), reserved + 1)
+            return True, slot - now
+
+    def record_send(self, sender_email: str) -> int:
+        """记录一次成功发送，返回该发件人当日已发送数"""
+        if self.persist:
+            try:
+                count = record_sender_send(sender_email)
+                self._remember_count(sender_email, count)
+                return count
+            except Exception as e:
+                logger.warning(f"发件人发送计数写入失败，仅记录在进程内: {sender_email}, {e}")
+        with self._lock:
+            self._settle(sender_email)
+            count = self._count_today(sender_email) + 1
+            self._sent[sender_email] = (self._today(), count)
+            return count
+
+    def release(self, sender_email: str) -> None:
+        """预约的时隙没有用于发送（失败、跳过或推迟），把它占用的当日配额还回去"""
+        if self.persist:
+            try:
+                release_sender_slot(sender_email)
+                return
+            except Exception as e:
+                logger.warning(f"发件人预约释放失败，仅记录在进程内: {sender_email}, {e}")
+        with self._lock:
+            self._settle(sender_email)
+
+    def sent_today(self, sender_email: str) -> int:
+        with self._lock:
+            return self._count_today(sender_email)
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.utcnow().strftime("%Y-%m-%d")
+
+    def _count_today(self, sender_email: str, counts: Optional[Dict[str, Tuple[str, int]]] = None) -> int:
+        day, count = (self._sent if counts is None else counts).get(sender_email, ("", 0))
+        return count if day == self._today() else 0
+
+    def _settle(self, sender_email: str) -> None:
+        """结算一个进程内预约（调用方持有锁）"""
+        reserved = self._count_today(sender_email, self._reserved)
+        self._reserved[sender_email] = (self._today(), max(0, reserved - 1))
+
+    def _remember_count(self, sender_email: str, count: int) -> None:
+        with self._lock:
+            self._sent[sender_email] = (self._today(), int(count))
+
+
+_ledger: Optional[SenderLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_sender_ledger() -> SenderLedger:
+    """进程级共享的发件人账本"""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = SenderLedger()
+    return _ledger
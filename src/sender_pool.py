@@ -0,0 +1,134 @@
+"""
+发件人池模块
+单个任务在租户已授权的多个发件人之间轮换发送：
+按平滑加权轮询（权重 = 剩余当日配额比例 × 健康度）选择发件人，
+每个发件人的发送节奏与每日上限仍由发件人账本单独控制
+"""
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from src.sender_ledger import SenderLedger, sender_daily_cap
+
+logger = logging.getLogger(__name__)
+
+# 健康度的指数滑动平均系数
+HEALTH_ALPHA = 0.2
+# 健康度下限，避免发件人完全失去被选中的机会
+MIN_HEALTH = 0.05
+# 连续临时失败后的冷却时间（秒）：BASE × 2^(n-1)，不超过 MAX
+COOLDOWN_BASE_SEC = 60
+COOLDOWN_MAX_SEC = 1800
+
+
+def parse_sender_pool(raw: Any) -> List[str]:
+    """解析 jobs.sender_pool（JSON数组字符串或列表），去重并保持顺序"""
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except Exception:
+            return []
+    out: List[str] = []
+    for email in raw if isinstance(raw, list) else []:
+        email = str(email).strip()
+        if email and email.lower() not in (e.lower() for e in out):
+            out.append(email)
+    return out
+
+
+class SenderPool:
+    """单个任务使用的发件人池（非线程安全，由执行该任务的线程使用）"""
+
+    def __init__(self, senders: Dict[str, Any], ledger: SenderLedger):
+        """
+        Args:
+            senders: 发件人邮箱 -> EmailSender（按优先顺序）
+            ledger: 共享的发件人账本
+        """
+        self.ledger = ledger
+        self._senders = dict(senders)
+        self._state: Dict[str, Dict[str, Any]] = {
+            email: {"health": 1.0, "current": 0.0, "fail_streak": 0, "cooldown_until": 0.0, "capped": False}
+            for email in self._senders
+        }
+
+    @classmethod
+    def build(cls, gmail_auth_manager, master_user_id: str, store_id: str, emails: List[str], ledger: SenderLedger, sender_factory):
+        """
+        为每个发件人初始化Gmail服务，无法初始化的发件人被跳过
+
+        Returns:
+            元组：(SenderPool 或 None, {发件人: 错误信息})
+        """
+        senders: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for email in emails:
+            try:
+                service = gmail_auth_manager.get_gmail_service(email, master_user_id, store_id)
+            except Exception as e:
+                service, errors[email] = None, str(e)
+            if service:
+                senders[email] = sender_factory(service, email)
+            else:
+                errors.setdefault(email, "Gmail service init failed")
+        if errors:
+            logger.warning(f"发件人池中部分发件人不可用: {errors}")
+        return (cls(senders, ledger) if senders else None), errors
+
+    def __len__(self) -> int:
+        return len(self._senders)
+
+    def __contains__(self, email: str) -> bool:
+        return email in self._senders
+
+    def sender(self, email: str):
+        return self._senders[email]
+
+    def weight(self, email: str) -> float:
+        """选择权重：剩余当日配额比例 × 健康度（冷却中的发件人降为最低）"""
+        st = self._state[email]
+        cap = sender_daily_cap(email)
+        quota = 1.0 if cap <= 0 else max(0.0, (cap - self.ledger.sent_today(email)) / cap)
+        health = st["health"] if st["cooldown_until"] <= time.monotonic() else MIN_HEALTH
+        return quota * max(MIN_HEALTH, health)
+
+    def choose(self) -> Optional[str]:
+        """平滑加权轮询选出下一个发件人；全部当日配额用尽时返回None"""
+        weights = {e: self.weight(e) for e, st in self._state.items() if not st["capped"]}
+        weights = {e: w for e, w in weights.items() if w > 0}
+        if not weights:
+            return None
+        total = sum(weights.values())
+        for email, w in weights.items():
+            self._state[email]["current"] += w
+        chosen = max(weights, key=lambda e: self._state[e]["current"])
+        self._state[chosen]["current"] -= total
+        return chosen
+
+    def mark_capped(self, email: str) -> None:
+        """发件人当日配额已用尽（由账本拒绝预约时调用）"""
+        self._state[email]["capped"] = True
+
+    def is_capped(self, email: str) -> bool:
+        return self._state[email]["capped"]
+
+    def report(self, email: str, ok: bool, transient: bool = False) -> None:
+        """记录一次发送结果，更新健康度；连续临时失败进入指数冷却"""
+        st = self._state[email]
+        st["health"] = (1 - HEALTH_ALPHA) * st["health"] + HEALTH_ALPHA * (1.0 if ok else 0.0)
+        if ok or not transient:
+            st["fail_streak"] = 0
+            return
+        st["fail_streak"] += 1
+        cooldown = min(COOLDOWN_MAX_SEC, COOLDOWN_BASE_SEC * (2 ** (st["fail_streak"] - 1)))
+        st["cooldown_until"] = time.monotonic() + cooldown
+        logger.info(f"发件人 {email} 连续临时失败 {st['fail_streak']} 次，冷却 {cooldown} 秒")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {"sender": e, "weight": round(self.weight(e), 3), "health": round(st["health"], 3), "capped": st["capped"]}
+            for e, st in self._state.items()
+        ]
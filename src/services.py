@@ -0,0 +1,54 @@
+"""
+应用级服务容器
+模板/附件管理器、Excel处理器与Gmail认证管理器在进程内按参数各创建一次，
+在请求、任务与发送器之间共享（目录只创建一次，模板文本/附件编码等缓存保持温热）
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+_instances: Dict[Tuple[str, str], Any] = {}
+# 可重入：创建Excel处理器时会再获取共享的模板管理器
+_lock = threading.RLock()
+
+
+def _shared(kind: str, key: str, factory: Callable[[], Any]) -> Any:
+    """按 (类型, 参数) 返回共享实例，首次调用时创建（创建失败不缓存，下次重试）"""
+    instance = _instances.get((kind, key))
+    if instance is None:
+        with _lock:
+            instance = _instances.get((kind, key))
+            if instance is None:
+                instance = factory()
+                _instances[(kind, key)] = instance
+    return instance
+
+
+def get_attachment_manager(files_dir: str = "files"):
+    """共享的附件管理器（附件读取/编码缓存跨任务复用）"""
+    from src.attachment_manager import AttachmentManager
+    return _shared("attachment_manager", os.path.abspath(files_dir), lambda: AttachmentManager(files_dir))
+
+
+def get_template_manager(template_dir: str = "template"):
+    """共享的模板管理器（HTML -> 纯文本模板缓存跨发送器复用）"""
+    from src.template_manager import TemplateManager
+    return _shared("template_manager", os.path.abspath(template_dir), lambda: TemplateManager(template_dir))
+
+
+def get_excel_processor(template_dir: str = "template"):
+    """共享的Excel处理器（同一工作簿的状态日志只有一份）"""
+    from src.excel_processor import ExcelProcessor
+    return _shared("excel_processor", os.path.abspath(template_dir), lambda: ExcelProcessor(template_dir))
+
+
+def get_gmail_auth_manager(credentials_file: str = "credentials.json"):
+    """共享的Gmail认证管理器（凭据文件不存在时抛出 FileNotFoundError，不缓存）"""
+    from src.gmail_auth import GmailAuthManager
+    return _shared("gmail_auth_manager", os.path.abspath(credentials_file), lambda: GmailAuthManager(credentials_file))
+
+
+def reset_services() -> None:
+    """丢弃全部共享实例（测试或切换工作目录后使用）"""
+    with _lock:
+        _instances.clear()
@@ -0,0 +1,132 @@
+"""
+Excel发送状态日志模块
+传统Excel发送路径每发一封邮件只向工作簿旁的追加式日志（<工作簿>.status.jsonl）写一行，
+按条数/时间间隔及任务结束时批量合并回工作簿（经工作簿会话一次原子写回）；
+权威状态 = 工作簿 + 尚未合并的日志（后写覆盖先写）
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from src.config import get_config
+from src.workbook_session import STATUS_COLUMN, open_workbook
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".status.jsonl"
+
+
+def journal_path_for(workbook_path: str) -> str:
+    return str(workbook_path) + JOURNAL_SUFFIX
+
+
+def read_journal(journal_path: str) -> Dict[str, int]:
+    """
+    读取日志中的状态（同一邮箱以最后一行为准）
+
+    崩溃时可能留下不完整的最后一行，解析失败的行被忽略。
+    """
+    statuses: Dict[str, int] = {}
+    if not os.path.exists(journal_path):
+        return statuses
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                statuses[str(entry["email"])] = int(entry["status"])
+            except Exception:
+                continue
+    return statuses
+
+
+def apply_statuses(df: pd.DataFrame, statuses: Dict[str, int]) -> int:
+    """将状态覆盖到DataFrame（原地修改），返回命中的邮箱数"""
+    if not statuses or df.empty or "邮箱" not in df.columns:
+        return 0
+    mapped = df["邮箱"].map(statuses)
+    hit = mapped.notna()
+    if hit.any():
+        if STATUS_COLUMN not in df.columns:
+            df[STATUS_COLUMN] = pd.NA
+        df.loc[hit, STATUS_COLUMN] = mapped[hit]
+    return int(df.loc[hit, "邮箱"].nunique())
+
+
+class StatusJournal:
+    """单个工作簿的状态日志（线程安全）"""
+
+    def __init__(
+        self,
+        workbook_path: str,
+        compact_every: Optional[int] = None,
+        compact_interval_sec: Optional[float] = None,
+    ):
+        """
+        Args:
+            workbook_path: Excel工作簿路径
+            compact_every: 累计多少条未合并记录后合并（缺省取 EXCEL_JOURNAL_COMPACT_EVERY）
+            compact_interval_sec: 距上次合并超过多少秒后合并（缺省取 EXCEL_JOURNAL_COMPACT_SEC）
+        """
+        cfg = get_config()
+        self.workbook_path = str(workbook_path)
+        self.journal_path = journal_path_for(self.workbook_path)
+        self.compact_every = max(1, compact_every or cfg["EXCEL_JOURNAL_COMPACT_EVERY"])
+        self.compact_interval_sec = cfg["EXCEL_JOURNAL_COMPACT_SEC"] if compact_interval_sec is None else compact_interval_sec
+        self._lock = threading.Lock()
+        self._since_compact = 0
+        self._last_compact = time.monotonic()
+
+    def append(self, email: str, status: int) -> None:
+        """追加一条状态变更（立即落盘到日志文件）"""
+        line = json.dumps({"email": email, "status": int(status), "ts": time.time()}, ensure_ascii=False)
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+            self._since_compact += 1
+
+    def pending(self) -> Dict[str, int]:
+        """尚未合并回工作簿的状态"""
+        with self._lock:
+            return read_journal(self.journal_path)
+
+    def maybe_compact(self) -> bool:
+        """达到条数或时间阈值时合并，返回是否执行了合并"""
+        with self._lock:
+            due = self._since_compact >= self.compact_every or (
+                self._since_compact > 0 and time.monotonic() - self._last_compact >= self.compact_interval_sec
+            )
+        return self.compact() if due else False
+
+    def compact(self) -> bool:
+        """
+        将日志合并回工作簿并清空日志
+
+        先原子替换工作簿再截断日志：两步之间崩溃时日志会被重放，覆盖结果相同。
+
+        Returns:
+            是否成功（没有待合并记录时也返回True）
+        """
+        with self._lock:
+            statuses = read_journal(self.journal_path)
+            if statuses:
+                try:
+                    session = open_workbook(self.workbook_path)
+                    hit = session.set_statuses(statuses)
+                    session.save()
+                except Exception as e:
+                    logger.error(f"合并状态日志失败，日志保留待下次合并: {self.journal_path}, {e}")
+                    return False
+                if hit < len(statuses):
+                    logger.warning(f"状态日志中有 {len(statuses) - hit} 个邮箱在工作簿中未找到，已丢弃")
+                logger.info(f"状态日志已合并到工作簿: {self.workbook_path}, {len(statuses)} 条")
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._since_compact = 0
+            self._last_compact = time.monotonic()
+            return True
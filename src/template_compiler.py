@@ -0,0 +1,150 @@
+"""
+模板预编译模块
+在模板保存时一次性完成图片ID提取、纯文本版本生成、占位符提取等预处理，发送/校验阶段直接使用编译结果
+（图片ID到CID的改写在发送时进行，只改写能解析到租户图片素材的ID）
+"""
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.html_images import extract_img_ids
+
+# 编译格式版本；格式变化时递增，旧的编译结果会被视为过期并重新编译
+COMPILER_VERSION = 4
+
+# 模板占位符格式：[参数名]
+PLACEHOLDER_PATTERN = re.compile(r"\[([^\]]+)\]")
+
+
+def extract_params(template: Optional[str]) -> List[str]:
+    """提取模板中的占位符参数名（去重、排序）"""
+    return sorted(set(PLACEHOLDER_PATTERN.findall(template or "")))
+
+
+def validate_params(params: Iterable[str], data_columns: Iterable[str]) -> Dict[str, Any]:
+    """
+    校验模板参数是否都在数据列中（集合差）
+
+    Returns:
+        {"valid", "missing_parameters", "template_parameters"}
+    """
+    params = set(params)
+    missing = sorted(params - set(data_columns))
+    return {"valid": not missing, "missing_parameters": missing, "template_parameters": sorted(params)}
+
+
+def validate_recipient_params(
+    recipients: Iterable[Dict[str, Any]],
+    params_for: Callable[[str], Optional[Iterable[str]]],
+) -> Dict[str, Any]:
+    """
+    校验任务收件人的 variables 是否覆盖其语言模板引用的全部参数
+
+    语言选择与 send_job_emails_from_db 一致（language -> variables["语言"] -> English），
+    每种语言只调用一次 params_for，之后每个收件人只做一次集合差。
+
+    Args:
+        recipients: [{"to_email", "language", "variables"}]
+        params_for: language -> 模板参数（模板不存在时返回None）
+
+    Returns:
+        {"valid", "recipients", "recipients_with_missing",
+         "missing_parameters": {参数: 缺少该参数的收件人数}, "missing_templates": [语言]}
+    """
+    by_language: Dict[str, Optional[frozenset]] = {}
+    missing: Dict[str, int] = {}
+    missing_templates: List[str] = []
+    total = 0
+    with_missing = 0
+    for r in recipients:
+        total += 1
+        variables = r.get("variables") or {}
+        if isinstance(variables, str):
+            try:
+                variables = json.loads(variables)
+            except Exception:
+                variables = {}
+        if not isinstance(variables, dict):
+            variables = {}
+        language = r.get("language") or variables.get("语言") or "English"
+        if language not in by_language:
+            params = params_for(language)
+            by_language[language] = frozenset(params) if params is not None else None
+            if params is None:
+                missing_templates.append(language)
+        params = by_language[language]
+        if not params:
+            continue
+        lacking = params.difference(variables)
+        if lacking:
+            with_missing += 1
+            for name in lacking:
+                missing[name] = missing.get(name, 0) + 1
+    return {
+        "valid": not missing and not missing_templates,
+        "recipients": total,
+        "recipients_with_missing": with_missing,
+        "missing_parameters": dict(sorted(missing.items())),
+        "missing_templates": missing_templates,
+    }
+
+
+def html_to_text(html_content: Optional[str]) -> str:
+    """
+    将HTML转换为纯文本（去除空行、行首尾空白）
+
+    对模板调用时，[参数] 占位符作为普通文本保留，可在转换后再做变量替换。
+    """
+    if not html_content:
+        return ""
+    try:
+        # bs4 只在保存/编译模板时需要，延迟导入以免拖慢API进程启动
+        from bs4 import BeautifulSoup
+        text = BeautifulSoup(html_content, "html.parser").get_text()
+        lines = [line.strip() for line in text.splitlines()]
+        return "\n".join(line for line in lines if line)
+    except Exception:
+        # 解析失败时退化为简单的标签移除
+        return re.sub(r"<[^>]+>", "", html_content).strip()
+
+
+def compile_html_template(html_content: Optional[str]) -> Dict[str, Any]:
+    """
+    编译HTML模板
+
+    Returns:
+        {"version", "html": 原始HTML, "text": 纯文本版本（保留占位符）,
+         "images": 引用的图片ID清单, "params": 引用的占位符参数}
+
+    <img id> 的 cid 改写在发送时按租户实际存在的图片素材进行（见 EmailScheduler._inline_images），
+    找不到素材的标签保留原有 src（如外部图片链接）。
+    """
+    return {
+        "version": COMPILER_VERSION,
+        "html": html_content or "",
+        "text": html_to_text(html_content),
+        "images": list(dict.fromkeys(extract_img_ids(html_content or ""))),
+        "params": extract_params(html_content),
+    }
+
+
+def load_compiled(raw: Any) -> Optional[Dict[str, Any]]:
+    """解析已存储的编译结果（JSON字符串或dict），版本不符时返回None"""
+    if not raw:
+        return None
+    if isinstance(raw, (str, bytes)):
+        try:
+            raw = json.loads(raw)
+        except Exception:
+            return None
+    if not isinstance(raw, dict) or raw.get("version") != COMPILER_VERSION:
+        return None
+    return raw
+
+
+def compiled_for_row(template_row: Dict[str, Any]) -> Dict[str, Any]:
+    """取数据库模板行的编译结果，缺失或过期时现场编译"""
+    compiled = load_compiled(template_row.get("compiled_json"))
+    if compiled is None:
+        compiled = compile_html_template(template_row.get("html_content"))
+    return compiled
@@ -1,7 +1,9 @@
+import json
 import os
 import re
-from typing import Dict, Optional, List, Tuple
-from bs4 import BeautifulSoup
+from typing import Any, Dict, Optional, List, Tuple
+
+from src.template_compiler import compile_html_template, load_compiled
 
 
 # Allow standard language codes (en, es, fr, zh-CN) and a special "default"
@@ -14,6 +16,7 @@ class TemplateFileManager:
     Layout under files/:
       files/tenant_{master_user_id}_{store_id}/templates/{lang}_subject.txt
       files/tenant_{master_user_id}_{store_id}/templates/{lang}_content.txt
+      files/tenant_{master_user_id}_{store_id}/templates/{lang}_compiled.json  (derived, see save_content)
     """
 
     def __init__(self, files_root: str = "files"):
@@ -23,14 +26,31 @@ class TemplateFileManager:
     def _tenant_dir(self, master_user_id: str, store_id: str) -> str:
         return os.path.join(self.files_root, f"tenant_{master_user_id}_{store_id}", "templates")
 
-    def _paths(self, master_user_id: str, store_id: str, language: str) -> Tuple[str, str]:
+    def template_paths(self, master_user_id: str, store_id: str, language: str) -> Tuple[str, str]:
+        """(subject path, content path) for reading; does not touch the filesystem."""
         tdir = self._tenant_dir(master_user_id, store_id)
-        os.makedirs(tdir, exist_ok=True)
         return (
             os.path.join(tdir, f"{language}_subject.txt"),
             os.path.join(tdir, f"{language}_content.txt"),
         )
 
+    def _paths(self, master_user_id: str, store_id: str, language: str) -> Tuple[str, str]:
+        # for writes: creates the tenant template directory
+        os.makedirs(self._tenant_dir(master_user_id, store_id), exist_ok=True)
+        return self.template_paths(master_user_id, store_id, language)
+
+    def _compiled_path(self, master_user_id: str, store_id: str, language: str) -> str:
+        return os.path.join(self._tenant_dir(master_user_id, store_id), f"{language}_compiled.json")
+
+    def _write_compiled(self, master_user_id: str, store_id: str, language: str, html_text: str) -> Dict[str, Any]:
+        compiled = compile_html_template(html_text)
+        path = self._compiled_path(master_user_id, store_id, language)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(compiled, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return compiled
+
     # ----- validation & sanitize -----
     def _validate_language(self, language: str):
         if not language or not LANG_PATTERN.match(language):
@@ -38,6 +58,8 @@ class TemplateFileManager:
 
     def _sanitize_html(self, html_text: str) -> str:
         # basic sanitation: strip script/style, event handlers and javascript: urls
+        from bs4 import BeautifulSoup  # deferred: only needed when templates are written
+
         soup = BeautifulSoup(html_text or "", "html.parser")
         for tag in soup.find_all(["script", "style"]):
             tag.decompose()
@@ -69,10 +91,12 @@ class TemplateFileManager:
             raise ValueError("empty or invalid html content")
         with open(content_path, "w", encoding="utf-8") as f:
             f.write(clean)
+        # precompile once at save time so senders never parse the html
+        self._write_compiled(master_user_id, store_id, language, clean)
 
     def read_language(self, master_user_id: str, store_id: str, language: str) -> Dict[str, Optional[str]]:
         self._validate_language(language)
-        subject_path, content_path = self._paths(master_user_id, store_id, language)
+        subject_path, content_path = self.template_paths(master_user_id, store_id, language)
         subject = None
         content = None
         if os.path.exists(subject_path):
@@ -81,9 +105,32 @@ class TemplateFileManager:
             content = open(content_path, "r", encoding="utf-8").read()
         return {"language": language, "subject": subject, "content": content}
 
+    def read_compiled(self, master_user_id: str, store_id: str, language: str) -> Optional[Dict[str, Any]]:
+        """Return the compiled content template ({"html", "images", ...}).
+
+        The sidecar is rebuilt when missing, older than the content file, or
+        produced by an older compiler version. Returns None without content.
+        """
+        self._validate_language(language)
+        _, content_path = self.template_paths(master_user_id, store_id, language)
+        if not os.path.exists(content_path):
+            return None
+        compiled_path = self._compiled_path(master_user_id, store_id, language)
+        if os.path.exists(compiled_path) and os.path.getmtime(compiled_path) >= os.path.getmtime(content_path):
+            try:
+                with open(compiled_path, "r", encoding="utf-8") as f:
+                    compiled = load_compiled(json.load(f))
+                if compiled is not None:
+                    return compiled
+            except Exception:
+                pass
+        with open(content_path, "r", encoding="utf-8") as f:
+            html_text = f.read()
+        return self._write_compiled(master_user_id, store_id, language, html_text)
+
     def delete_language(self, master_user_id: str, store_id: str, language: str, kind: Optional[str] = None) -> int:
         self._validate_language(language)
-        subject_path, content_path = self._paths(master_user_id, store_id, language)
+        subject_path, content_path = self.template_paths(master_user_id, store_id, language)
         removed = 0
         def _rm(p):
             nonlocal removed
@@ -94,6 +141,9 @@ class TemplateFileManager:
             _rm(subject_path)
         if not kind or kind == "content":
             _rm(content_path)
+            compiled_path = self._compiled_path(master_user_id, store_id, language)
+            if os.path.exists(compiled_path):
+                os.remove(compiled_path)
         return removed
 
     def list_languages(self, master_user_id: str, store_id: str) -> List[Dict[str, any]]:
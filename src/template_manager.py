@@ -3,17 +3,21 @@
 负责加载和处理多语言邮件模板，支持内联图片处理
 """
 import os
-import re
 import logging
 from typing import Optional, Dict, Any, Set, List, Tuple
 from pathlib import Path
-from bs4 import BeautifulSoup
 
 # 处理不同的导入路径
 try:
     from src.image_manager import ImageManager
+    from src.html_images import extract_img_ids, rewrite_img_ids, cid_for
+    from src.template_compiler import extract_params, html_to_text, validate_params
+    from src.template_store import get_template_store
 except ImportError:
     from image_manager import ImageManager
+    from html_images import extract_img_ids, rewrite_img_ids, cid_for
+    from template_compiler import extract_params, html_to_text, validate_params
+    from template_store import get_template_store
 
 class TemplateManager:
     """模板管理器"""
@@ -34,6 +38,9 @@ class TemplateManager:
         # 初始化图片管理器
         self.image_manager = ImageManager()
 
+        # 模板文件按修改时间缓存在共享模板仓库中
+        self.template_store = get_template_store()
+
         # 支持的语言映射
         self.language_map = {
             "English": "en",
@@ -72,8 +79,8 @@ class TemplateManager:
         template_file = self.template_dir / f"{language_code}-subject"
         if template_file.exists():
             try:
-                with open(template_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
+                content = self.template_store.read_text_file(str(template_file))
+                if content is not None:
                     self.logger.debug(f"加载主题模板成功: {language_code}-subject")
                     return content
             except Exception as e:
@@ -84,8 +91,8 @@ class TemplateManager:
             en_template_file = self.template_dir / "en-subject"
             if en_template_file.exists():
                 try:
-                    with open(en_template_file, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
+                    content = self.template_store.read_text_file(str(en_template_file))
+                    if content is not None:
                         self.logger.info(f"使用默认英语主题模板代替 {language_code}")
                         return content
                 except Exception as e:
@@ -110,8 +117,8 @@ class TemplateManager:
         template_file = self.template_dir / f"{language_code}-html_content"
         if template_file.exists():
             try:
-                with open(template_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
+                content = self.template_store.read_text_file(str(template_file))
+                if content is not None:
                     self.logger.debug(f"加载HTML内容模板成功: {language_code}-html_content")
                     return content
             except Exception as e:
@@ -122,8 +129,8 @@ class TemplateManager:
             en_template_file = self.template_dir / "en-html_content"
             if en_template_file.exists():
                 try:
-                    with open(en_template_file, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
+                    content = self.template_store.read_text_file(str(en_template_file))
+                    if content is not None:
                         self.logger.info(f"使用默认英语HTML内容模板代替 {language_code}")
                         return content
                 except Exception as e:
@@ -143,9 +150,29 @@ class TemplateManager:
             参数名称集合
         """
         # 匹配 [参数名] 格式的参数
-        pattern = r'\[([^\]]+)\]'
-        parameters = set(re.findall(pattern, template))
-        return parameters
+        return set(extract_params(template))
+
+    def _template_path(self, language: str, kind: str) -> Optional[Path]:
+        """按 load_*_template 的回退规则（指定语言 -> 英语）定位模板文件，kind 为 subject / html_content"""
+        language_code = self.get_language_code(language)
+        for code in ([language_code, "en"] if language_code != "en" else [language_code]):
+            template_file = self.template_dir / f"{code}-{kind}"
+            if template_file.exists():
+                return template_file
+        return None
+
+    def template_parameters(self, language: str) -> Dict[str, Optional[frozenset]]:
+        """
+        获取某种语言的主题/HTML模板引用的参数（每个模板文件按修改时间只提取一次）
+
+        Returns:
+            {"subject": 参数集合, "html_content": 参数集合}，模板不存在时为None
+        """
+        result: Dict[str, Optional[frozenset]] = {}
+        for kind in ("subject", "html_content"):
+            path = self._template_path(language, kind)
+            result[kind] = self.template_store.read_template_params(str(path)) if path else None
+        return result
 
     def validate_template_parameters(self, template: str, data_columns: list) -> Dict[str, Any]:
         """
@@ -160,27 +187,15 @@ class TemplateManager:
         """
         if not template:
             return {"valid": True, "missing_parameters": [], "template_parameters": []}
+        return self._check_parameters(self.extract_template_parameters(template), data_columns)
 
-        # 提取模板参数
-        template_parameters = self.extract_template_parameters(template)
-
-        # 检查缺失的参数
-        missing_parameters = []
-        for param in template_parameters:
-            if param not in data_columns:
-                missing_parameters.append(param)
-
-        validation_result = {
-            "valid": len(missing_parameters) == 0,
-            "missing_parameters": missing_parameters,
-            "template_parameters": list(template_parameters)
-        }
-
-        if missing_parameters:
-            self.logger.error(f"模板参数验证失败，缺失参数: {missing_parameters}")
+    def _check_parameters(self, template_parameters, data_columns) -> Dict[str, Any]:
+        """参数集合与数据列的集合差"""
+        validation_result = validate_params(template_parameters, data_columns)
+        if validation_result["missing_parameters"]:
+            self.logger.error(f"模板参数验证失败，缺失参数: {validation_result['missing_parameters']}")
         else:
-            self.logger.debug(f"模板参数验证成功，参数: {list(template_parameters)}")
-
+            self.logger.debug(f"模板参数验证成功，参数: {validation_result['template_parameters']}")
         return validation_result
 
     def replace_template_parameters(self, template: str, row_data: Dict[str, Any]) -> str:
@@ -227,28 +242,33 @@ class TemplateManager:
         Returns:
             纯文本内容
         """
-        if not html_content:
-            return ""
+        return html_to_text(html_content)
 
-        try:
-            # 使用BeautifulSoup解析HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
+    def get_text_template(self, html_template: str) -> str:
+        """
+        获取HTML模板对应的纯文本模板（占位符保留，不缓存；模板文件请使用 text_template）
+
+        Args:
+            html_template: HTML模板（未替换参数）
 
-            # 获取纯文本内容
-            text = soup.get_text()
+        Returns:
+            纯文本模板
+        """
+        return self.html_to_text(html_template)
 
-            # 清理多余的空白字符
-            lines = [line.strip() for line in text.splitlines()]
-            lines = [line for line in lines if line]  # 移除空行
+    def text_template(self, language: str) -> Optional[str]:
+        """
+        获取某种语言HTML模板对应的纯文本模板（回退规则与 load_html_content_template 一致）
 
-            return '\n'.join(lines)
+        结果保存在共享模板仓库中，按模板文件路径与修改时间缓存（LRU有界），模板修改后旧版本随之淘汰。
 
-        except Exception as e:
-            self.logger.error(f"HTML转文本失败: {e}")
-            # 如果转换失败，使用简单的标签移除方法
-            import re
-            text = re.sub(r'<[^>]+>', '', html_content)
-            return text.strip()
+        Returns:
+            纯文本模板，模板不存在时返回None
+        """
+        path = self._template_path(language, "html_content")
+        if path is None:
+            return None
+        return self.template_store.read_text_template(str(path))
 
     def generate_email_content(self, language: str, row_data: Dict[str, Any]) -> Dict[str, str]:
         """
@@ -281,8 +301,11 @@ class TemplateManager:
             html_template = self.load_html_content_template(language)
             if html_template:
                 result["html_content"] = self.replace_template_parameters(html_template, row_data)
-                # 自动生成纯文本内容
-                result["content"] = self.html_to_text(result["html_content"])
+                # 纯文本内容：模板只转换一次，再对文本版本替换参数
+                text_template = self.text_template(language)
+                if text_template is None:
+                    text_template = self.get_text_template(html_template)
+                result["content"] = self.replace_template_parameters(text_template, row_data)
             else:
                 result["errors"].append(f"未找到语言 {language} 的HTML内容模板")
 
@@ -323,6 +346,7 @@ class TemplateManager:
                         languages_to_check.append(lang_name)
                         break
 
+        columns = set(data_columns)
         for lang in languages_to_check:
             lang_result = {
                 "subject_validation": {"valid": True, "missing_parameters": []},
@@ -330,19 +354,12 @@ class TemplateManager:
                 "valid": True
             }
 
-            # 验证主题模板
-            subject_template = self.load_subject_template(lang)
-            if subject_template:
-                lang_result["subject_validation"] = self.validate_template_parameters(
-                    subject_template, data_columns
-                )
-
-            # 验证HTML内容模板
-            html_template = self.load_html_content_template(lang)
-            if html_template:
-                lang_result["html_content_validation"] = self.validate_template_parameters(
-                    html_template, data_columns
-                )
+            # 模板参数按文件版本缓存，验证只是集合差
+            params = self.template_parameters(lang)
+            if params["subject"] is not None:
+                lang_result["subject_validation"] = self._check_parameters(params["subject"], columns)
+            if params["html_content"] is not None:
+                lang_result["html_content_validation"] = self._check_parameters(params["html_content"], columns)
 
             # 总体验证结果
             lang_result["valid"] = (
@@ -373,14 +390,10 @@ class TemplateManager:
             return image_ids
 
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            img_tags = soup.find_all('img')
-
-            for img_tag in img_tags:
-                img_id = img_tag.get('id')
-                if img_id:
-                    image_ids.append(img_id)
-                    self.logger.debug(f"发现图片ID: {img_id}")
+            # 正则扫描<img>标签，避免为提取ID构建完整的DOM树
+            for img_id in extract_img_ids(html_content):
+                image_ids.append(img_id)
+                self.logger.debug(f"发现图片ID: {img_id}")
 
         except Exception as e:
             self.logger.error(f"解析HTML中的图片标签失败: {e}")
@@ -410,24 +423,15 @@ class TemplateManager:
             if not image_ids:
                 return html_content, {}
 
-            soup = BeautifulSoup(html_content, 'html.parser')
-
             # 处理每个图片
-            for image_id in image_ids:
+            for image_id in dict.fromkeys(image_ids):
                 # 验证图片文件
                 validation = self.image_manager.validate_image_file(image_id)
 
                 if validation["valid"]:
                     # 生成CID
-                    cid = f"image_{image_id}"
-
-                    # 替换HTML中的img标签
-                    img_tags = soup.find_all('img', {'id': image_id})
-                    for img_tag in img_tags:
-                        img_tag['src'] = f"cid:{cid}"
-                        # 可以保留id属性，也可以移除
-                        # img_tag.attrs.pop('id', None)
-                        self.logger.debug(f"替换图片标签: {image_id} -> cid:{cid}")
+                    cid = cid_for(image_id)
+                    self.logger.debug(f"替换图片标签: {image_id} -> cid:{cid}")
 
                     # 记录图片信息
                     image_info[image_id] = {
@@ -445,7 +449,12 @@ class TemplateManager:
                         "error": validation["error"]
                     }
 
-            processed_html = str(soup)
+            # 仅改写有效图片的标签，保留id属性
+            processed_html, _ = rewrite_img_ids(
+                html_content,
+                should_rewrite=lambda img_id: image_info.get(img_id, {}).get("valid", False),
+                keep_id=True,
+            )
 
         except Exception as e:
             self.logger.error(f"处理HTML图片失败: {e}")
@@ -529,26 +538,43 @@ class TemplateManager:
             result.update(basic_content)
 
             # 处理HTML中的图片
-            if result["html_content"]:
-                processed_html, image_info = self.process_html_images(result["html_content"])
-
-                result["html_content"] = processed_html
-                result["images"] = image_info
-                result["has_images"] = bool(image_info)
-
-                # 检查是否有无效图片
-                invalid_images = [img_id for img_id, info in image_info.items() if not info.get("valid", True)]
-                if invalid_images:
-                    result["errors"].extend([
-                        f"图片无效: {img_id} - {image_info[img_id].get('error', '未知错误')}"
-                        for img_id in invalid_images
-                    ])
-
-                self.logger.info(f"处理HTML图片完成: {len(image_info)} 个图片")
+            self.apply_html_images(result)
 
         except Exception as e:
             error_msg = f"生成包含图片的邮件内容失败: {e}"
             self.logger.error(error_msg)
             result["errors"].append(error_msg)
 
-        return result
\ No newline at end of file
+        return result
+
+    def apply_html_images(self, email_content: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理已渲染邮件内容中的图片（原地更新 html_content/images/has_images/errors）
+
+        Args:
+            email_content: 包含 html_content 与 errors 的邮件内容字典
+
+        Returns:
+            更新后的邮件内容字典
+        """
+        email_content.setdefault("images", {})
+        email_content.setdefault("has_images", False)
+        if not email_content.get("html_content"):
+            return email_content
+
+        processed_html, image_info = self.process_html_images(email_content["html_content"])
+
+        email_content["html_content"] = processed_html
+        email_content["images"] = image_info
+        email_content["has_images"] = bool(image_info)
+
+        # 检查是否有无效图片
+        invalid_images = [img_id for img_id, info in image_info.items() if not info.get("valid", True)]
+        if invalid_images:
+            email_content["errors"].extend([
+                f"图片无效: {img_id} - {image_info[img_id].get('error', '未知错误')}"
+                for img_id in invalid_images
+            ])
+
+        self.logger.info(f"处理HTML图片完成: {len(image_info)} 个图片")
+        return email_content
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""
+模板仓库模块
+统一提供数据库模板（templates 表）与文件模板（TemplateFileManager）的读取，
+在进程内缓存编译后的结果，并通过版本/修改时间校验及API写操作失效保持一致
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import get_config
+from src.template_compiler import compile_html_template, extract_params, html_to_text, load_compiled
+
+# 缓存条目上限（LRU淘汰）
+DEFAULT_MAX_ENTRIES = 512
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """文件的(修改时间ns, 大小)，文件不存在返回None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _template_params(subject: Optional[str], compiled: Dict[str, Any], text: Optional[str] = None) -> List[str]:
+    """模板（主题 + 正文 + 显式纯文本）引用的全部占位符"""
+    params = set(extract_params(subject)) | set(compiled.get("params") or [])
+    if text:
+        params |= set(extract_params(text))
+    return sorted(params)
+
+
+class TemplateStore:
+    """进程内模板仓库（线程安全）"""
+
+    def __init__(self, files_root: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._files_root = files_root
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    # ----- 缓存基础操作 -----
+    def _lookup(self, key: Tuple, stamp: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+            return None
+
+    def _store(self, key: Tuple, stamp: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _file_manager(self):
+        from src.template_files import TemplateFileManager
+
+        return TemplateFileManager(self._files_root or get_config().get("FILES_ROOT"))
+
+    # ----- 数据库模板 -----
+    def get_db_template(self, master_user_id: str, store_id: str, template_id: int) -> Optional[Dict[str, Any]]:
+        """
+        获取数据库模板的编译结果
+
+        先只查询 version/updated_at 校验缓存，命中时不再读取模板正文。
+
+        编译结果缺失或由旧版本编译器生成时现场编译，并写回 compiled_json（每个模板版本只编译一次）。
+
+        Returns:
+            {"id", "subject", "html", "text", "images", "params"}，模板不存在时返回None
+        """
+        from src.dao_mysql import get_template, get_template_stamp, set_template_compiled
+
+        key = ("db", str(master_user_id), str(store_id), int(template_id))
+        stamp_row = get_template_stamp(master_user_id, store_id, int(template_id))
+        if not stamp_row:
+            self.invalidate_db_template(master_user_id, store_id, template_id)
+            return None
+        stamp = (stamp_row.get("version"), stamp_row.get("updated_at"))
+        cached = self._lookup(key, stamp)
+        if cached is not None:
+            return cached
+
+        row = get_template(master_user_id, store_id, int(template_id))
+        if not row:
+            return None
+        compiled = load_compiled(row.get("compiled_json"))
+        if compiled is None:
+            compiled = compile_html_template(row.get("html_content"))
+            try:
+                set_template_compiled(int(template_id), compiled)
+            except Exception:
+                pass
+        tpl = {
+            "id": row.get("id"),
+            "subject": row.get("subject"),
+            "html": compiled["html"],
+            # 显式的text_content优先，否则使用预编译的纯文本版本
+            "text": row.get("text_content") or compiled["text"],
+            "images": compiled["images"],
+            "params": _template_params(row.get("subject"), compiled, row.get("text_content")),
+        }
+        self._store(key, (row.get("version"), row.get("updated_at")), tpl)
+        return tpl
+
+    def invalidate_db_template(self, master_user_id: str, store_id: str, template_id: int) -> None:
+        """API修改/删除数据库模板后调用"""
+        self._invalidate(("db", str(master_user_id), str(store_id), int(template_id)))
+
+    # ----- 文件模板 -----
+    def get_file_template(self, master_user_id: str, store_id: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文件模板的编译结果（subject与content都存在才视为可用）
+
+        Returns:
+            {"subject", "html", "text", "images", "params"}，不存在时返回None
+        """
+        tfm = self._file_manager()
+        subject_path, content_path = tfm.template_paths(master_user_id, store_id, language)
+        key = ("file", str(master_user_id), str(store_id), language)
+        stamp = (_file_stamp(subject_path), _file_stamp(content_path))
+        if stamp[0] is None or stamp[1] is None:
+            return None
+        cached = self._lookup(key, stamp)
+        if cached is not None:
+            return cached
+
+        data = tfm.read_language(master_user_id, store_id, language)
+        if not (data.get("subject") and data.get("content")):
+            return None
+        compiled = tfm.read_compiled(master_user_id, store_id, language) or {}
+        tpl = {
+            "subject": data["subject"],
+            "html": compiled.get("html", data["content"]),
+            "text": compiled.get("text", data["content"]),
+            "images": compiled.get("images", []),
+            "params": _template_params(data["subject"], compiled or {"params": extract_params(data["content"])}),
+        }
+        self._store(key, stamp, tpl)
+        return tpl
+
+    def invalidate_file_template(self, master_user_id: str, store_id: str, language: str) -> None:
+        """API上传/删除模板文件后调用"""
+        self._invalidate(("file", str(master_user_id), str(store_id), language))
+
+    def get_job_template(
+        self, master_user_id: str, store_id: str, language: str, template_id: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """任务使用的模板：指定 template_id 时为数据库模板，否则为该语言的文件模板（找不到时回退 en）"""
+        if template_id is not None:
+            return self.get_db_template(master_user_id, store_id, int(template_id))
+        for lang in ([language, "en"] if language != "en" else [language]):
+            tpl = self.get_file_template(master_user_id, store_id, lang)
+            if tpl:
+                return tpl
+        return None
+
+    # ----- 本地模板目录（TemplateManager） -----
+    def read_text_file(self, path: str) -> Optional[str]:
+        """读取模板文本文件（去除首尾空白），按修改时间缓存；文件不存在返回None"""
+        key = ("path", os.path.abspath(path))
+        stamp = _file_stamp(path)
+        if stamp is None:
+            return None
+        cached = self._lookup(key, stamp)
+        if cached is not None:
+            return cached
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        self._store(key, stamp, content)
+        return content
+
+    def read_template_params(self, path: str) -> Optional[frozenset]:
+        """模板文件引用的占位符参数，按修改时间缓存（文件未修改时不再读取/扫描）；文件不存在返回None"""
+        key = ("params", os.path.abspath(path))
+        stamp = _file_stamp(path)
+        if stamp is None:
+            return None
+        cached = self._lookup(key, stamp)
+        if cached is not None:
+            return cached
+        content = self.read_text_file(path)
+        params = frozenset(extract_params(content))
+        self._store(key, stamp, params)
+        return params
+
+    def read_text_template(self, path: str) -> Optional[str]:
+        """HTML模板文件对应的纯文本模板（占位符保留），按修改时间缓存；文件不存在返回None"""
+        key = ("text", os.path.abspath(path))
+        stamp = _file_stamp(path)
+        if stamp is None:
+            return None
+        cached = self._lookup(key, stamp)
+        if cached is not None:
+            return cached
+        text = html_to_text(self.read_text_file(path))
+        self._store(key, stamp, text)
+        return text
+
+    # ----- 失效与统计 -----
+    def _invalidate(self, key: Tuple) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+_store_instance: Optional[TemplateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_template_store() -> TemplateStore:
+    """进程级共享的模板仓库"""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = TemplateStore()
+    return _store_instance
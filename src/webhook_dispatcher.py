@@ -0,0 +1,298 @@
+"""
+Webhook异步投递模块
+发送循环只负责把事件放入有界队列，后台线程通过按主机复用的keep-alive连接投递，
+失败按指数退避重试，可选把同一地址的多条事件合并为一次POST
+"""
+import heapq
+import http.client
+import itertools
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.config import get_config
+
+logger = logging.getLogger(__name__)
+
+_HostKey = Tuple[str, str, int]
+
+
+class _ConnectionPool:
+    """按 (scheme, host, port) 缓存空闲的keep-alive连接"""
+
+    def __init__(self, timeout: float, max_idle_per_host: int = 4):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[_HostKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, key: _HostKey) -> Tuple[http.client.HTTPConnection, bool]:
+        """返回 (连接, 是否为复用连接)"""
+        with self._lock:
+            conns = self._idle.get(key)
+            if conns:
+                self.reused += 1
+                return conns.pop(), True
+            self.created += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout), False
+
+    def release(self, key: _HostKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_idle_per_host:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+class WebhookDispatcher:
+    """后台Webhook投递器（线程安全）"""
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        workers: int = 2,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        timeout: float = 5.0,
+        batch_max: int = 1,
+        batch_window: float = 0.2,
+    ):
+        """
+        Args:
+            queue_size: 队列总容量，满时丢弃新事件并计数
+            workers: 投递线程数；同一URL固定由同一线程投递以保持顺序
+            max_attempts: 单个请求最大尝试次数
+            base_delay/max_delay: 重试退避的基础/上限秒数
+            timeout: 单次HTTP请求超时秒数
+            batch_max: 大于1时启用批量模式，每次POST最多合并的事件数
+            batch_window: 批量模式下等待凑批的最长秒数
+        """
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.batch_max = max(1, batch_max)
+        self.batch_window = batch_window
+        self._queues = [queue.Queue(maxsize=max(1, queue_size // self.workers)) for _ in range(self.workers)]
+        self._pool = _ConnectionPool(timeout)
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self._inflight = 0
+        self._metrics = {
+            "enqueued": 0,
+            "dropped": 0,
+            "delivered_events": 0,
+            "delivered_requests": 0,
+            "retries": 0,
+            "failed_events": 0,
+            "total_latency_ms": 0.0,
+        }
+
+    # ----- public API -----
+    def submit(self, url: str, payload: Dict[str, Any]) -> bool:
+        """非阻塞提交事件；队列已满时丢弃并返回False"""
+        if not url:
+            return False
+        self._ensure_started()
+        idx = zlib.crc32(url.encode("utf-8")) % self.workers
+        try:
+            self._queues[idx].put_nowait((url, payload))
+        except queue.Full:
+            self._count("dropped")
+            logger.warning(f"Webhook队列已满，丢弃事件: {payload.get('event_type')} -> {url}")
+            return False
+        self._count("enqueued")
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """等待已提交的事件全部投递完成（含重试），超时返回False"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._metrics_lock:
+                busy = self._inflight
+            if busy == 0 and all(q.unfinished_tasks == 0 for q in self._queues):
+                return True
+            time.sleep(0.02)
+        return False
+
+    def stop(self) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2)
+        self._pool.close_all()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            m = dict(self._metrics)
+            m["inflight"] = self._inflight
+        requests_done = m["delivered_requests"]
+        m["avg_latency_ms"] = round(m.pop("total_latency_ms") / requests_done, 1) if requests_done else 0.0
+        m["queue_depth"] = sum(q.qsize() for q in self._queues)
+        m["connections_created"] = self._pool.created
+        m["connections_reused"] = self._pool.reused
+        m["batch_max"] = self.batch_max
+        return m
+
+    # ----- internals -----
+    def _count(self, key: str, n: float = 1) -> None:
+        with self._metrics_lock:
+            self._metrics[key] += n
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for idx in range(self.workers):
+                t = threading.Thread(target=self._worker, args=(idx,), name=f"webhook-{idx}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _worker(self, idx: int) -> None:
+        q = self._queues[idx]
+        # (due, seq, url, events, attempts)
+        retry_heap: List[Tuple[float, int, str, List[Dict[str, Any]], int]] = []
+        seq = itertools.count()
+        while not self._stop.is_set():
+            if retry_heap and retry_heap[0][0] <= time.monotonic():
+                _, _, url, events, attempts = heapq.heappop(retry_heap)
+                self._deliver(url, events, attempts, retry_heap, seq)
+                continue
+            wait = 0.5
+            if retry_heap:
+                wait = min(wait, max(0.0, retry_heap[0][0] - time.monotonic()))
+            try:
+                url, payload = q.get(timeout=wait)
+            except queue.Empty:
+                continue
+            batch = [(url, payload)]
+            if self.batch_max > 1:
+                batch.extend(self._drain(q, self.batch_max - 1))
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for u, p in batch:
+                groups.setdefault(u, []).append(p)
+            with self._metrics_lock:
+                self._inflight += len(batch)
+            for _ in batch:
+                q.task_done()
+            for u, events in groups.items():
+                for chunk_start in range(0, len(events), self.batch_max):
+                    self._deliver(u, events[chunk_start:chunk_start + self.batch_max], 1, retry_heap, seq)
+
+    def _drain(self, q: "queue.Queue", limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        items = []
+        deadline = time.monotonic() + self.batch_window
+        while len(items) < limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _deliver(self, url: str, events: List[Dict[str, Any]], attempts: int, retry_heap, seq) -> None:
+        body = events[0] if self.batch_max == 1 else {"events": events}
+        started = time.monotonic()
+        ok, retryable, error = self._post(url, body)
+        if ok:
+            with self._metrics_lock:
+                self._metrics["delivered_events"] += len(events)
+                self._metrics["delivered_requests"] += 1
+                self._metrics["total_latency_ms"] += (time.monotonic() - started) * 1000
+                self._inflight -= len(events)
+            return
+        if retryable and attempts < self.max_attempts:
+            delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1))) * random.uniform(0.5, 1.0)
+            self._count("retries")
+            heapq.heappush(retry_heap, (time.monotonic() + delay, next(seq), url, events, attempts + 1))
+            return
+        logger.warning(f"Webhook投递失败，已放弃 {len(events)} 个事件: {url}, {error}")
+        with self._metrics_lock:
+            self._metrics["failed_events"] += len(events)
+            self._inflight -= len(events)
+
+    def _post(self, url: str, body: Dict[str, Any]) -> Tuple[bool, bool, Optional[str]]:
+        """返回 (是否成功, 失败时是否可重试, 错误信息)"""
+        parts = urlsplit(url)
+        scheme = (parts.scheme or "http").lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            return False, False, f"unsupported url: {url}"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        data = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+        # 复用的连接可能已被对端关闭，此时换新连接重发一次（不计入重试次数）
+        for _ in range(2):
+            conn, reused = self._pool.acquire(key)
+            try:
+                conn.request("POST", path, body=data, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                conn.close()
+                if reused:
+                    continue
+                return False, True, str(e)
+            except Exception as e:
+                conn.close()
+                return False, True, str(e)
+            if resp.will_close:
+                conn.close()
+            else:
+                self._pool.release(key, conn)
+            if resp.status >= 500 or resp.status == 429:
+                return False, True, f"http {resp.status}"
+            if resp.status >= 400:
+                # 其余4xx视为对端拒收，不再重试
+                return False, False, f"http {resp.status}"
+            return True, False, None
+        return False, True, "connection closed"
+
+
+_dispatcher: Optional[WebhookDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    """进程级共享的Webhook投递器（按配置创建）"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                cfg = get_config()
+                _dispatcher = WebhookDispatcher(
+                    queue_size=cfg["WEBHOOK_QUEUE_SIZE"],
+                    workers=cfg["WEBHOOK_WORKERS"],
+                    max_attempts=cfg["WEBHOOK_MAX_ATTEMPTS"],
+                    timeout=cfg["WEBHOOK_TIMEOUT_SEC"],
+                    batch_max=cfg["WEBHOOK_BATCH_MAX"],
+                )
+    return _dispatcher
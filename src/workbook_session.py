@@ -0,0 +1,155 @@
+"""
+Excel工作簿会话模块
+同一工作簿只解析一次：解析结果按 (路径, 修改时间, 大小) 缓存在进程内，
+校验/过滤/统计都从内存读取；状态修改记录为脏行，由一次原子写回落盘
+"""
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STATUS_COLUMN = "是否已邮箱建联"
+# 进程内最多缓存的工作簿数
+MAX_CACHED_WORKBOOKS = 8
+
+
+def write_workbook_atomic(df: pd.DataFrame, workbook_path: str) -> None:
+    """写入同目录临时文件后原子替换，写入中途崩溃不会损坏原工作簿"""
+    target = Path(workbook_path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{target.stem}.", suffix=target.suffix or ".xlsx", dir=str(target.parent))
+    os.close(fd)
+    try:
+        df.to_excel(tmp, index=False)
+        os.replace(tmp, str(target))
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _signature(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class WorkbookSession:
+    """单个工作簿的解析结果与尚未写回的修改（线程安全）"""
+
+    def __init__(self, path: str, df: pd.DataFrame, signature: Tuple[int, int]):
+        self.path = path
+        self.signature = signature
+        self._df = df
+        self._dirty: Set[int] = set()
+        self._lock = threading.RLock()
+
+    @property
+    def columns(self):
+        return self._df.columns
+
+    def copy(self) -> pd.DataFrame:
+        """返回DataFrame副本，调用方可自由修改"""
+        with self._lock:
+            return self._df.copy()
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def unique_values(self, column: str) -> List[Any]:
+        """某列的去重非空值（按首次出现顺序），不复制整表"""
+        with self._lock:
+            return self._df[column].dropna().unique().tolist() if column in self._df.columns else []
+
+    def emails(self) -> Set[str]:
+        with self._lock:
+            return set(self._df["邮箱"].tolist()) if "邮箱" in self._df.columns else set()
+
+    @property
+    def dirty_rows(self) -> Set[int]:
+        with self._lock:
+            return set(self._dirty)
+
+    def set_statuses(self, statuses: Dict[str, int]) -> int:
+        """
+        在内存中更新建联状态并记录脏行
+
+        Returns:
+            命中的邮箱数
+        """
+        if not statuses or "邮箱" not in self._df.columns:
+            return 0
+        with self._lock:
+            mapped = self._df["邮箱"].map(statuses)
+            hit = mapped.notna()
+            if not hit.any():
+                return 0
+            if STATUS_COLUMN not in self._df.columns:
+                self._df[STATUS_COLUMN] = pd.NA
+            self._df.loc[hit, STATUS_COLUMN] = mapped[hit]
+            self._dirty.update(self._df.index[hit].tolist())
+            return int(self._df.loc[hit, "邮箱"].nunique())
+
+    def save(self) -> bool:
+        """
+        将脏行一次性写回工作簿（整表原子替换）
+
+        Returns:
+            是否执行了写入；写入失败时抛出异常并丢弃缓存，下次读取重新解析磁盘上的文件
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            try:
+                write_workbook_atomic(self._df, self.path)
+            except Exception:
+                invalidate_workbook(self.path)
+                raise
+            self.signature = _signature(self.path)
+            logger.info(f"工作簿已写回: {self.path}, 修改 {len(self._dirty)} 行")
+            self._dirty.clear()
+            return True
+
+
+_sessions: "OrderedDict[str, WorkbookSession]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def open_workbook(path: str) -> WorkbookSession:
+    """
+    获取工作簿会话：文件未变化时复用已解析的DataFrame，否则重新解析
+
+    Raises:
+        读取/解析失败时抛出异常
+    """
+    key = str(Path(path).resolve())
+    signature = _signature(key)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is not None and session.signature == signature:
+            _sessions.move_to_end(key)
+            return session
+    # 解析放在全局锁之外，避免阻塞其他工作簿
+    df = pd.read_excel(key)
+    logger.info(f"解析工作簿: {key}, 共 {len(df)} 行")
+    session = WorkbookSession(key, df, signature)
+    with _sessions_lock:
+        _sessions[key] = session
+        _sessions.move_to_end(key)
+        while len(_sessions) > MAX_CACHED_WORKBOOKS:
+            _sessions.popitem(last=False)
+    return session
+
+
+def invalidate_workbook(path: Optional[str] = None) -> None:
+    """丢弃工作簿缓存（不传路径时清空全部）"""
+    with _sessions_lock:
+        if path is None:
+            _sessions.clear()
+        else:
+            _sessions.pop(str(Path(path).resolve()), None)
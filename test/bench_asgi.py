@@ -0,0 +1,220 @@
+"""
+WSGI / ASGI 服务模式压测
+对同一接口分别压测 gunicorn gthread（src.api_server:app）与 uvicorn（src.asgi_app:app），
+输出每秒请求数与 p50/p99 延迟；--hold 可先挂起 N 个SSE长连接，模拟大量进度订阅客户端
+
+用法:
+  python test/bench_asgi.py --spawn [--path /api/jobs/<id>/status] [--concurrency 200] [--duration 10] [--hold 500]
+  python test/bench_asgi.py --wsgi-url http://127.0.0.1:5000 --asgi-url http://127.0.0.1:8000 ...
+
+--spawn 需要安装 gunicorn 与 uvicorn；--hold 需要一个存在的任务ID（--job）。
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+async def _request(reader, writer, host: str, path: str) -> Tuple[int, bool]:
+    """发送一个GET请求并读完响应，返回 (状态码, 服务端是否要求关闭连接)"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    length = 0
+    chunked = False
+    # HTTP/1.0 closes unless the server asks for keep-alive
+    close = lines[0].startswith("HTTP/1.0")
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value.strip())
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+        elif name == "connection":
+            close = "close" in value.lower()
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def _client(url: str, path: str, deadline: float, latencies: List[float], errors: List[int]) -> None:
+    parts = urlsplit(url)
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            t0 = time.perf_counter()
+            status, close = await _request(reader, writer, parts.netloc, path)
+            latencies.append(time.perf_counter() - t0)
+            if status >= 500:
+                errors.append(status)
+            if close:
+                writer.close()
+                reader = writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors.append(0)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def _hold_streams(url: str, job_id: str, count: int) -> Tuple[List[asyncio.StreamWriter], int]:
+    """打开 count 个SSE连接并保持不读取，返回 (连接, 失败数)"""
+    parts = urlsplit(url)
+    writers, failed = [], 0
+    for _ in range(count):
+        try:
+            reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            writer.write(
+                f"GET /api/jobs/{job_id}/stream?timeout=3600 HTTP/1.1\r\nHost: {parts.netloc}\r\n\r\n".encode("latin-1")
+            )
+            await writer.drain()
+            writers.append(writer)
+        except OSError:
+            failed += 1
+    return writers, failed
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_load(url: str, path: str, concurrency: int, duration: float, hold: int, job_id: Optional[str]) -> dict:
+    held, hold_failed = ([], 0)
+    if hold:
+        held, hold_failed = await _hold_streams(url, job_id, hold)
+        await asyncio.sleep(1.0)
+    latencies: List[float] = []
+    errors: List[int] = []
+    deadline = time.monotonic() + duration
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_client(url, path, deadline, latencies, errors) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    for writer in held:
+        writer.close()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "errors": len(errors),
+        "held_streams": len(held) - hold_failed,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(url: str, timeout: float = 30.0) -> None:
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((parts.hostname, parts.port), timeout=1) as s:
+                s.sendall(f"GET /api/health HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n".encode())
+                if b" 200 " in s.recv(64):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not become healthy")
+
+
+def spawn_servers(threads: int) -> Tuple[List[subprocess.Popen], str, str]:
+    """按 Dockerfile 的 gthread 配置（单进程）启动 WSGI，并启动单进程 uvicorn"""
+    env = dict(os.environ, JOB_RUNNER_ENABLED="false", PYTHONPATH=str(project_root))
+    wsgi_port, asgi_port = _free_port(), _free_port()
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-w", "1", "-k", "gthread", "--threads", str(threads), "-t", "120",
+             "-b", f"127.0.0.1:{wsgi_port}", "src.api_server:app"],
+            cwd=str(project_root), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.asgi_app:app", "--host", "127.0.0.1", "--port", str(asgi_port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=str(project_root), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+    ]
+    wsgi_url, asgi_url = f"http://127.0.0.1:{wsgi_port}", f"http://127.0.0.1:{asgi_port}"
+    try:
+        _wait_healthy(wsgi_url)
+        _wait_healthy(asgi_url)
+    except Exception:
+        for p in procs:
+            p.terminate()
+        raise
+    return procs, wsgi_url, asgi_url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare WSGI (gunicorn gthread) and ASGI (uvicorn) serving modes")
+    parser.add_argument("--wsgi-url")
+    parser.add_argument("--asgi-url")
+    parser.add_argument("--spawn", action="store_true", help="start gunicorn and uvicorn locally (single process each)")
+    parser.add_argument("--threads", type=int, default=8, help="gthread threads for --spawn (Dockerfile: 8)")
+    parser.add_argument("--path", default="/api/health")
+    parser.add_argument("--job", help="job id for --hold streams")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--hold", type=int, default=0, help="idle SSE connections held open during the run")
+    args = parser.parse_args()
+    if args.hold and not args.job:
+        parser.error("--hold requires --job")
+
+    procs: List[subprocess.Popen] = []
+    targets = []
+    if args.spawn:
+        procs, wsgi_url, asgi_url = spawn_servers(args.threads)
+        targets = [("wsgi (gthread)", wsgi_url), ("asgi (uvicorn)", asgi_url)]
+    else:
+        if args.wsgi_url:
+            targets.append(("wsgi", args.wsgi_url))
+        if args.asgi_url:
+            targets.append(("asgi", args.asgi_url))
+    if not targets:
+        parser.error("give --spawn or at least one of --wsgi-url / --asgi-url")
+
+    print(f"path={args.path} concurrency={args.concurrency} duration={args.duration}s hold={args.hold}")
+    try:
+        for label, url in targets:
+            r = asyncio.run(run_load(url, args.path, args.concurrency, args.duration, args.hold, args.job))
+            print(f"{label:<16} {r['rps']:9.1f} req/s  p50 {r['p50_ms']:8.1f}ms  p99 {r['p99_ms']:8.1f}ms  "
+                  f"requests {r['requests']:7d}  errors {r['errors']:5d}  held {r['held_streams']}")
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
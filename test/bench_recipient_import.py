@@ -0,0 +1,74 @@
+"""
+收件人表格读取基准
+对比默认读取（pd.read_excel 全部列）与列式导入（只读需要的列 + 紧凑类型）的耗时和峰值内存
+
+用法: python test/bench_recipient_import.py [行数] [--csv]
+"""
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+
+from src.recipient_import import BASE_COLUMNS, read_recipients
+
+
+def make_sheet(rows: int, path: Path) -> None:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "邮箱": [f"user{i}@example.com" for i in range(rows)],
+        "合作次数": rng.integers(0, 2, rows),
+        "回复次数": rng.integers(0, 2, rows),
+        "跟进次数": rng.integers(0, 3, rows),
+        "跟进方式": rng.choice(["自动", "手动"], rows),
+        "是否已邮箱建联": [None] * rows,
+        "语言": rng.choice(["English", "Spanish", "French"], rows),
+        "达人ID": [f"creator{i}" for i in range(rows)],
+        "钩子": ["hook"] * rows,
+        # 模板不引用的宽列
+        "备注": ["some long free-form note about this contact " * 3] * rows,
+        "主页链接": [f"https://example.com/creator/{i}" for i in range(rows)],
+        "粉丝数": rng.integers(0, 1_000_000, rows),
+        "地区": rng.choice(["US", "ES", "FR", "DE"], rows),
+    })
+    if path.suffix == ".csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def measure(label: str, fn) -> None:
+    # 计时与内存分开测量：tracemalloc 会显著拖慢解析
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    df = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame_mb = df.memory_usage(deep=True).sum() / 1e6
+    print(f"{label:<28} {elapsed:8.2f}s  peak {peak / 1e6:8.1f}MB  frame {frame_mb:7.1f}MB  cols {len(df.columns)}")
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 20000
+    suffix = ".csv" if "--csv" in sys.argv else ".xlsx"
+    columns = set(BASE_COLUMNS) | {"达人ID", "钩子"}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"contacts{suffix}"
+        make_sheet(rows, path)
+        print(f"{rows} 行, {path.suffix}, {path.stat().st_size / 1e6:.1f}MB")
+        reader = pd.read_csv if suffix == ".csv" else pd.read_excel
+        measure("默认读取(全部列)", lambda: reader(path))
+        measure("列式导入(需要的列)", lambda: read_recipients(str(path), columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+ASGI服务模式测试
+直接驱动ASGI应用（不需要服务器）：状态接口与Flask版本的响应/ETag一致，SSE连接在事件循环上等待、
+由事件总线唤醒且不占用线程，多个连接的计数查询被合并，其余路由经WSGI桥交给Flask处理
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import asyncio
+import json
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+import src.api_v2 as api_v2
+import src.asgi_app as asgi_app
+import src.dao_async as dao_async
+import src.dao_mysql as dao_mysql
+from src.event_bus import JobEventBus
+
+COUNTERS = {
+    "id": "j", "status": "running", "total": 3, "success_count": 1, "failure_count": 0,
+    "created_at": "2026-10-18 10:00:00", "started_at": "2026-10-18 10:00:01", "completed_at": None,
+}
+
+
+async def _call(app, path, method="GET", headers=None, body=b""):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query.encode(), "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "http_version": "1.1", "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 1234),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()  # no disconnect
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def _patch_dao(monkeypatch, calls=None):
+    def get_job_counters(job_id):
+        if calls is not None:
+            calls.append(job_id)
+        return dict(COUNTERS) if job_id == "j" else None
+    monkeypatch.setattr(dao_mysql, "get_job_counters", get_job_counters)
+    monkeypatch.setattr(api_v2, "get_job_counters", get_job_counters)
+
+
+def test_status_matches_flask_route(monkeypatch):
+    _patch_dao(monkeypatch)
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(api_v2.bp)
+    expected = flask_app.test_client().get("/api/jobs/j/status")
+    app = asgi_app.create_app(flask_app)
+
+    async def scenario():
+        status, headers, body = await _call(app, "/api/jobs/j/status")
+        assert status == 200
+        assert json.loads(body) == expected.get_json()
+        assert headers["etag"] == expected.headers["ETag"]
+        assert (await _call(app, "/api/jobs/j/status", headers={"If-None-Match": headers["etag"]}))[0] == 304
+        assert (await _call(app, "/api/jobs/x/status"))[0] == 404
+        status, _, body = await _call(app, "/api/health")
+        assert status == 200 and json.loads(body)["status"] == "ok"
+    asyncio.run(scenario())
+
+
+def test_streams_wait_on_the_loop_and_wake_on_publish(monkeypatch):
+    _patch_dao(monkeypatch)
+    bus = JobEventBus()
+    monkeypatch.setattr(asgi_app, "get_event_bus", lambda: bus)
+    app = asgi_app.create_app(Flask(__name__))
+    clients = 200
+
+    async def scenario():
+        threads_before = threading.active_count()
+        tasks = [asyncio.ensure_future(_call(app, "/api/jobs/j/stream?timeout=10")) for _ in range(clients)]
+        await asyncio.sleep(0.3)
+        # all streams are open but none holds a thread
+        assert threading.active_count() - threads_before < 10
+
+        def producer():
+            bus.publish("j", "recipient_success", {"email": "a@x.com", "progress": {"success": 2}})
+            bus.publish("j", "completed", {"progress": {"success": 2}})
+        threading.Thread(target=producer).start()
+        return await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+
+    results = asyncio.run(scenario())
+    assert len(results) == clients
+    for status, headers, body in results:
+        text = body.decode()
+        assert status == 200 and headers["content-type"].startswith("text/event-stream")
+        assert "id: 1\nevent: recipient_success" in text
+        assert "id: 2\nevent: completed" in text
+        assert text.rstrip().split("\n")[-2] == "event: end"
+
+
+def test_counter_reads_are_coalesced(monkeypatch):
+    calls = []
+    _patch_dao(monkeypatch, calls)
+
+    async def scenario():
+        return await asyncio.gather(*[dao_async.get_job_counters("j") for _ in range(50)])
+
+    results = asyncio.run(scenario())
+    assert all(r["total"] == 3 for r in results)
+    assert calls == ["j"]
+
+
+def test_other_routes_fall_back_to_flask():
+    flask_app = Flask(__name__)
+
+    @flask_app.route("/api/echo", methods=["POST"])
+    def echo():
+        return jsonify({"got": request.get_json(), "q": request.args.get("q"), "key": request.headers.get("X-API-Key")})
+
+    @flask_app.route("/api/chunks")
+    def chunks():
+        return Response((f"{i};" for i in range(3)), mimetype="text/plain")
+
+    app = asgi_app.create_app(flask_app)
+
+    async def scenario():
+        status, _, body = await _call(app, "/api/echo?q=1", "POST",
+                                      {"Content-Type": "application/json", "X-API-Key": "k"}, b'{"a": 1}')
+        assert status == 200 and json.loads(body) == {"got": {"a": 1}, "q": "1", "key": "k"}
+        assert (await _call(app, "/api/chunks"))[2] == b"0;1;2;"
+        assert (await _call(app, "/api/missing"))[0] == 404
+    asyncio.run(scenario())
+
+
+def test_stream_resumed_at_terminal_event_ends(monkeypatch):
+    _patch_dao(monkeypatch)
+    monkeypatch.setitem(COUNTERS, "status", "completed")
+    bus = JobEventBus()
+    bus.publish("j", "recipient_success", {"n": 0})
+    bus.publish("j", "completed", {})
+    monkeypatch.setattr(asgi_app, "get_event_bus", lambda: bus)
+    app = asgi_app.create_app(Flask(__name__))
+
+    async def scenario():
+        status, _, body = await asyncio.wait_for(
+            _call(app, "/api/jobs/j/stream?timeout=10", headers={"Last-Event-ID": "2"}), timeout=2
+        )
+        assert status == 200
+        text = body.decode()
+        assert "id: " not in text
+        assert text.rstrip().split("\n")[-2] == "event: end"
+        assert (await _call(app, "/api/jobs/j/stream?timeout=abc"))[0] == 400
+    asyncio.run(scenario())
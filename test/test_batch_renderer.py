@@ -0,0 +1,100 @@
+"""
+批量模板渲染测试
+验证按列渲染结果与逐行渲染一致、每种语言只解析一次模板、保持行顺序，并报告缺失/为空的参数
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+
+from src.batch_renderer import compile_segments, file_template_resolver, render_frame
+from src.email_sender import EmailSender
+from src.template_manager import TemplateManager
+
+
+def _templates(tmp_path):
+    (tmp_path / "en-subject").write_text("Hi [达人ID]", encoding="utf-8")
+    (tmp_path / "en-html_content").write_text("<p>Hello [达人ID],</p><p>[钩子] [未知参数]</p>", encoding="utf-8")
+    (tmp_path / "esp-subject").write_text("Hola [达人ID]", encoding="utf-8")
+    (tmp_path / "esp-html_content").write_text("<p>[钩子]!</p>", encoding="utf-8")
+    return TemplateManager(str(tmp_path))
+
+
+def _frame():
+    return pd.DataFrame({
+        "邮箱": ["a@example.com", "b@example.com", "c@example.com", "d@example.com"],
+        "语言": ["English", "Spanish", "English", None],
+        "达人ID": ["ca", "cb", "cc", "cd"],
+        "钩子": ["hook a", "gancho b", None, "hook d"],
+    })
+
+
+def test_segments_roundtrip():
+    assert compile_segments("a [x] b [y]") == (["a ", " b ", ""], ["x", "y"])
+    assert compile_segments("no params") == (["no params"], [])
+
+
+def test_matches_row_by_row_rendering(tmp_path):
+    manager = _templates(tmp_path)
+    df = _frame()
+    out = list(render_frame(df, file_template_resolver(manager), chunksize=3))
+
+    assert [m["to_email"] for m in out] == df["邮箱"].tolist()
+    assert [m["index"] for m in out] == [0, 1, 2, 3]
+    for msg, row in zip(out, df.to_dict("records")):
+        if pd.isna(row["钩子"]):
+            # row-by-row rendering used to print "nan" here
+            continue
+        expected = manager.generate_email_content(row["语言"] or "English", row)
+        assert (msg["subject"], msg["html_content"], msg["content"]) == (
+            expected["subject"], expected["html_content"], expected["content"]
+        )
+    assert out[3]["language"] == "English"
+
+
+def test_reports_missing_and_empty_parameters(tmp_path):
+    out = list(render_frame(_frame(), file_template_resolver(_templates(tmp_path))))
+
+    assert out[0]["missing"] == ["未知参数"]
+    # unknown placeholders are left as-is
+    assert "[未知参数]" in out[0]["html_content"]
+    assert out[1]["missing"] == []
+    # empty values render as "" and are reported per row
+    assert out[2]["empty"] == ["钩子"]
+    assert "<p> [未知参数]</p>" in out[2]["html_content"]
+
+
+def test_templates_resolved_once_per_language(tmp_path):
+    manager = _templates(tmp_path)
+    calls = []
+    resolve = file_template_resolver(manager)
+    df = pd.concat([_frame()] * 50, ignore_index=True)
+
+    out = list(render_frame(df, lambda lang: calls.append(lang) or resolve(lang), chunksize=16))
+
+    assert len(out) == 200
+    assert sorted(calls) == ["English", "Spanish"]
+
+
+def test_missing_language_template_is_reported(tmp_path):
+    (tmp_path / "en-subject").write_text("Hi", encoding="utf-8")
+    out = list(render_frame(_frame().head(1), file_template_resolver(TemplateManager(str(tmp_path)))))
+    assert out[0]["errors"] == ["未找到语言 English 的HTML内容模板"]
+
+
+def test_bulk_send_uses_batch_rendering(tmp_path, monkeypatch):
+    sender = EmailSender(None, "me@example.com", template_dir=str(tmp_path))
+    _templates(tmp_path)
+    sent = []
+    monkeypatch.setattr(sender, "send_email", lambda **kw: sent.append(kw) or {"success": True})
+    monkeypatch.setattr(sender.template_manager, "generate_email_content", lambda *a, **kw: (_ for _ in ()).throw(AssertionError("per-row render")))
+
+    result = sender.send_bulk_emails_from_data(_frame().head(2))
+
+    assert result["success_count"] == 2
+    assert [s["subject"] for s in sent] == ["Hi ca", "Hola cb"]
+    assert sorted(result["languages_used"]) == ["English", "Spanish"]
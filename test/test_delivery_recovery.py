@@ -0,0 +1,81 @@
+"""
+发送崩溃恢复测试
+验证租约过期的sending收件人按 Message-ID 对账：已送达记为成功，未送达退回pending
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.delivery_recovery as recovery
+
+
+class _FakeGmail:
+    def __init__(self, sent):
+        self.sent = sent
+        self.queries = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId, q, **kwargs):
+        self.queries.append(q)
+        self._q = q
+        return self
+
+    def execute(self):
+        msgid = self._q.split(":", 1)[1]
+        return {"messages": [{"id": self.sent[msgid]}]} if msgid in self.sent else {}
+
+
+class _FakeAuth:
+    def __init__(self, service):
+        self.service = service
+
+    def get_gmail_service(self, sender_email, master_user_id, store_id):
+        return self.service
+
+
+def test_message_id_is_deterministic():
+    a = recovery.message_id_for("job-1", 7, "shop@example.com")
+    assert a == "<job-1.7@example.com>"
+    assert a == recovery.message_id_for("job-1", 7, "shop@example.com")
+
+
+def test_reconcile_marks_sent_and_releases_unsent(monkeypatch):
+    rows = [
+        {"id": 1, "job_id": "j", "to_email": "a@x.com", "sender_email": "s@example.com", "master_user_id": "1", "store_id": "2"},
+        {"id": 2, "job_id": "j", "to_email": "b@x.com", "sender_email": "s@example.com", "master_user_id": "1", "store_id": "2"},
+    ]
+    calls = {"status": [], "released": [], "counts": []}
+    monkeypatch.setattr(recovery, "list_expired_sending_recipients", lambda limit: rows)
+    monkeypatch.setattr(recovery, "finish_recipient", lambda job_id, rid, st, err, pid: calls["status"].append((rid, st, pid)) or True)
+    monkeypatch.setattr(recovery, "release_recipient", lambda rid: calls["released"].append(rid) or 1)
+    monkeypatch.setattr(recovery, "insert_job_event", lambda *a, **k: None)
+
+    gmail = _FakeGmail({"j.1@example.com": "gmail-123"})
+    stats = recovery.reconcile_sending_recipients(_FakeAuth(gmail))
+
+    assert stats == {"sent": 1, "released": 1, "unknown": 0}
+    assert calls["status"] == [(1, "success", "gmail-123")]
+    assert calls["released"] == [2]
+    assert gmail.queries == ["rfc822msgid:j.1@example.com", "rfc822msgid:j.2@example.com"]
+
+
+def test_reconcile_does_not_recount_a_finished_recipient(monkeypatch):
+    # the sender already moved the row out of 'sending' (crash after the success write)
+    rows = [{"id": 1, "job_id": "j", "to_email": "a@x.com", "sender_email": "s@example.com", "master_user_id": "1", "store_id": "2"}]
+    events = []
+    monkeypatch.setattr(recovery, "list_expired_sending_recipients", lambda limit: rows)
+    monkeypatch.setattr(recovery, "finish_recipient", lambda *a: False)
+    monkeypatch.setattr(recovery, "insert_job_event", lambda *a, **k: events.append(a))
+
+    stats = recovery.reconcile_sending_recipients(_FakeAuth(_FakeGmail({"j.1@example.com": "gmail-123"})))
+
+    assert stats == {"sent": 0, "released": 0, "unknown": 0}
+    assert events == []
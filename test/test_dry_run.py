@@ -0,0 +1,140 @@
+"""
+试运行测试
+验证表格/数据库任务的全量渲染统计（缺失/为空参数、大小分布、语言分布），多进程与单进程结果一致，以及模板预览不再逐行创建发送器
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import logging
+
+import pandas as pd
+
+import src.dry_run as dry_run
+from src.email_assistant import EmailAssistant
+from src.excel_processor import ExcelProcessor
+
+
+def _setup(tmp_path, rows=9):
+    tpl = tmp_path / "template"
+    tpl.mkdir()
+    (tpl / "en-subject").write_text("Hi [达人ID]", encoding="utf-8")
+    (tpl / "en-html_content").write_text("<p>[钩子] [未知参数]</p>", encoding="utf-8")
+    (tpl / "esp-subject").write_text("Hola [达人ID]", encoding="utf-8")
+    (tpl / "esp-html_content").write_text("<p>[钩子]</p>" + "x" * 3000, encoding="utf-8")
+    path = tmp_path / "campaign.xlsx"
+    pd.DataFrame({
+        "邮箱": [f"u{i}@example.com" for i in range(rows)],
+        "合作次数": [0] * rows,
+        "回复次数": [0] * rows,
+        "跟进次数": [1] * rows,
+        "跟进方式": ["自动"] * rows,
+        "是否已邮箱建联": [None] * rows,
+        "语言": ["English", "Spanish", None] * (rows // 3),
+        "达人ID": [f"c{i}" for i in range(rows)],
+        "钩子": ["hook", None, "hook"] * (rows // 3),
+    }).to_excel(path, index=False)
+    return str(path), ExcelProcessor(str(tpl))
+
+
+def _without_timing(report):
+    return {k: v for k, v in report.items() if k not in ("workers", "elapsed_sec", "messages_per_sec")}
+
+
+def test_workbook_dry_run_reports_aggregate_stats(tmp_path):
+    path, processor = _setup(tmp_path)
+
+    report = dry_run.dry_run_workbook(path, processor, workers=1, chunksize=4, max_message_bytes=2048)
+
+    assert report["total"] == 9
+    assert report["languages"] == {"English": 6, "Spanish": 3}
+    assert report["missing_variables"] == {"未知参数": 6}
+    assert report["empty_variables"] == {"钩子": 3}
+    assert report["ok"] == 0
+    assert report["size"]["oversized"] == 3
+    assert sum(report["size"]["distribution"].values()) == 9
+    assert report["size"]["max"] > 3000 > report["size"]["min"]
+    assert [s["index"] for s in report["samples"]] == list(range(9))
+    assert report["samples"][1] == {
+        "index": 1, "to_email": "u1@example.com", "language": "Spanish",
+        "size": report["samples"][1]["size"], "missing": [], "empty": ["钩子"], "errors": [],
+    }
+    assert report["messages_per_sec"] > 0
+
+
+def test_process_pool_matches_inline_rendering(tmp_path):
+    path, processor = _setup(tmp_path, rows=30)
+
+    inline = dry_run.dry_run_workbook(path, processor, workers=1, chunksize=7, sample_limit=5)
+    pooled = dry_run.dry_run_workbook(path, processor, workers=2, chunksize=7, sample_limit=5)
+
+    assert pooled["workers"] == 2
+    assert _without_timing(pooled) == _without_timing(inline)
+    assert [s["index"] for s in pooled["samples"]] == [0, 1, 2, 3, 4]
+
+
+def test_job_dry_run_pages_recipients(monkeypatch):
+    recipients = [
+        {"id": i, "to_email": f"r{i}@example.com", "language": None,
+         "variables": '{"name": "R%d", "语言": "%s"}' % (i, "Spanish" if i % 2 else "English")}
+        for i in range(1, 6)
+    ]
+    pages = []
+
+    def iter_job_recipients(job_id, status=None, batch_size=1000):
+        for start in range(0, len(recipients), batch_size):
+            pages.append(status)
+            yield recipients[start:start + batch_size]
+
+    class _Store:
+        def get_job_template(self, mu, store, language, template_id=None):
+            assert template_id == 3
+            return {"subject": "Hi [name]", "html": "<p>[name] [code]</p>", "text": "[name]", "images": []}
+
+    monkeypatch.setattr(dry_run, "iter_job_recipients", iter_job_recipients)
+    monkeypatch.setattr(dry_run, "get_template_store", lambda: _Store())
+    monkeypatch.setattr(dry_run, "get_job", lambda job_id: {
+        "id": job_id, "type": "template", "template_id": 3, "master_user_id": "mu", "store_id": "s1",
+    })
+
+    report = dry_run.dry_run_job("j1", workers=1, chunksize=2)
+
+    assert pages == ["pending"] * 3
+    assert report["job_id"] == "j1" and report["total"] == 5
+    assert report["languages"] == {"English": 2, "Spanish": 3}
+    assert report["missing_variables"] == {"code": 5}
+
+    # custom jobs are sent verbatim: their placeholders are never filled
+    monkeypatch.setattr(dry_run, "get_job", lambda job_id: {
+        "id": job_id, "type": "custom", "master_user_id": "mu", "store_id": "s1",
+        "subject": "Hello [name]", "content": "plain", "html_content": None,
+    })
+    report = dry_run.dry_run_job("j1", status=None, workers=1)
+    assert report["missing_variables"] == {"name": 5}
+    assert pages[-1] is None
+
+
+def test_job_dry_run_unknown_job(monkeypatch):
+    monkeypatch.setattr(dry_run, "get_job", lambda job_id: None)
+    assert dry_run.dry_run_job("missing") is None
+
+
+def test_preview_renders_without_building_senders(tmp_path, monkeypatch):
+    path, processor = _setup(tmp_path)
+    assistant = EmailAssistant.__new__(EmailAssistant)
+    assistant.excel_processor = processor
+    assistant.logger = logging.getLogger("test")
+
+    def _no_sender(*args, **kwargs):
+        raise AssertionError("preview must not build an EmailSender")
+    monkeypatch.setattr("src.email_sender.EmailSender.__init__", _no_sender)
+
+    result = assistant.preview_template_emails(path, max_previews=2)
+
+    assert result["success"]
+    assert [p["index"] for p in result["previews"]] == [1, 2]
+    assert "主题: Hi c0" in result["previews"][0]["preview"]
+    assert "主题: Hola c1" in result["previews"][1]["preview"]
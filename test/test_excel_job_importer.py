@@ -0,0 +1,216 @@
+"""
+表格导入任务测试
+验证表格按过滤规则分批导入为数据库任务（导入期间任务不可被调度），以及任务完成后状态写回表格
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import os
+
+import pandas as pd
+import pytest
+
+import src.excel_job_importer as importer
+import src.job_runner as job_runner
+from src.excel_processor import ExcelProcessor
+
+
+def _workbook(tmp_path, suffix=".xlsx"):
+    path = tmp_path / f"campaign{suffix}"
+    df = pd.DataFrame({
+        "邮箱": ["a@example.com", "b@example.com", "manual@example.com", "a@example.com", "done@example.com", "c@example.com"],
+        "合作次数": [0, 0, 0, 0, 0, 0],
+        "回复次数": [0, 0, 0, 0, 0, 0],
+        "跟进次数": [1, 1, 1, 1, 1, 1],
+        "跟进方式": ["自动", "自动", "手动", "自动", "自动", "自动"],
+        "是否已邮箱建联": [None, 0, None, None, 1, None],
+        "语言": ["English", None, "English", "English", "English", "Spanish"],
+        "达人ID": ["ca", "cb", "cm", "ca2", "cd", "cc"],
+        "粉丝数": [10, 20, 30, 40, 50, 60],
+    })
+    if suffix == ".csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return str(path)
+
+
+class _FakeDB:
+    def __init__(self):
+        self.jobs = {}
+        self.recipients = []
+        self.batches = []
+        self.events = []
+        self.status_log = []
+
+    def install(self, monkeypatch):
+        monkeypatch.setattr(importer, "create_job", self.create_job)
+        monkeypatch.setattr(importer, "add_job_recipients", self.add_job_recipients)
+        monkeypatch.setattr(importer, "set_job_status", self.set_job_status)
+        monkeypatch.setattr(importer, "insert_job_event", lambda job_id, ev, payload=None: self.events.append((ev, payload)))
+        monkeypatch.setattr(importer, "get_job", lambda job_id: self.jobs.get(job_id))
+        monkeypatch.setattr(importer, "list_job_recipient_statuses", lambda job_id: [
+            {"to_email": r["to_email"], "status": r["status"]} for r in self.recipients
+        ])
+
+    def create_job(self, mu, store, job_type, sender, template_id, subject, content, html, min_i, max_i, webhook, schedule_at, priority, pool, status="queued", source_file=None):
+        self.jobs["j1"] = {"id": "j1", "type": job_type, "status": status, "source_file": source_file}
+        self.status_log.append(status)
+        return "j1"
+
+    def add_job_recipients(self, job_id, batch):
+        # the runner must not see the job while rows are still being added
+        assert self.jobs[job_id]["status"] == "paused"
+        self.batches.append(len(batch))
+        self.recipients.extend(dict(r, status="pending") for r in batch)
+        return len(batch)
+
+    def set_job_status(self, job_id, status):
+        self.jobs[job_id]["status"] = status
+        self.status_log.append(status)
+
+
+def test_import_streams_filtered_rows_in_batches(tmp_path, monkeypatch):
+    db = _FakeDB()
+    db.install(monkeypatch)
+    path = _workbook(tmp_path)
+
+    result = importer.import_workbook_job(path, "mu", "s1", "sender@example.com", template_id=7, attachments=["tenant_mu_s1/attachments/a.pdf"], batch_size=2)
+
+    assert result == {"job_id": "j1", "recipients": 3, "status": "queued"}
+    assert db.status_log == ["paused", "queued"]
+    assert db.jobs["j1"]["type"] == "template"
+    assert db.jobs["j1"]["source_file"] == os.path.abspath(path)
+    # manual follow-up, already-contacted and duplicate rows are skipped
+    assert [r["to_email"] for r in db.recipients] == ["a@example.com", "b@example.com", "c@example.com"]
+    assert sum(db.batches) == 3 and max(db.batches) <= 2
+    first = db.recipients[0]
+    # stored as the file-template language code, like the send loop looks it up
+    assert first["language"] == "en"
+    assert first["variables"]["达人ID"] == "ca"
+    assert first["variables"]["粉丝数"] == 10
+    assert first["variables"]["__attachments__"] == ["tenant_mu_s1/attachments/a.pdf"]
+    assert "是否已邮箱建联" not in first["variables"]
+    assert db.recipients[1]["language"] == "en"
+    assert db.recipients[2]["language"] == "esp"
+    assert ("imported", {"source_file": db.jobs["j1"]["source_file"], "recipients": 3}) in db.events
+
+
+def test_csv_import_and_custom_job(tmp_path, monkeypatch):
+    db = _FakeDB()
+    db.install(monkeypatch)
+    path = _workbook(tmp_path, ".csv")
+
+    result = importer.import_workbook_job(path, "mu", "s1", "sender@example.com", subject="Hi [达人ID]", content="Hello")
+
+    assert result["recipients"] == 3
+    assert db.jobs["j1"]["type"] == "custom"
+
+
+def test_results_are_written_back_on_completion(tmp_path, monkeypatch):
+    db = _FakeDB()
+    db.install(monkeypatch)
+    path = _workbook(tmp_path)
+    importer.import_workbook_job(path, "mu", "s1", "sender@example.com")
+    db.recipients[0]["status"] = "success"
+    db.recipients[1]["status"] = "failed"
+
+    runner = job_runner.JobRunner.__new__(job_runner.JobRunner)
+    runner.logger = job_runner.logging.getLogger("test")
+    runner.excel_processor = ExcelProcessor()
+    monkeypatch.setattr(job_runner, "sync_job_to_workbook", importer.sync_job_to_workbook)
+    monkeypatch.setattr(job_runner, "get_job_status", lambda job_id: db.jobs[job_id]["status"])
+
+    # not completed yet: nothing is written
+    runner._sync_source_file("j1")
+    assert pd.read_excel(path)["是否已邮箱建联"].isna().sum() == 4
+
+    db.jobs["j1"]["status"] = "completed"
+    runner._sync_source_file("j1")
+    statuses = pd.read_excel(path)["是否已邮箱建联"].tolist()
+    # both rows of a@example.com are updated; c@example.com is still pending
+    assert statuses[0] == 1 and statuses[3] == 1
+    assert statuses[1] == -1
+    assert pd.isna(statuses[5])
+    assert db.events[-1][0] == "source_synced"
+
+
+def test_csv_sources_are_not_written_back(tmp_path, monkeypatch):
+    db = _FakeDB()
+    db.install(monkeypatch)
+    importer.import_workbook_job(_workbook(tmp_path, ".csv"), "mu", "s1", "sender@example.com")
+    db.recipients[0]["status"] = "success"
+
+    result = importer.sync_job_to_workbook("j1")
+    assert not result["success"]
+
+
+def test_missing_columns_reject_before_job_is_created(tmp_path, monkeypatch):
+    db = _FakeDB()
+    db.install(monkeypatch)
+    path = tmp_path / "wrong.csv"
+    pd.DataFrame({"邮箱": ["a@example.com"], "语言": ["English"]}).to_csv(path, index=False)
+
+    assert importer.missing_columns(str(path)) == ["合作次数", "回复次数", "跟进次数", "跟进方式", "是否已邮箱建联"]
+    with pytest.raises(ValueError):
+        importer.import_workbook_job(str(path), "mu", "s1", "sender@example.com")
+    assert db.jobs == {}
+
+
+def test_import_endpoint_validates_columns_and_template(tmp_path, monkeypatch):
+    from flask import Flask
+
+    import src.api_v2 as api_v2
+
+    db = _FakeDB()
+    db.install(monkeypatch)
+    _workbook(tmp_path)
+    pd.DataFrame({"邮箱": ["a@example.com"]}).to_csv(tmp_path / "wrong.csv", index=False)
+    monkeypatch.setattr(api_v2, "ensure_tenant_dirs", lambda root, mu, store: (str(tmp_path), str(tmp_path)))
+    monkeypatch.setattr(api_v2, "resolve_attachment_paths", lambda mu, store, attachments: [])
+
+    class _Store:
+        def get_db_template(self, mu, store, template_id):
+            return {"id": 7} if template_id == 7 else None
+    monkeypatch.setattr(api_v2, "get_template_store", lambda: _Store())
+    app = Flask(__name__)
+    app.register_blueprint(api_v2.bp)
+    client = app.test_client()
+    base = {"master_user_id": "mu", "store_id": "s1", "sender_email": "sender@example.com"}
+
+    resp = client.post("/api/jobs/import_workbook", json={**base, "file": "wrong.csv"})
+    assert resp.status_code == 400 and "跟进方式" in resp.get_json()["missing_columns"]
+    # optional pyarrow missing: a clear 400 instead of a ModuleNotFoundError 500
+    (tmp_path / "list.parquet").write_bytes(b"PAR1")
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    resp = client.post("/api/jobs/import_workbook", json={**base, "file": "list.parquet"})
+    assert resp.status_code == 400 and "pyarrow" in resp.get_json()["error"]
+    assert client.post("/api/jobs/import_workbook", json={**base, "file": "campaign.xlsx", "template_id": "x"}).status_code == 400
+    assert client.post("/api/jobs/import_workbook", json={**base, "file": "campaign.xlsx", "template_id": 8}).status_code == 404
+    assert db.jobs == {}
+
+    resp = client.post("/api/jobs/import_workbook", json={**base, "file": "campaign.xlsx", "template_id": "7"})
+    assert resp.status_code == 200 and resp.get_json()["recipients"] == 3
+
+
+def test_filter_failure_fails_the_import(tmp_path, monkeypatch):
+    db = _FakeDB()
+    db.install(monkeypatch)
+    processor = ExcelProcessor()
+    chunks = []
+
+    def select_sendable(df):
+        chunks.append(len(df))
+        if len(chunks) == 2:
+            raise TypeError("bad cell")
+        return ExcelProcessor.select_sendable(processor, df)
+    monkeypatch.setattr(processor, "select_sendable", select_sendable)
+
+    with pytest.raises(TypeError):
+        importer.import_workbook_job(_workbook(tmp_path), "mu", "s1", "sender@example.com", batch_size=2, excel_processor=processor)
+    assert db.status_log == ["paused", "error"]
@@ -0,0 +1,128 @@
+"""
+多租户公平调度测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.email_scheduler as email_scheduler
+import src.job_events as job_events
+import src.job_runner as job_runner
+from src.email_scheduler import EmailScheduler
+from src.fair_scheduler import FairScheduler, tenant_of
+from src.sender_ledger import SenderLedger
+
+
+def _job(job_id, tenant, total=10, priority=0, created="2026-10-18 10:00:00"):
+    return {
+        "id": job_id, "master_user_id": tenant, "store_id": "s", "type": "custom", "sender_email": "x@example.com",
+        "total": total, "priority": priority, "schedule_at": created, "created_at": created,
+    }
+
+
+def _drain(fair, jobs, n, blocked=(), weights=None):
+    picked = []
+    pending = list(jobs)
+    for _ in range(n):
+        job = fair.pick(pending, blocked, weights)
+        if job is None:
+            break
+        picked.append(job)
+        pending.remove(job)
+    return picked
+
+
+def test_large_backlog_does_not_starve_other_tenants():
+    jobs = [_job(f"a{i}", "A", created=f"2026-10-18 09:{i:02d}:00") for i in range(50)]
+    jobs += [_job("b0", "B", created="2026-10-18 11:00:00"), _job("c0", "C", created="2026-10-18 12:00:00")]
+    picked = [j["id"] for j in _drain(FairScheduler(quantum=10), jobs, 6)]
+    assert "b0" in picked[:3] and "c0" in picked[:3]
+
+
+def test_cost_is_shared_by_recipients_and_weights():
+    # A sends 10-recipient jobs, B 100-recipient jobs: per round both get the same recipient budget
+    jobs = [_job(f"a{i}", "A", total=10) for i in range(40)] + [_job(f"b{i}", "B", total=100) for i in range(4)]
+    picked = _drain(FairScheduler(quantum=100), jobs, 22)
+    by_tenant = {"A": 0, "B": 0}
+    for job in picked:
+        by_tenant[tenant_of(job)[0]] += job["total"]
+    assert abs(by_tenant["A"] - by_tenant["B"]) <= 100
+
+    picked = _drain(FairScheduler(quantum=10), [_job(f"a{i}", "A") for i in range(30)] + [_job(f"b{i}", "B") for i in range(30)],
+                    30, weights={("A", "s"): 2})
+    assert sum(1 for j in picked if j["master_user_id"] == "A") == 20
+
+
+def test_priority_within_tenant_and_blocked_tenants():
+    jobs = [_job("low", "A", priority=0, created="2026-10-18 09:00:00"), _job("high", "A", priority=5, created="2026-10-18 10:00:00")]
+    fair = FairScheduler()
+    assert fair.pick(jobs)["id"] == "high"
+    assert fair.pick(jobs + [_job("b0", "B")], blocked={("A", "s")})["id"] == "b0"
+    assert fair.pick(jobs, blocked={("A", "s")}) is None
+
+
+def test_runner_blocks_tenants_at_concurrency_or_quota(monkeypatch):
+    monkeypatch.setattr(job_runner, "get_gmail_auth_manager", lambda: None)
+    monkeypatch.setattr(job_runner, "get_excel_processor", lambda: None)
+    monkeypatch.setenv("TENANT_MAX_CONCURRENT_JOBS", "1")
+    monkeypatch.setenv("TENANT_LIMITS", '{"C:s": {"daily_quota": 100}}')
+    monkeypatch.setattr(job_runner, "list_due_queued_jobs", lambda per_tenant: [_job("a0", "A"), _job("b0", "B"), _job("c0", "C")])
+    monkeypatch.setattr(job_runner, "count_running_jobs_by_tenant", lambda: {("A", "s"): 1})
+    monkeypatch.setattr(job_runner, "list_tenant_usage_today", lambda: {("C", "s"): 100})
+
+    runner = job_runner.JobRunner(max_workers=2)
+    assert runner._next_job()["id"] == "b0"
+
+
+def test_job_deferred_when_daily_quota_used_up(monkeypatch):
+    usage = {"sent": 0}
+    deferred = []
+    statuses = []
+    monkeypatch.setenv("TENANT_DAILY_QUOTA", "2")
+    monkeypatch.setattr(email_scheduler, "set_job_status", lambda job_id, st: statuses.append(st))
+    monkeypatch.setattr(job_events, "insert_job_event", lambda job_id, ev, payload=None: None)
+    monkeypatch.setattr(email_scheduler, "get_job", lambda job_id: {"total": 3})
+    monkeypatch.setattr(email_scheduler, "get_job_status", lambda job_id: "running")
+    monkeypatch.setattr(email_scheduler, "list_job_recipients", lambda job_id, status=None: [
+        {"id": n, "to_email": f"r{n}@x.com", "language": "English", "variables": {}, "attempts": 0} for n in (1, 2, 3)
+    ])
+    monkeypatch.setattr(email_scheduler, "claim_recipient", lambda rid, lease, sender=None: True)
+    monkeypatch.setattr(email_scheduler, "finish_recipient", lambda *a, **k: True)
+    monkeypatch.setattr(email_scheduler, "get_tenant_usage_today", lambda mu, store: usage["sent"])
+    monkeypatch.setattr(email_scheduler, "add_tenant_usage", lambda mu, store, n=1: usage.__setitem__("sent", usage["sent"] + n))
+    monkeypatch.setattr(email_scheduler, "defer_job", lambda job_id, until: deferred.append(until) or True)
+
+    class _Gmail:
+        def users(self):
+            return self
+
+        def messages(self):
+            return self
+
+        def send(self, userId, body):
+            return self
+
+        def execute(self):
+            return {"id": "m"}
+
+    class _Auth:
+        def get_gmail_service(self, *args):
+            return _Gmail()
+
+    scheduler = EmailScheduler(_Auth(), None)
+    scheduler.sender_ledger = SenderLedger(persist=False)
+    reservations = []
+    acquire = scheduler.sender_ledger.acquire
+    monkeypatch.setattr(scheduler.sender_ledger, "acquire", lambda sender, gap: reservations.append(sender) or acquire(sender, gap))
+    result = scheduler.send_job_emails_from_db(
+        sender_email="s@example.com", master_user_id="1", store_id="2", job_id="j",
+        job_type="custom", subject="Hi", content="Hello", min_interval=0, max_interval=0,
+    )
+    assert result["stats"]["success_count"] == 2
+    assert len(deferred) == 1 and deferred[0].endswith("00:00:00.000000")
+    assert "completed" not in statuses
+    # the deferred third recipient never reserved a sender slot
+    assert reservations == ["s@example.com", "s@example.com"]
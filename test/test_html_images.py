@@ -0,0 +1,30 @@
+"""
+HTML图片标签改写测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.html_images import extract_img_ids, rewrite_img_ids
+
+
+def test_extract_ids_in_order():
+    html = '<img id="a"><IMG src="x.png" ID=\'b\' /><img alt="no id"><img id="a">'
+    assert extract_img_ids(html) == ["a", "b", "a"]
+
+
+def test_rewrite_drops_id_and_src():
+    html = '<p><img alt="a>b" id="logo" src="old.png" width=10></p>'
+    out, ids = rewrite_img_ids(html)
+    assert ids == ["logo"]
+    assert out == '<p><img alt="a>b" width=10 src="cid:image_logo"></p>'
+
+
+def test_rewrite_filter_and_keep_id():
+    html = '<img id="ok"/><img id="missing"/>'
+    out, ids = rewrite_img_ids(html, should_rewrite=lambda i: i == "ok", keep_id=True)
+    assert ids == ["ok"]
+    assert out == '<img id="ok" src="cid:image_ok" /><img id="missing"/>'
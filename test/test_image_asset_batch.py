@@ -0,0 +1,66 @@
+"""
+内联图片素材批量解析测试
+验证同一任务内图片ID只批量查库一次，发送时只把能解析到素材的图片改写为CID引用
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.email_scheduler as email_scheduler
+from src.email_scheduler import EmailScheduler
+from src.template_compiler import compile_html_template
+
+
+def test_inline_images_resolved_once_per_job(monkeypatch):
+    calls = []
+
+    def fake_get_assets(master_user_id, store_id, asset_type, file_ids):
+        calls.append(list(file_ids))
+        return {
+            "logo": {"file_id": "logo", "storage_path": "/tmp/logo.png", "filename": "logo.png"},
+        }
+
+    monkeypatch.setattr(email_scheduler, "get_assets_by_file_ids", fake_get_assets)
+
+    scheduler = EmailScheduler(None, None)
+    cache = {}
+    html = '<p>Hi</p><img id="logo"/><img id="banner"/><img id="logo"/>'
+    compiled = compile_html_template(html)
+
+    assert compiled["html"] == html
+    assert compiled["images"] == ["logo", "banner"]
+
+    for _ in range(5):
+        images = scheduler._images_to_embed(compiled["images"], "1", "2", cache)
+        assert [img["cid"] for img in images] == ["image_logo"]
+
+    # 一次批量查询覆盖全部ID，未找到的banner也被缓存
+    assert calls == [["logo", "banner"]]
+
+
+def test_unresolved_image_ids_keep_their_src(monkeypatch):
+    calls = []
+
+    def fake_get_assets(master_user_id, store_id, asset_type, file_ids):
+        calls.append(list(file_ids))
+        return {"logo": {"file_id": "logo", "storage_path": "/tmp/logo.png", "filename": "logo.png"}}
+
+    monkeypatch.setattr(email_scheduler, "get_assets_by_file_ids", fake_get_assets)
+    scheduler = EmailScheduler(None, None)
+    tpl = compile_html_template('<img id="hero" src="https://cdn.example.com/hero.png"><img id="logo" src="x.png">')
+    asset_cache, html_cache = {}, {}
+
+    for _ in range(3):
+        html, images = scheduler._inline_images(tpl, "1", "2", asset_cache, html_cache)
+        assert html == '<img id="hero" src="https://cdn.example.com/hero.png"><img src="cid:image_logo">'
+        assert [img["cid"] for img in images] == ["image_logo"]
+    assert calls == [["hero", "logo"]]
+    assert len(html_cache) == 1
+
+    # no assets at all: the template html is used untouched
+    monkeypatch.setattr(email_scheduler, "get_assets_by_file_ids", lambda *a: {})
+    html, images = scheduler._inline_images(tpl, "1", "3", {}, {})
+    assert html == tpl["html"] and images == []
@@ -0,0 +1,51 @@
+"""
+API启动耗时测试
+用 python -X importtime 在干净子进程中导入 src.api_server：不得加载 pandas/openpyxl/bs4/google 等重量级依赖，
+总导入耗时需在预算内，且没有 credentials.json 时 /api/health 也能立即响应
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import os
+import subprocess
+
+# src.api_server 的累计导入耗时上限（微秒）
+IMPORT_BUDGET_US = int(os.getenv("API_IMPORT_BUDGET_US", "1000000"))
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "bs4", "googleapiclient", "google.auth", "google_auth_oauthlib")
+
+_SCRIPT = """
+import sys
+import src.api_server as server
+resp = server.app.test_client().get("/api/health")
+print("HEALTH", resp.status_code)
+print("HEAVY", ",".join(m for m in %r if m in sys.modules))
+""" % (HEAVY_MODULES,)
+
+
+def _cumulative_us(stderr: str, module: str) -> int:
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+
+def test_api_server_cold_import_is_light(tmp_path):
+    env = dict(os.environ, PYTHONPATH=str(project_root), JOB_RUNNER_ENABLED="false")
+    # 临时目录中没有 credentials.json
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _SCRIPT],
+        cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+
+    out = dict(line.split(" ", 1) for line in proc.stdout.splitlines() if " " in line)
+    assert out["HEALTH"] == "200"
+    assert out.get("HEAVY", "").strip() == ""
+
+    elapsed = _cumulative_us(proc.stderr, "src.api_server")
+    assert elapsed < IMPORT_BUDGET_US, f"src.api_server import took {elapsed}us (budget {IMPORT_BUDGET_US}us)"
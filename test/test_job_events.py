@@ -0,0 +1,49 @@
+"""
+任务事件粒度测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.job_events as job_events
+from src.job_events import JobEventRecorder
+
+
+def _capture(monkeypatch):
+    rows = []
+    monkeypatch.setattr(job_events, "insert_job_event", lambda job_id, et, payload=None: rows.append((et, payload)))
+    monkeypatch.setattr(job_events, "insert_job_events", lambda job_id, events: rows.extend(events))
+    return rows
+
+
+def test_sampled_keeps_failures_and_every_nth_success(monkeypatch):
+    rows = _capture(monkeypatch)
+    rec = JobEventRecorder("j", granularity="sampled", sample_every=10)
+    for n in range(25):
+        rec.record("recipient_success", {"email": f"{n}@x.com"})
+    rec.record("recipient_failed", {"email": "bad@x.com", "error": "boom"})
+    rec.record("completed", {"success": 25})
+
+    types = [et for et, _ in rows]
+    assert types.count("recipient_success") == 3
+    assert types.count("recipient_failed") == 1
+    assert types[-1] == "completed"
+
+
+def test_aggregated_writes_one_summary_per_bucket(monkeypatch):
+    rows = _capture(monkeypatch)
+    rec = JobEventRecorder("j", granularity="aggregated", bucket_sec=3600)
+    for n in range(100):
+        rec.record("recipient_success", {"email": f"{n}@x.com"})
+    rec.record("recipient_failed", {"email": "bad@x.com", "error": "boom"})
+    assert rows == []
+    rec.flush()
+
+    assert len(rows) == 1
+    event_type, summary = rows[0]
+    assert event_type == "recipient_summary"
+    assert summary["counts"] == {"recipient_success": 100, "recipient_failed": 1}
+    assert summary["failure_samples"][0]["email"] == "bad@x.com"
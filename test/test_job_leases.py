@@ -0,0 +1,100 @@
+"""
+任务租约/心跳与重启续跑测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.email_scheduler as email_scheduler
+import src.job_events as job_events
+import src.job_runner as job_runner
+from src.email_scheduler import EmailScheduler
+from src.sender_ledger import SenderLedger
+
+
+def _runner(monkeypatch):
+    monkeypatch.setattr(job_runner, "get_gmail_auth_manager", lambda: None)
+    monkeypatch.setattr(job_runner, "get_excel_processor", lambda: None)
+    return job_runner.JobRunner(max_workers=1)
+
+
+def test_expired_jobs_are_requeued_before_recipient_recovery(monkeypatch):
+    calls = []
+    monkeypatch.setattr(job_runner, "requeue_expired_jobs", lambda: calls.append("reap") or [{"id": "j1", "locked_by": "old:1"}])
+    monkeypatch.setattr(job_runner, "reconcile_sending_recipients", lambda mgr: calls.append("reconcile"))
+    monkeypatch.setattr(job_runner, "insert_job_event", lambda job_id, ev, payload=None: calls.append((job_id, ev, payload["reason"])))
+
+    _runner(monkeypatch)._recover_inflight()
+    assert calls == ["reap", ("j1", "requeued", "lease_expired"), "reconcile"]
+
+
+def test_heartbeat_stops_jobs_whose_lease_was_lost(monkeypatch):
+    runner = _runner(monkeypatch)
+    stopped = []
+
+    class _Scheduler:
+        def __init__(self, job_id):
+            self.job_id = job_id
+
+        def stop(self):
+            stopped.append(self.job_id)
+
+    for job_id in ("kept", "lost"):
+        runner._active[job_id] = ("m", "s")
+        runner._schedulers[job_id] = _Scheduler(job_id)
+    renewed = []
+    monkeypatch.setattr(job_runner, "renew_job_lease", lambda job_id, worker, lease: renewed.append((job_id, worker)) or job_id == "kept")
+
+    runner._renew_leases()
+    assert sorted(j for j, _ in renewed) == ["kept", "lost"]
+    assert all(worker == runner.worker_id for _, worker in renewed)
+    assert stopped == ["lost"]
+
+
+def test_resumed_job_picks_up_recipients_released_during_the_run(monkeypatch):
+    sent = []
+    statuses = []
+    pending_batches = [
+        [{"id": 1, "to_email": "a@x.com", "language": "English", "variables": {}, "attempts": 0}],
+        # released back to pending by the recovery sweep while the job was running
+        [{"id": 1, "to_email": "a@x.com", "language": "English", "variables": {}, "attempts": 0},
+         {"id": 2, "to_email": "b@x.com", "language": "English", "variables": {}, "attempts": 1}],
+        [],
+    ]
+    monkeypatch.setattr(email_scheduler, "set_job_status", lambda job_id, st: statuses.append(st))
+    monkeypatch.setattr(job_events, "insert_job_event", lambda job_id, ev, payload=None: None)
+    monkeypatch.setattr(email_scheduler, "get_job", lambda job_id: {"total": 3, "success_count": 1})
+    monkeypatch.setattr(email_scheduler, "get_job_status", lambda job_id: "running")
+    monkeypatch.setattr(email_scheduler, "list_job_recipients", lambda job_id, status=None: pending_batches.pop(0))
+    monkeypatch.setattr(email_scheduler, "claim_recipient", lambda rid, lease, sender=None: sent.append(rid) or True)
+    monkeypatch.setattr(email_scheduler, "finish_recipient", lambda *a, **k: True)
+
+    class _Gmail:
+        def users(self):
+            return self
+
+        def messages(self):
+            return self
+
+        def send(self, userId, body):
+            return self
+
+        def execute(self):
+            return {"id": "m"}
+
+    class _Auth:
+        def get_gmail_service(self, *args):
+            return _Gmail()
+
+    scheduler = EmailScheduler(_Auth(), None)
+    scheduler.sender_ledger = SenderLedger(persist=False)
+    result = scheduler.send_job_emails_from_db(
+        sender_email="s@example.com", master_user_id="1", store_id="2", job_id="j",
+        job_type="custom", subject="Hi", content="Hello", min_interval=0, max_interval=0,
+    )
+    assert sent == [1, 2]
+    assert result["stats"]["success_count"] == 2 and result["stats"]["total_emails"] == 2
+    assert statuses[-1] == "completed"
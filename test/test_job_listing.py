@@ -0,0 +1,67 @@
+"""
+任务列表接口（游标分页）测试
+"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import Flask
+
+import src.api_v2 as api_v2
+
+
+def _client(monkeypatch, rows):
+    calls = []
+
+    def fake_list_jobs(master_user_id, store_id, status=None, since=None, before=None, limit=50):
+        calls.append({"status": status, "since": since, "before": before})
+        out = sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        if status:
+            out = [r for r in out if r["status"] == status]
+        if before:
+            out = [r for r in out if (r["created_at"].strftime("%Y-%m-%d %H:%M:%S.%f"), r["id"]) < before]
+        return [dict(r) for r in out[:limit]]
+
+    monkeypatch.setattr(api_v2, "list_jobs", fake_list_jobs)
+    app = Flask(__name__)
+    app.register_blueprint(api_v2.bp)
+    return app.test_client(), calls
+
+
+def _rows(n):
+    base = datetime(2026, 10, 18, 10, 0, 0)
+    # two jobs share each timestamp so the id tie-breaker matters
+    return [
+        {"id": f"job-{i:02d}", "status": "completed" if i % 3 else "running", "created_at": base + timedelta(seconds=i // 2)}
+        for i in range(n)
+    ]
+
+
+def test_keyset_pages_cover_every_job_once(monkeypatch):
+    rows = _rows(7)
+    client, calls = _client(monkeypatch, rows)
+    seen, cursor = [], None
+    while True:
+        url = "/api/jobs?master_user_id=m&store_id=s&limit=3" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        seen.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [r["id"] for r in sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)]
+    assert len(calls) == 3 and calls[1]["before"] is not None
+
+
+def test_filters_and_validation(monkeypatch):
+    client, calls = _client(monkeypatch, _rows(6))
+    body = client.get("/api/jobs?master_user_id=m&store_id=s&status=running&since=2026-10-18T10:00:00Z").get_json()
+    assert [item["id"] for item in body["items"]] == ["job-03", "job-00"]
+    assert calls[-1]["since"] == "2026-10-18 10:00:00.000000"
+
+    assert client.get("/api/jobs?master_user_id=m").status_code == 400
+    assert client.get("/api/jobs?master_user_id=m&store_id=s&status=bogus").status_code == 400
+    assert client.get("/api/jobs?master_user_id=m&store_id=s&cursor=%%%").status_code == 400
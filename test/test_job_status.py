@@ -0,0 +1,64 @@
+"""
+任务轻量状态接口测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import Flask
+
+import src.api_v2 as api_v2
+
+
+def _client(monkeypatch, counters, breakdown=None):
+    calls = {"breakdown": 0}
+
+    def fake_breakdown(job_id):
+        calls["breakdown"] += 1
+        return dict(breakdown or {})
+
+    monkeypatch.setattr(api_v2, "get_job_counters", lambda job_id: dict(counters) if job_id == "j" else None)
+    monkeypatch.setattr(api_v2, "count_job_recipients_by_status", fake_breakdown)
+    monkeypatch.setattr(api_v2, "list_job_recipients", lambda job_id: (_ for _ in ()).throw(AssertionError("loaded recipients")))
+    app = Flask(__name__)
+    app.register_blueprint(api_v2.bp)
+    return app.test_client(), calls
+
+
+def _counters(success=1):
+    return {
+        "id": "j", "status": "running", "total": 3, "success_count": success, "failure_count": 0,
+        "created_at": "2026-10-18 10:00:00", "started_at": "2026-10-18 10:00:01", "completed_at": None,
+    }
+
+
+def test_status_from_counters_with_etag(monkeypatch):
+    client, calls = _client(monkeypatch, _counters())
+    resp = client.get("/api/jobs/j/status")
+    assert resp.status_code == 200
+    status = resp.get_json()["status"]
+    assert status["total"] == 3 and status["success"] == 1 and status["failed"] == 0
+    assert "recipients_by_status" not in status and calls["breakdown"] == 0
+
+    etag = resp.headers["ETag"]
+    assert client.get("/api/jobs/j/status", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_status_etag_changes_with_progress(monkeypatch):
+    client, _ = _client(monkeypatch, _counters(success=1))
+    etag = client.get("/api/jobs/j/status").headers["ETag"]
+    client, _ = _client(monkeypatch, _counters(success=2))
+    resp = client.get("/api/jobs/j/status", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.get_json()["status"]["success"] == 2
+
+
+def test_status_breakdown_and_404(monkeypatch):
+    client, calls = _client(monkeypatch, _counters(), breakdown={"success": 1, "pending": 2})
+    status = client.get("/api/jobs/j/status?breakdown=true").get_json()["status"]
+    assert status["recipients_by_status"] == {"success": 1, "pending": 2}
+    assert calls["breakdown"] == 1
+    assert client.get("/api/jobs/missing/status").status_code == 404
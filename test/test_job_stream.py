@@ -0,0 +1,102 @@
+"""
+任务进度SSE推送测试
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import Flask
+
+import src.api_v2 as api_v2
+from src.event_bus import JobEventBus
+
+
+def _client(monkeypatch, bus, status="running"):
+    counters = {"id": "j", "status": status, "total": 3, "success_count": 0, "failure_count": 0}
+    monkeypatch.setattr(api_v2, "get_job_counters", lambda job_id: dict(counters) if job_id == "j" else None)
+    monkeypatch.setattr(api_v2, "get_event_bus", lambda: bus)
+    app = Flask(__name__)
+    app.register_blueprint(api_v2.bp)
+    return app.test_client()
+
+
+def test_stream_pushes_bus_events_until_completed(monkeypatch):
+    bus = JobEventBus()
+    client = _client(monkeypatch, bus)
+
+    def producer():
+        time.sleep(0.2)
+        bus.publish("j", "recipient_success", {"email": "a@x.com", "progress": {"success": 1}})
+        bus.publish("j", "completed", {"progress": {"success": 1}})
+
+    threading.Thread(target=producer).start()
+    body = client.get("/api/jobs/j/stream?timeout=5").get_data(as_text=True)
+
+    assert "event: progress" in body
+    assert "id: 1\nevent: recipient_success" in body
+    assert "id: 2\nevent: completed" in body
+    assert body.rstrip().split("\n")[-2] == "event: end"
+
+
+def test_stream_resumes_after_last_event_id(monkeypatch):
+    bus = JobEventBus()
+    for n in range(3):
+        bus.publish("j", "recipient_success", {"n": n})
+    bus.publish("j", "completed", {})
+    client = _client(monkeypatch, bus)
+
+    body = client.get("/api/jobs/j/stream?timeout=5", headers={"Last-Event-ID": "2"}).get_data(as_text=True)
+    assert "id: 1\n" not in body and "id: 2\n" not in body
+    assert "id: 3\nevent: recipient_success" in body
+    assert "id: 4\nevent: completed" in body
+
+
+def test_stream_unknown_job_is_404(monkeypatch):
+    client = _client(monkeypatch, JobEventBus())
+    assert client.get("/api/jobs/nope/stream").status_code == 404
+
+
+def test_stream_resumed_at_terminal_event_ends(monkeypatch):
+    bus = JobEventBus()
+    bus.publish("j", "recipient_success", {"n": 0})
+    bus.publish("j", "completed", {})
+
+    for status in ("completed", "running"):
+        client = _client(monkeypatch, bus, status=status)
+        started = time.monotonic()
+        body = client.get("/api/jobs/j/stream?timeout=5", headers={"Last-Event-ID": "2"}).get_data(as_text=True)
+        assert time.monotonic() - started < 1
+        assert "id: " not in body
+        assert body.rstrip().split("\n")[-2] == "event: end"
+
+
+def test_stream_invalid_timeout_is_400(monkeypatch):
+    client = _client(monkeypatch, JobEventBus())
+    assert client.get("/api/jobs/j/stream?timeout=abc").status_code == 400
+
+
+def test_stream_of_resumed_job_stays_open(monkeypatch):
+    bus = JobEventBus()
+    bus.publish("j", "started", {})
+    bus.publish("j", "stopped", {})
+    # requeued and picked up again in the same process
+    bus.publish("j", "started", {"resumed": True})
+    assert not bus.is_finished("j", 3)
+    client = _client(monkeypatch, bus)
+
+    def producer():
+        time.sleep(0.3)
+        bus.publish("j", "recipient_success", {"email": "a@x.com"})
+        bus.publish("j", "completed", {})
+
+    threading.Thread(target=producer).start()
+    body = client.get("/api/jobs/j/stream?timeout=5", headers={"Last-Event-ID": "3"}).get_data(as_text=True)
+
+    assert "id: 4\nevent: recipient_success" in body
+    assert "id: 5\nevent: completed" in body
+    assert bus.is_finished("j", 5)
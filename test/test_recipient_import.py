@@ -0,0 +1,85 @@
+"""
+列式导入测试
+验证只读取需要的列、紧凑类型、CSV/Excel 分块读取，以及过滤结果与默认读取一致
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+import pytest
+
+from src.excel_processor import ExcelProcessor
+from src.recipient_import import iter_recipient_chunks, read_header, read_recipients, template_columns
+from src.template_manager import TemplateManager
+
+
+def _frame(n=7):
+    return pd.DataFrame({
+        "邮箱": [f"u{i}@example.com" for i in range(n - 1)] + [None],
+        "合作次数": [0, 0, 1, 0, 0, 0, 0][:n],
+        "回复次数": [0] * n,
+        "跟进次数": [1, 1, 1, 2, 1, 1, 1][:n],
+        "跟进方式": ["自动", "手动", "自动", "自动", "自动", "自动", "自动"][:n],
+        "是否已邮箱建联": [None, None, None, None, 1, 0, None][:n],
+        "语言": ["English", "Spanish", None, "English", "English", None, "English"][:n],
+        "达人ID": [f"c{i}" for i in range(n)],
+        "备注": ["unused"] * n,
+    })
+
+
+def test_reads_only_requested_columns_with_compact_dtypes(tmp_path):
+    path = tmp_path / "contacts.csv"
+    _frame().to_csv(path, index=False)
+
+    df = read_recipients(str(path), {"邮箱", "合作次数", "语言", "达人ID", "不存在的列"})
+
+    assert set(df.columns) == {"邮箱", "合作次数", "语言", "达人ID"}
+    assert str(df["合作次数"].dtype) == "float32"
+    assert str(df["语言"].dtype) == "category"
+    assert "English" in df["语言"].cat.categories
+
+
+def test_excel_streaming_chunks(tmp_path):
+    path = tmp_path / "contacts.xlsx"
+    _frame().to_excel(path, index=False)
+
+    chunks = list(iter_recipient_chunks(str(path), {"邮箱", "达人ID"}, chunksize=3))
+
+    assert [len(c) for c in chunks] == [3, 3, 1]
+    assert pd.concat(chunks)["达人ID"].tolist() == [f"c{i}" for i in range(7)]
+
+
+def test_columnar_filtering_matches_default_reader(tmp_path):
+    path = tmp_path / "contacts.xlsx"
+    _frame().to_excel(path, index=False)
+    processor = ExcelProcessor()
+
+    default = processor.get_filtered_data_with_language(str(path))
+    columnar = processor.get_filtered_data_with_language(str(path), columnar=True)
+
+    assert columnar["邮箱"].tolist() == default["邮箱"].tolist() == ["u0@example.com", "u5@example.com"]
+    assert columnar["语言"].astype(str).tolist() == default["语言"].tolist() == ["English", "English"]
+    assert "备注" not in columnar.columns
+
+
+def test_template_columns_come_from_templates(tmp_path):
+    (tmp_path / "en-subject").write_text("Hi [达人ID]", encoding="utf-8")
+    (tmp_path / "en-html_content").write_text("<p>[钩子] / [达人ID]</p>", encoding="utf-8")
+    manager = TemplateManager(str(tmp_path))
+
+    assert template_columns(manager, ["English"]) == {"达人ID", "钩子"}
+
+
+def test_parquet_without_pyarrow_is_a_clear_error(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    path = tmp_path / "recipients.parquet"
+    path.write_bytes(b"PAR1")
+    with pytest.raises(ValueError, match="pyarrow"):
+        read_header(str(path))
+    with pytest.raises(ValueError, match="pyarrow"):
+        list(iter_recipient_chunks(str(path)))
@@ -0,0 +1,181 @@
+"""
+发送重试测试
+验证错误分类、退避策略，以及临时失败的收件人在同一任务内被重试
+"""
+import base64
+import json
+import socket
+import sys
+from email import message_from_bytes
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import src.email_scheduler as email_scheduler
+import src.job_events as job_events
+from src.email_scheduler import EmailScheduler
+from src.send_retry import RetryPolicy, classify_send_error, is_quota_exhausted
+from src.sender_ledger import SenderLedger
+
+
+def _http_error(status, reason=None):
+    body = {"error": {"code": status, "errors": [{"reason": reason}] if reason else []}}
+    return HttpError(httplib2.Response({"status": status}), json.dumps(body).encode("utf-8"))
+
+
+def test_classify_send_error():
+    assert classify_send_error(_http_error(503))[0] is True
+    assert classify_send_error(_http_error(429))[0] is True
+    assert classify_send_error(_http_error(403, "userRateLimitExceeded"))[0] is True
+    assert classify_send_error(_http_error(403, "forbidden"))[0] is False
+    assert classify_send_error(_http_error(400, "invalidArgument"))[0] is False
+    assert classify_send_error(socket.timeout("timed out"))[0] is True
+    assert classify_send_error(ValueError("bad address"))[0] is False
+
+
+def test_backoff_grows_and_caps():
+    policy = RetryPolicy(max_attempts=3, base_delay=10, max_delay=25, jitter=0)
+    assert [policy.delay_for(n) for n in (1, 2, 3)] == [10, 20, 25]
+    assert policy.should_retry(2) and not policy.should_retry(3)
+
+
+class _FakeGmail:
+    def __init__(self, failures, delivered=False):
+        self.failures = failures
+        # a failed send that still reached the mailbox (found by Message-ID lookup)
+        self.delivered = delivered
+        self.sent = []
+        self.lookups = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        self._call = ("send", body)
+        return self
+
+    def list(self, userId, q, **kwargs):
+        self._call = ("list", q)
+        self.lookups.append(q)
+        return self
+
+    def execute(self):
+        kind, arg = self._call
+        if kind == "list":
+            return {"messages": [{"id": "m-found"}]} if self.delivered else {}
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(arg)
+        return {"id": f"m{len(self.sent)}"}
+
+
+class _FakeAuth:
+    def __init__(self, service):
+        self.service = service
+
+    def get_gmail_service(self, email, *args):
+        return self.service[email] if isinstance(self.service, dict) else self.service
+
+
+def _patch_job(monkeypatch, statuses, events, job=None, claims=None, deferred=None):
+    recipients = [
+        {"id": 1, "to_email": "a@x.com", "language": "English", "variables": {}, "attempts": 0},
+        {"id": 2, "to_email": "b@x.com", "language": "English", "variables": {}, "attempts": 0},
+    ]
+    monkeypatch.setattr(email_scheduler, "set_job_status", lambda job_id, st: statuses.setdefault("job", []).append(st))
+    monkeypatch.setattr(email_scheduler, "insert_job_event", lambda job_id, ev, payload=None: events.append(ev))
+    monkeypatch.setattr(job_events, "insert_job_event", lambda job_id, ev, payload=None: events.append(ev))
+    monkeypatch.setattr(email_scheduler, "get_job", lambda job_id: dict(job or {}))
+    monkeypatch.setattr(email_scheduler, "get_job_status", lambda job_id: "running")
+    monkeypatch.setattr(email_scheduler, "list_job_recipients", lambda job_id, status=None: [dict(r) for r in recipients])
+    monkeypatch.setattr(
+        email_scheduler, "claim_recipient",
+        lambda rid, lease, sender=None: (claims.append((rid, sender)) if claims is not None else None) or True,
+    )
+    monkeypatch.setattr(email_scheduler, "requeue_recipient", lambda rid, err=None: statuses.setdefault(rid, []).append("pending"))
+    monkeypatch.setattr(email_scheduler, "finish_recipient", lambda job_id, rid, st, err=None, pid=None: statuses.setdefault(rid, []).append(st) or True)
+    monkeypatch.setattr(email_scheduler, "defer_job", lambda job_id, until: (deferred.append(until) if deferred is not None else None) or True)
+
+
+def _run(gmail, sender_email="s@example.com"):
+    scheduler = EmailScheduler(_FakeAuth(gmail), None)
+    scheduler.retry_policy = RetryPolicy(base_delay=0, jitter=0)
+    scheduler.sender_ledger = SenderLedger(persist=False)
+    return scheduler.send_job_emails_from_db(
+        sender_email=sender_email, master_user_id="1", store_id="2", job_id="j",
+        job_type="custom", subject="Hi", content="Hello", min_interval=0, max_interval=0,
+    )
+
+
+def test_transient_failure_is_retried_within_job(monkeypatch):
+    statuses, events = {}, []
+    _patch_job(monkeypatch, statuses, events)
+
+    gmail = _FakeGmail([_http_error(503)])
+    result = _run(gmail)
+
+    assert result["stats"]["success_count"] == 2
+    assert result["stats"]["failure_count"] == 0
+    assert statuses[1] == ["pending", "success"]
+    assert statuses[2] == ["success"]
+    # the mailbox was checked before sending again
+    assert len(gmail.lookups) == 1
+    assert events.count("recipient_retry") == 1
+    assert statuses["job"][-1] == "completed"
+
+
+def test_failed_send_found_in_mailbox_is_not_resent(monkeypatch):
+    statuses, events = {}, []
+    _patch_job(monkeypatch, statuses, events)
+
+    gmail = _FakeGmail([_http_error(503)], delivered=True)
+    result = _run(gmail)
+
+    assert result["stats"]["success_count"] == 2
+    assert statuses[1] == ["success"]
+    assert len(gmail.sent) == 1
+    assert "recipient_retry" not in events
+
+
+def test_retry_stays_on_the_first_sender(monkeypatch):
+    statuses, events, claims = {}, [], []
+    _patch_job(monkeypatch, statuses, events, job={"sender_pool": '["p@x.com", "q@x.com"]'}, claims=claims)
+
+    services = {"p@x.com": _FakeGmail([_http_error(503)]), "q@x.com": _FakeGmail([])}
+    result = _run(services, sender_email="p@x.com")
+
+    assert result["stats"]["success_count"] == 2
+    first = [sender for rid, sender in claims if rid == 1]
+    assert first == ["p@x.com", "p@x.com"]
+    # the resend carries the Message-ID that was looked up after the failure
+    sent_ids = [
+        message_from_bytes(base64.urlsafe_b64decode(body["raw"]))["Message-ID"].strip("<>")
+        for body in services["p@x.com"].sent
+    ]
+    assert services["p@x.com"].lookups == [f"rfc822msgid:{sent_ids[0]}"]
+
+
+def test_quota_exhausted_defers_instead_of_retrying(monkeypatch):
+    statuses, events, deferred = {}, [], []
+    _patch_job(monkeypatch, statuses, events, deferred=deferred)
+
+    assert is_quota_exhausted(_http_error(403, "quotaExceeded"))
+    assert classify_send_error(_http_error(403, "quotaExceeded"))[0] is False
+    assert not is_quota_exhausted(_http_error(403, "userRateLimitExceeded"))
+
+    gmail = _FakeGmail([_http_error(403, "quotaExceeded")])
+    result = _run(gmail)
+
+    assert result["stats"]["success_count"] == 0 and result["stats"]["failure_count"] == 0
+    assert statuses[1] == ["pending"] and 2 not in statuses
+    assert len(deferred) == 1
+    assert "recipient_retry" not in events and "deferred" in events
+    assert "completed" not in statuses.get("job", [])
@@ -0,0 +1,109 @@
+"""
+发件人发送账本测试
+验证同一发件人的任务共享发送节奏、每日上限，以及达到上限时任务被推迟而非失败
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.email_scheduler as email_scheduler
+import src.job_events as job_events
+import src.sender_ledger as sender_ledger
+from src.email_scheduler import EmailScheduler
+from src.sender_ledger import SenderLedger
+
+
+def test_jobs_on_same_sender_share_one_pace(monkeypatch):
+    monkeypatch.setattr(sender_ledger.time, "time", lambda: 1000.0)
+    ledger = SenderLedger(persist=False)
+    # job A reserves with a 30s gap, job B with 60s, job A again: sends are spaced like a single job
+    assert ledger.acquire("s@example.com", 30) == (True, 0.0)
+    assert ledger.acquire("s@example.com", 60) == (True, 30.0)
+    assert ledger.acquire("s@example.com", 30) == (True, 90.0)
+    # other senders are independent
+    assert ledger.acquire("other@example.com", 30) == (True, 0.0)
+
+
+def test_daily_cap_and_overrides(monkeypatch):
+    monkeypatch.setenv("SENDER_DAILY_CAP", "2")
+    monkeypatch.setenv("SENDER_DAILY_CAPS", '{"Big@Example.com": 3}')
+    ledger = SenderLedger(persist=False)
+    for _ in range(2):
+        assert ledger.acquire("s@example.com", 0)[0]
+        ledger.record_send("s@example.com")
+    assert ledger.acquire("s@example.com", 0) == (False, 0.0)
+    for _ in range(2):
+        ledger.record_send("big@example.com")
+    assert ledger.acquire("big@example.com", 0)[0]
+
+
+def test_in_flight_reservations_count_toward_cap(monkeypatch):
+    monkeypatch.setenv("SENDER_DAILY_CAP", "2")
+    ledger = SenderLedger(persist=False)
+    # two jobs reserve before either send has been recorded: a third reservation would overshoot
+    assert ledger.acquire("s@example.com", 0)[0]
+    assert ledger.acquire("s@example.com", 0)[0]
+    assert ledger.acquire("s@example.com", 0) == (False, 0.0)
+    # a failed send gives its slot back; a recorded one keeps counting
+    ledger.release("s@example.com")
+    ledger.record_send("s@example.com")
+    assert ledger.acquire("s@example.com", 0)[0]
+    assert ledger.acquire("s@example.com", 0) == (False, 0.0)
+
+
+def test_falls_back_to_memory_without_db(monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("DATABASE_URL not configured")
+
+    monkeypatch.setattr(sender_ledger, "reserve_sender_slot", unavailable)
+    monkeypatch.setattr(sender_ledger, "record_sender_send", unavailable)
+    ledger = SenderLedger()
+    assert ledger.acquire("s@example.com", 10)[0]
+    assert ledger.record_send("s@example.com") == 1
+    assert ledger.sent_today("s@example.com") == 1
+
+
+def test_job_deferred_when_sender_cap_reached(monkeypatch):
+    events, deferred, statuses = [], [], []
+    monkeypatch.setenv("SENDER_DAILY_CAP", "1")
+    monkeypatch.setattr(email_scheduler, "set_job_status", lambda job_id, st: statuses.append(st))
+    monkeypatch.setattr(job_events, "insert_job_event", lambda job_id, ev, payload=None: events.append((ev, payload)))
+    monkeypatch.setattr(email_scheduler, "get_job", lambda job_id: {"total": 2})
+    monkeypatch.setattr(email_scheduler, "get_job_status", lambda job_id: "running")
+    monkeypatch.setattr(email_scheduler, "list_job_recipients", lambda job_id, status=None: [
+        {"id": n, "to_email": f"r{n}@x.com", "language": "English", "variables": {}, "attempts": 0} for n in (1, 2)
+    ])
+    monkeypatch.setattr(email_scheduler, "claim_recipient", lambda rid, lease, sender=None: True)
+    monkeypatch.setattr(email_scheduler, "finish_recipient", lambda *a, **k: True)
+    monkeypatch.setattr(email_scheduler, "defer_job", lambda job_id, until: deferred.append(until) or True)
+
+    class _Gmail:
+        def users(self):
+            return self
+
+        def messages(self):
+            return self
+
+        def send(self, userId, body):
+            return self
+
+        def execute(self):
+            return {"id": "m"}
+
+    class _Auth:
+        def get_gmail_service(self, *args):
+            return _Gmail()
+
+    scheduler = EmailScheduler(_Auth(), None)
+    scheduler.sender_ledger = SenderLedger(persist=False)
+    result = scheduler.send_job_emails_from_db(
+        sender_email="s@example.com", master_user_id="1", store_id="2", job_id="j",
+        job_type="custom", subject="Hi", content="Hello", min_interval=0, max_interval=0,
+    )
+    assert result["stats"]["success_count"] == 1 and result["stats"]["failure_count"] == 0
+    assert len(deferred) == 1
+    assert ("deferred", {"until": deferred[0], "reason": "sender_daily_cap"}) in events
+    assert "completed" not in statuses and "error" not in statuses
@@ -0,0 +1,109 @@
+"""
+发件人池轮换测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.api_v2 as api_v2
+import src.email_scheduler as email_scheduler
+import src.job_events as job_events
+from src.email_scheduler import EmailScheduler
+from src.sender_ledger import SenderLedger
+from src.sender_pool import SenderPool, parse_sender_pool
+
+
+def _pool(emails, ledger=None):
+    return SenderPool({e: object() for e in emails}, ledger or SenderLedger(persist=False))
+
+
+def test_rotation_follows_remaining_quota_and_health(monkeypatch):
+    pool = _pool(["a@x.com", "b@x.com"])
+    assert [pool.choose() for _ in range(4)] == ["a@x.com", "b@x.com", "a@x.com", "b@x.com"]
+
+    monkeypatch.setenv("SENDER_DAILY_CAP", "100")
+    ledger = SenderLedger(persist=False)
+    for _ in range(75):
+        ledger.record_send("a@x.com")
+    pool = _pool(["a@x.com", "b@x.com"], ledger)
+    picks = [pool.choose() for _ in range(40)]
+    # a has 25% of its quota left, b 100%
+    assert picks.count("b@x.com") == 32
+
+    pool = _pool(["a@x.com", "b@x.com"])
+    pool.report("a@x.com", False, transient=True)
+    picks = [pool.choose() for _ in range(20)]
+    assert picks.count("a@x.com") <= 1
+
+    pool.mark_capped("a@x.com")
+    pool.mark_capped("b@x.com")
+    assert pool.choose() is None
+
+
+def test_parse_sender_pool():
+    assert parse_sender_pool('["a@x.com", "A@x.com", "b@x.com"]') == ["a@x.com", "b@x.com"]
+    assert parse_sender_pool(None) == [] and parse_sender_pool("not json") == []
+
+
+def test_resolve_sender_pool_option(monkeypatch):
+    monkeypatch.setattr(api_v2, "list_senders", lambda mu, store: [
+        {"email": "a@x.com", "status": "active"}, {"email": "b@x.com", "status": "active"}, {"email": "c@x.com", "status": "disabled"},
+    ])
+    assert api_v2._resolve_sender_pool("m", "s", "a@x.com", None) == (None, None)
+    assert api_v2._resolve_sender_pool("m", "s", "a@x.com", "all") == (["a@x.com", "b@x.com"], None)
+    assert api_v2._resolve_sender_pool("m", "s", "b@x.com", ["a@x.com"]) == (["b@x.com", "a@x.com"], None)
+    assert api_v2._resolve_sender_pool("m", "s", "a@x.com", ["c@x.com"])[1]
+
+
+def test_job_spreads_recipients_across_pool(monkeypatch):
+    claims, deferred = [], []
+    monkeypatch.setenv("SENDER_DAILY_CAP", "2")
+    monkeypatch.setattr(email_scheduler, "set_job_status", lambda job_id, st: None)
+    monkeypatch.setattr(job_events, "insert_job_event", lambda job_id, ev, payload=None: None)
+    monkeypatch.setattr(email_scheduler, "get_job", lambda job_id: {"total": 4, "sender_pool": '["a@x.com", "b@x.com"]'})
+    monkeypatch.setattr(email_scheduler, "get_job_status", lambda job_id: "running")
+    monkeypatch.setattr(email_scheduler, "list_job_recipients", lambda job_id, status=None: [
+        {"id": n, "to_email": f"r{n}@x.com", "language": "English", "variables": {}, "attempts": 0} for n in range(4)
+    ])
+    monkeypatch.setattr(email_scheduler, "claim_recipient", lambda rid, lease, sender=None: claims.append(sender) or True)
+    monkeypatch.setattr(email_scheduler, "finish_recipient", lambda *a, **k: True)
+    monkeypatch.setattr(email_scheduler, "defer_job", lambda job_id, until: deferred.append(until) or True)
+
+    class _Gmail:
+        def __init__(self, email):
+            self.email = email
+            self.sent = 0
+
+        def users(self):
+            return self
+
+        def messages(self):
+            return self
+
+        def send(self, userId, body):
+            return self
+
+        def execute(self):
+            self.sent += 1
+            return {"id": f"{self.email}-{self.sent}"}
+
+    services = {e: _Gmail(e) for e in ("a@x.com", "b@x.com")}
+
+    class _Auth:
+        def get_gmail_service(self, email, *args):
+            return services[email]
+
+    scheduler = EmailScheduler(_Auth(), None)
+    scheduler.sender_ledger = SenderLedger(persist=False)
+    result = scheduler.send_job_emails_from_db(
+        sender_email="a@x.com", master_user_id="1", store_id="2", job_id="j",
+        job_type="custom", subject="Hi", content="Hello", min_interval=0, max_interval=0,
+    )
+    # a single account would have been capped after 2; the pool sends all 4 within the caps
+    assert result["stats"]["success_count"] == 4
+    assert sorted(claims) == ["a@x.com", "a@x.com", "b@x.com", "b@x.com"]
+    assert services["a@x.com"].sent == 2 and services["b@x.com"].sent == 2
+    assert deferred == []
@@ -0,0 +1,72 @@
+"""
+服务容器测试
+验证管理器在进程内按参数只创建一次并在发送器/处理器之间共享，创建失败不缓存，
+以及任务创建接口不再为每个请求构造认证管理器与调度器
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from flask import Flask
+
+import src.api_v2 as api_v2
+import src.services as services
+from src.email_sender import EmailSender
+from src.excel_processor import ExcelProcessor
+
+
+@pytest.fixture(autouse=True)
+def _fresh_services():
+    services.reset_services()
+    yield
+    services.reset_services()
+
+
+def test_senders_share_warm_managers(tmp_path, monkeypatch):
+    created = []
+    original = services._shared
+    monkeypatch.setattr(services, "_shared", lambda kind, key, factory: original(kind, key, lambda: created.append(kind) or factory()))
+
+    senders = [EmailSender(None, f"s{i}@example.com", template_dir=str(tmp_path)) for i in range(3)]
+    processor = ExcelProcessor(str(tmp_path))
+
+    assert all(s.template_manager is senders[0].template_manager for s in senders)
+    assert all(s.attachment_manager is senders[0].attachment_manager for s in senders)
+    assert processor.template_manager is senders[0].template_manager
+    assert sorted(created) == ["attachment_manager", "template_manager"]
+    # 不同目录各自独立
+    other = tmp_path / "other"
+    assert services.get_template_manager(str(other)) is not senders[0].template_manager
+
+
+def test_failed_creation_is_not_cached(tmp_path):
+    creds = tmp_path / "credentials.json"
+    with pytest.raises(FileNotFoundError):
+        services.get_gmail_auth_manager(str(creds))
+    creds.write_text("{}", encoding="utf-8")
+    manager = services.get_gmail_auth_manager(str(creds))
+    assert services.get_gmail_auth_manager(str(creds)) is manager
+
+
+def test_job_endpoints_do_not_build_managers(monkeypatch):
+    def _forbidden(*args, **kwargs):
+        raise AssertionError("job creation must only enqueue")
+    monkeypatch.setattr("src.gmail_auth.GmailAuthManager.__init__", _forbidden)
+    monkeypatch.setattr("src.email_scheduler.EmailScheduler.__init__", _forbidden)
+    monkeypatch.setattr(api_v2, "create_job", lambda *a, **kw: "j1")
+    monkeypatch.setattr(api_v2, "add_job_recipients", lambda job_id, recipients: len(recipients))
+    monkeypatch.setattr(api_v2, "resolve_attachment_paths", lambda mu, store, attachments: [])
+    app = Flask(__name__)
+    app.register_blueprint(api_v2.bp)
+
+    resp = app.test_client().post("/api/jobs/send_emails", json={
+        "master_user_id": "mu", "store_id": "s1", "sender_email": "me@x.com",
+        "subject": "Hi", "content": "Hello", "recipients": [{"to_email": "a@x.com"}],
+    })
+
+    assert resp.status_code == 200
+    assert resp.get_json()["job_id"] == "j1"
@@ -0,0 +1,116 @@
+"""
+Excel状态日志测试
+验证发送状态追加到日志而非每封邮件重写工作簿，读取时叠加日志，按阈值及任务结束时合并
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import os
+
+import pandas as pd
+
+import src.workbook_session as workbook_session
+from src.excel_processor import ExcelProcessor
+from src.status_journal import StatusJournal, journal_path_for
+
+
+def _workbook(tmp_path, n=5):
+    path = tmp_path / "contacts.xlsx"
+    pd.DataFrame({
+        "邮箱": [f"u{i}@example.com" for i in range(n)],
+        "合作次数": [0] * n,
+        "回复次数": [0] * n,
+        "跟进次数": [1] * n,
+        "跟进方式": ["邮件"] * n,
+        "是否已邮箱建联": [0] * n,
+        "语言": ["English"] * n,
+    }).to_excel(path, index=False)
+    return str(path)
+
+
+def _count_writes(monkeypatch):
+    writes = []
+    real = workbook_session.write_workbook_atomic
+    monkeypatch.setattr(workbook_session, "write_workbook_atomic", lambda df, p: (writes.append(p), real(df, p)))
+    return writes
+
+
+def test_statuses_are_journaled_and_overlaid_on_read(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXCEL_JOURNAL_COMPACT_EVERY", "100")
+    path = _workbook(tmp_path)
+    writes = _count_writes(monkeypatch)
+    processor = ExcelProcessor()
+
+    processor.record_email_status(path, "u0@example.com", 1)
+    processor.record_email_status(path, "u1@example.com", -1)
+
+    assert writes == []
+    assert os.path.exists(journal_path_for(path))
+    # the workbook itself is untouched, but readers see journal + workbook
+    assert pd.read_excel(path)["是否已邮箱建联"].tolist() == [0] * 5
+    assert processor.get_pending_emails(path) == ["u2@example.com", "u3@example.com", "u4@example.com"]
+    stats = processor.get_statistics(path)
+    assert (stats["发送成功数"], stats["发送失败数"], stats["待发送数"]) == (1, 1, 3)
+
+
+def test_compacts_in_batches_and_on_flush(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXCEL_JOURNAL_COMPACT_EVERY", "2")
+    path = _workbook(tmp_path)
+    writes = _count_writes(monkeypatch)
+    processor = ExcelProcessor()
+
+    for i in range(5):
+        processor.record_email_status(path, f"u{i}@example.com", 1)
+    assert len(writes) == 2
+    assert pd.read_excel(path)["是否已邮箱建联"].tolist() == [1, 1, 1, 1, 0]
+
+    assert processor.flush_email_status(path)
+    assert len(writes) == 3
+    assert not os.path.exists(journal_path_for(path))
+    assert pd.read_excel(path)["是否已邮箱建联"].tolist() == [1] * 5
+    # nothing left to compact
+    assert processor.flush_email_status(path)
+    assert len(writes) == 3
+
+
+def test_later_entries_win_and_torn_tail_is_ignored(tmp_path):
+    path = _workbook(tmp_path)
+    journal = StatusJournal(path, compact_every=100)
+    journal.append("u0@example.com", -1)
+    journal.append("u0@example.com", 1)
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"email": "u1@example.com", "sta')
+
+    assert journal.pending() == {"u0@example.com": 1}
+    assert journal.compact()
+    assert pd.read_excel(path)["是否已邮箱建联"].tolist() == [1, 0, 0, 0, 0]
+
+
+def test_failed_compaction_keeps_journal(tmp_path, monkeypatch):
+    path = _workbook(tmp_path)
+    journal = StatusJournal(path, compact_every=100)
+    journal.append("u0@example.com", 1)
+
+    def boom(df, p):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(workbook_session, "write_workbook_atomic", boom)
+    assert not journal.compact()
+    assert journal.pending() == {"u0@example.com": 1}
+    assert pd.read_excel(path)["是否已邮箱建联"].tolist() == [0] * 5
+
+
+def test_update_email_status_still_writes_immediately(tmp_path):
+    path = _workbook(tmp_path)
+    processor = ExcelProcessor()
+    processor.record_email_status(path, "u0@example.com", -1)
+
+    assert processor.update_email_status(path, "u1@example.com", 1)
+    assert not processor.update_email_status(path, "missing@example.com", 1)
+    # pending journal entries are folded in by the same atomic write
+    assert pd.read_excel(path)["是否已邮箱建联"].tolist() == [-1, 1, 0, 0, 0]
+    assert not os.path.exists(journal_path_for(path))
@@ -0,0 +1,45 @@
+"""
+模板预编译测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.template_compiler import COMPILER_VERSION, compile_html_template, load_compiled
+
+
+def test_text_alternative_keeps_placeholders():
+    compiled = compile_html_template("<h1>Hi [Name]</h1>\n<p> Order <b>[Order]</b> </p><img id=\"logo\">")
+    assert compiled["text"] == "Hi [Name]\nOrder [Order]"
+    assert compiled["images"] == ["logo"]
+
+
+def test_load_compiled_rejects_old_version():
+    assert load_compiled({"version": COMPILER_VERSION - 1, "html": ""}) is None
+    assert load_compiled('{"version": %d, "html": "x"}' % COMPILER_VERSION)["html"] == "x"
+
+
+def test_file_text_template_is_cached_per_file_version(tmp_path):
+    import os
+
+    from src.template_manager import TemplateManager
+    from src.template_store import TemplateStore
+
+    html = tmp_path / "en-html_content"
+    html.write_text("<p>Hi [Name]</p>", encoding="utf-8")
+    manager = TemplateManager(str(tmp_path))
+    manager.template_store = store = TemplateStore(max_entries=8)
+
+    assert manager.text_template("Spanish") == "Hi [Name]"
+    assert manager.text_template("English") == "Hi [Name]"
+    assert store.get_stats()["hits"] >= 1
+
+    # edits replace the entry for that file instead of adding another one
+    for n in range(5):
+        html.write_text(f"<p>Hi [Name] v{n}</p>", encoding="utf-8")
+        os.utime(html, ns=(os.stat(html).st_atime_ns, os.stat(html).st_mtime_ns + (n + 1) * 10**9))
+        assert manager.text_template("English") == f"Hi [Name] v{n}"
+    assert len(store._entries) <= 3
@@ -0,0 +1,150 @@
+"""
+模板参数缓存测试
+验证模板参数随编译结果保存（每个模板版本只提取一次），验证为集合差，以及任务入队前校验收件人变量
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import os
+
+import pandas as pd
+from flask import Flask
+
+import src.api_v2 as api_v2
+import src.dao_mysql as dao_mysql
+from src.excel_processor import ExcelProcessor
+from src.template_compiler import COMPILER_VERSION, compile_html_template, validate_recipient_params
+from src.template_manager import TemplateManager
+from src.template_store import TemplateStore
+
+
+def test_compiled_template_carries_params():
+    compiled = compile_html_template("<p>Hi [Name], [Order] / [Name]</p>")
+    assert compiled["version"] == COMPILER_VERSION
+    assert compiled["params"] == ["Name", "Order"]
+
+
+def test_file_template_params_are_scanned_once_per_version(tmp_path, monkeypatch):
+    (tmp_path / "en-subject").write_text("Hi [达人ID]", encoding="utf-8")
+    html = tmp_path / "en-html_content"
+    html.write_text("<p>[钩子]</p>", encoding="utf-8")
+    manager = TemplateManager(str(tmp_path))
+    manager.template_store = TemplateStore()
+
+    result = manager.validate_templates_for_data(["达人ID"], "Spanish")
+    lang = result["languages"]["Spanish"]
+    assert not result["overall_valid"]
+    assert lang["subject_validation"]["valid"]
+    assert lang["html_content_validation"]["missing_parameters"] == ["钩子"]
+
+    reads = []
+    original = manager.template_store.read_text_file
+    monkeypatch.setattr(manager.template_store, "read_text_file", lambda path: reads.append(path) or original(path))
+    for _ in range(3):
+        assert manager.validate_templates_for_data(["达人ID", "钩子"], "English")["overall_valid"]
+    assert reads == []
+
+    # a new version of the file is picked up
+    html.write_text("<p>[钩子] [新参数]</p>", encoding="utf-8")
+    os.utime(html, ns=(os.stat(html).st_atime_ns, os.stat(html).st_mtime_ns + 10**9))
+    result = manager.validate_templates_for_data(["达人ID", "钩子"], "English")
+    assert result["languages"]["English"]["html_content_validation"]["missing_parameters"] == ["新参数"]
+    assert len(reads) == 1
+
+
+def test_validate_templates_for_excel(tmp_path):
+    (tmp_path / "en-subject").write_text("Hi [达人ID]", encoding="utf-8")
+    (tmp_path / "en-html_content").write_text("<p>[钩子]</p>", encoding="utf-8")
+    path = tmp_path / "contacts.xlsx"
+    pd.DataFrame({"邮箱": ["a@example.com", "b@example.com"], "语言": ["English", None], "达人ID": ["a", "b"]}).to_excel(path, index=False)
+
+    result = ExcelProcessor(str(tmp_path)).validate_templates_for_excel(str(path))
+
+    assert result["languages_found"] == ["English"]
+    assert not result["overall_valid"]
+    assert result["validation_details"]["English"]["html_content_validation"]["missing_parameters"] == ["钩子"]
+
+
+def test_recipient_validation_is_a_set_difference_per_language():
+    calls = []
+    params = {"English": ["name", "code"], "Spanish": ["name"]}
+
+    def params_for(language):
+        calls.append(language)
+        return params.get(language)
+
+    result = validate_recipient_params([
+        {"to_email": "a@x.com", "variables": {"name": "A", "code": "1"}},
+        {"to_email": "b@x.com", "variables": '{"name": "B"}'},
+        {"to_email": "c@x.com", "language": "Spanish", "variables": {}},
+        {"to_email": "d@x.com", "variables": {"语言": "Spanish", "name": "D"}},
+        {"to_email": "e@x.com", "language": "French", "variables": {}},
+    ], params_for)
+
+    assert sorted(calls) == ["English", "French", "Spanish"]
+    assert result == {
+        "valid": False,
+        "recipients": 5,
+        "recipients_with_missing": 2,
+        "missing_parameters": {"code": 1, "name": 1},
+        "missing_templates": ["French"],
+    }
+
+
+def test_stale_db_compilation_is_backfilled_once(monkeypatch):
+    row = {"id": 5, "subject": "Hi [name]", "html_content": "<p>[code]</p>", "text_content": None,
+           "version": 1, "updated_at": "t1", "compiled_json": '{"version": 2, "html": "<p>[code]</p>"}'}
+    backfilled = []
+    monkeypatch.setattr(dao_mysql, "get_template_stamp", lambda mu, store, tid: {"version": 1, "updated_at": "t1"})
+    monkeypatch.setattr(dao_mysql, "get_template", lambda mu, store, tid: dict(row))
+    monkeypatch.setattr(dao_mysql, "set_template_compiled", lambda tid, compiled: backfilled.append((tid, compiled)))
+    store = TemplateStore()
+
+    tpl = store.get_db_template("mu", "s1", 5)
+    assert tpl["params"] == ["code", "name"]
+    assert store.get_db_template("mu", "s1", 5) is tpl
+    assert len(backfilled) == 1 and backfilled[0][1]["params"] == ["code"]
+
+
+def test_template_job_is_checked_before_queueing(monkeypatch):
+    created = []
+    tpl = {"subject": "Hi [name]", "html": "<p>[code]</p>", "text": "[code]", "images": [], "params": ["code", "name"]}
+
+    class _Store:
+        def get_db_template(self, mu, store, template_id):
+            return tpl if template_id == 7 else None
+
+        def get_job_template(self, mu, store, language, template_id=None):
+            return self.get_db_template(mu, store, template_id)
+
+    monkeypatch.setattr(api_v2, "get_template_store", lambda: _Store())
+    monkeypatch.setattr(api_v2, "create_job", lambda *a, **kw: created.append(a) or "j1")
+    monkeypatch.setattr(api_v2, "add_job_recipients", lambda job_id, recipients: len(recipients))
+    monkeypatch.setattr(api_v2, "resolve_attachment_paths", lambda mu, store, attachments: [])
+    app = Flask(__name__)
+    app.register_blueprint(api_v2.bp)
+    client = app.test_client()
+    body = {
+        "master_user_id": "mu", "store_id": "s1", "sender_email": "me@x.com", "template_id": 7,
+        "recipients": [{"to_email": "a@x.com", "variables": {"name": "A"}}],
+    }
+
+    resp = client.post("/api/jobs/send_template_emails", json=dict(body, strict_params=True))
+    assert resp.status_code == 400
+    assert resp.get_json()["template_validation"]["missing_parameters"] == {"code": 1}
+    assert created == []
+
+    resp = client.post("/api/jobs/send_template_emails", json=body)
+    assert resp.status_code == 200
+    assert not resp.get_json()["template_validation"]["valid"]
+    assert len(created) == 1
+
+    assert client.post("/api/jobs/send_template_emails", json=dict(body, template_id=8)).status_code == 404
+
+    resp = client.post("/api/templates/7/validate", json={"master_user_id": "mu", "store_id": "s1", "columns": ["name", "code", "x"]})
+    assert resp.get_json()["valid"]
+    assert resp.get_json()["columns"]["missing_parameters"] == []
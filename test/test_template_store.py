@@ -0,0 +1,53 @@
+"""
+模板仓库缓存测试
+"""
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.template_files import TemplateFileManager
+from src.template_store import TemplateStore
+
+
+def test_file_template_cached_and_refreshed(tmp_path):
+    tfm = TemplateFileManager(str(tmp_path))
+    tfm.save_subject("1", "2", "en", "Hello [Name]")
+    tfm.save_content("1", "2", "en", '<p>Hi [Name]</p><img id="logo">')
+    store = TemplateStore(files_root=str(tmp_path))
+
+    first = store.get_file_template("1", "2", "en")
+    assert first["images"] == ["logo"]
+    assert store.get_file_template("1", "2", "en") is first
+    assert store.get_stats()["hits"] == 1
+
+    # 文件被修改后按修改时间/大小重新加载
+    tfm.save_content("1", "2", "en", "<p>Bye [Name]</p>")
+    _, content_path = tfm.template_paths("1", "2", "en")
+    os.utime(content_path, ns=(1, 1))
+    second = store.get_file_template("1", "2", "en")
+    assert second["text"] == "Bye [Name]"
+    assert second["images"] == []
+
+
+def test_invalidate_drops_entry(tmp_path):
+    tfm = TemplateFileManager(str(tmp_path))
+    tfm.save_subject("1", "2", "de", "Hallo")
+    tfm.save_content("1", "2", "de", "<p>Hallo</p>")
+    store = TemplateStore(files_root=str(tmp_path))
+
+    store.get_file_template("1", "2", "de")
+    store.invalidate_file_template("1", "2", "de")
+    stats = store.get_stats()
+    assert stats["entries"] == 0 and stats["invalidations"] == 1
+    assert store.get_file_template("1", "2", "de") is not None
+    assert store.get_file_template("1", "2", "xx") is None
+
+
+def test_reads_do_not_create_directories(tmp_path):
+    store = TemplateStore(files_root=str(tmp_path))
+    assert store.get_job_template("9", "9", "fr") is None
+    assert os.listdir(tmp_path) == []
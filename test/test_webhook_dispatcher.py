@@ -0,0 +1,81 @@
+"""
+Webhook异步投递测试
+使用本地HTTP服务验证连接复用、失败重试与批量模式
+"""
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.webhook_dispatcher import WebhookDispatcher
+
+
+def _start_server(fail_first=0):
+    received = []
+    state = {"fail": fail_first}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if state["fail"] > 0:
+                state["fail"] -= 1
+                code = 503
+            else:
+                received.append(json.loads(body))
+                code = 200
+            self.send_response(code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/hook", received
+
+
+def test_delivers_with_keepalive_and_retries():
+    server, url, received = _start_server(fail_first=1)
+    dispatcher = WebhookDispatcher(workers=1, base_delay=0.01)
+    try:
+        for n in range(5):
+            assert dispatcher.submit(url, {"event_type": "recipient_success", "n": n})
+        assert dispatcher.flush(5)
+        metrics = dispatcher.get_metrics()
+        assert sorted(p["n"] for p in received) == [0, 1, 2, 3, 4]
+        assert metrics["delivered_events"] == 5
+        assert metrics["retries"] == 1
+        assert metrics["connections_created"] == 1
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+
+
+def test_batch_mode_groups_events():
+    server, url, received = _start_server()
+    dispatcher = WebhookDispatcher(workers=1, batch_max=10, batch_window=0.3)
+    try:
+        for n in range(4):
+            dispatcher.submit(url, {"event_type": "recipient_success", "n": n})
+        assert dispatcher.flush(5)
+        assert len(received) == 1
+        assert [e["n"] for e in received[0]["events"]] == [0, 1, 2, 3]
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+
+
+def test_full_queue_drops_instead_of_blocking():
+    dispatcher = WebhookDispatcher(queue_size=1, workers=1)
+    dispatcher._ensure_started = lambda: None  # keep the worker idle so the queue stays full
+    assert dispatcher.submit("http://127.0.0.1:9/hook", {"event_type": "a"})
+    assert not dispatcher.submit("http://127.0.0.1:9/hook", {"event_type": "b"})
+    assert dispatcher.get_metrics()["dropped"] == 1
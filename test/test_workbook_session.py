@@ -0,0 +1,96 @@
+"""
+工作簿会话测试
+验证一次模板发送流程只解析一次工作簿、文件变化后重新解析，以及脏行的一次性写回
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import os
+
+import pandas as pd
+
+import src.workbook_session as workbook_session
+from src.excel_processor import ExcelProcessor
+from src.workbook_session import open_workbook
+
+
+def _workbook(tmp_path, n=4):
+    path = tmp_path / "contacts.xlsx"
+    pd.DataFrame({
+        "邮箱": [f"u{i}@example.com" for i in range(n)],
+        "合作次数": [0] * n,
+        "回复次数": [0] * n,
+        "跟进次数": [1] * n,
+        "跟进方式": ["邮件"] * n,
+        "是否已邮箱建联": [0] * n,
+        "语言": ["English"] * n,
+    }).to_excel(path, index=False)
+    return str(path)
+
+
+def _count_parses(monkeypatch):
+    parses = []
+    real = workbook_session.pd.read_excel
+    monkeypatch.setattr(workbook_session.pd, "read_excel", lambda p, *a, **kw: (parses.append(p), real(p, *a, **kw))[1])
+    return parses
+
+
+def test_send_preparation_parses_workbook_once(tmp_path, monkeypatch):
+    path = _workbook(tmp_path)
+    parses = _count_parses(monkeypatch)
+    processor = ExcelProcessor()
+
+    # the same sequence EmailAssistant.send_template_emails runs before sending
+    assert processor.validate_excel_file(path)
+    processor.validate_templates_for_excel(path)
+    assert len(processor.get_filtered_data_with_language(path)) == 4
+    assert processor.get_statistics(path)["待发送数"] == 4
+    assert len(parses) == 1
+
+
+def test_callers_get_private_copies(tmp_path):
+    path = _workbook(tmp_path)
+    processor = ExcelProcessor()
+    df = processor.read_excel_data(path)
+    df.loc[:, "邮箱"] = "changed@example.com"
+    assert processor.get_pending_emails(path)[0] == "u0@example.com"
+
+
+def test_external_change_triggers_reparse(tmp_path, monkeypatch):
+    path = _workbook(tmp_path)
+    parses = _count_parses(monkeypatch)
+    processor = ExcelProcessor()
+    assert len(processor.get_pending_emails(path)) == 4
+
+    df = pd.read_excel(path)
+    df.loc[0, "是否已邮箱建联"] = 1
+    df.to_excel(path, index=False)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert len(processor.get_pending_emails(path)) == 3
+    assert len(parses) == 3  # first load, the test's own read, reload after the edit
+
+
+def test_dirty_rows_are_written_back_once(tmp_path, monkeypatch):
+    path = _workbook(tmp_path)
+    writes = []
+    real = workbook_session.write_workbook_atomic
+    monkeypatch.setattr(workbook_session, "write_workbook_atomic", lambda df, p: (writes.append(p), real(df, p)))
+
+    session = open_workbook(path)
+    assert session.set_statuses({"u1@example.com": 1, "missing@example.com": -1}) == 1
+    assert session.set_statuses({"u3@example.com": -1}) == 1
+    assert session.dirty_rows == {1, 3}
+
+    assert session.save()
+    assert not session.save()
+    assert len(writes) == 1
+    assert session.dirty_rows == set()
+    assert pd.read_excel(path)["是否已邮箱建联"].tolist() == [0, 1, 0, -1]
+    # the written file matches the cached signature, so it is not parsed again
+    assert open_workbook(path) is session